@@ -0,0 +1,75 @@
+"""Concurrent-request throughput: blocking driver calls vs the DB executor.
+
+Each simulated request borrows a pooled connection and runs a query that
+takes ``--query-ms`` on the server, the way a slow get_board does. In
+``blocking`` mode the calls run directly on the event loop, as the routes
+did before; in ``async`` mode they go through get_db/AsyncCursor.
+
+Needs a reachable MySQL (e.g. ``docker compose up db``). Run from backend/:
+
+    python -m benchmarks.async_db --requests 200 --concurrency 50 --query-ms 20
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from database import db_connection, get_db, pool
+
+
+async def blocking_request(query_seconds):
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT SLEEP(%s)", (query_seconds,))
+        cursor.fetchall()
+        cursor.close()
+
+
+async def async_request(query_seconds):
+    dependency = get_db()
+    conn = await dependency.__anext__()
+    try:
+        cursor = conn.cursor()
+        await cursor.execute("SELECT SLEEP(%s)", (query_seconds,))
+        await cursor.fetchall()
+        await cursor.close()
+    finally:
+        await dependency.aclose()
+
+
+async def run(request, total, concurrency, query_seconds):
+    limit = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with limit:
+            await request(query_seconds)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - start
+    return {"seconds": round(elapsed, 3), "requests_per_second": round(total / elapsed, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--query-ms", type=float, default=20)
+    args = parser.parse_args()
+
+    pool.prewarm()
+    query_seconds = args.query_ms / 1000
+    results = {
+        "pool_size": pool.size,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "query_ms": args.query_ms,
+        "blocking": asyncio.run(run(blocking_request, args.requests, args.concurrency, query_seconds)),
+        "async": asyncio.run(run(async_request, args.requests, args.concurrency, query_seconds)),
+    }
+    pool.close()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
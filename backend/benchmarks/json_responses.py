@@ -0,0 +1,120 @@
+"""CPU per response: FastAPI's default JSON path vs fast_json.
+
+Needs no database. Builds a get_board payload for a board of ``--items``
+items (through routes.boards._assemble_stages, from synthetic rows), plus
+a page of ``--users`` user rows as GET /users/opposite-role returns them,
+and times per response in CPU milliseconds:
+
+    default       jsonable_encoder + JSONResponse, what returning a dict does
+    validated     UserResponse validation first (user rows only), as
+                  response_model=List[UserResponse] did
+    json          fast_json.dumps on the json module (orjson not installed)
+    orjson        fast_json.dumps on orjson, when installed
+    +gzip / +br   the same encoding plus compression at the configured level
+
+along with the body size. Run from backend/:
+
+    python -m benchmarks.json_responses --items 5000 --repeat 50
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+import fast_json
+from fast_json import brotli, compress, dumps
+from models.user import UserResponse
+from routes.boards import _assemble_stages
+
+STAGES = 8
+
+
+def board_payload(items: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    created = datetime(2024, 1, 1)
+    rows = []
+    for n in range(items):
+        stage = n * STAGES // items
+        subtasks = [{"text": f"Step {k + 1}", "completed": rng.random() < 0.5} for k in range(rng.randint(0, 4))]
+        rows.append((
+            "user_1", f"stage_{stage}", f"Stage {stage + 1}", stage + 1, created,
+            f"item_{n}", f"Card number {n} with a short title", f"stage_{stage}",
+            "A description a sentence or two long, as most cards have." if rng.random() < 0.6 else None,
+            rng.choice(["In Progress", "Done", "Skipped"]), rng.randrange(0, 101, 10), (n + 1) * 1024,
+            created + timedelta(seconds=rng.randint(0, 10_000_000), microseconds=rng.randint(0, 999_999)),
+            json.dumps(subtasks),
+        ))
+    return {"stages": _assemble_stages(rows, details=True)}
+
+
+def user_rows(count: int, seed: int) -> list:
+    rng = random.Random(seed)
+    return [
+        {
+            "id": f"user_{n}", "name": f"User {n}", "role": "Discipler", "age": rng.randint(18, 75),
+            "location": f"City {rng.randint(1, 200)}", "interests": ["Prayer", "Music", "Bible study"][:rng.randint(1, 3)],
+            "email": f"user{n}@example.com", "created_at": datetime(2024, 1, 1) + timedelta(minutes=n),
+        }
+        for n in range(count)
+    ]
+
+
+def cpu_ms(func, repeat: int) -> float:
+    func()
+    started = time.process_time()
+    for _ in range(repeat):
+        func()
+    return round((time.process_time() - started) / repeat * 1000, 3)
+
+
+def with_json_module(func):
+    def run():
+        orjson, fast_json.orjson = fast_json.orjson, None
+        try:
+            return func()
+        finally:
+            fast_json.orjson = orjson
+    return run
+
+
+def measure(content, repeat: int, model=None) -> dict:
+    paths = {"default": lambda: JSONResponse(jsonable_encoder(content)).body}
+    if model is not None:
+        adapter = TypeAdapter(model)
+        paths["validated"] = lambda: JSONResponse(jsonable_encoder(adapter.validate_python(content))).body
+    paths["json"] = with_json_module(lambda: dumps(content))
+    if fast_json.orjson is not None:
+        paths["orjson"] = lambda: dumps(content)
+
+    fastest = paths.get("orjson", paths["json"])
+    name = "orjson" if "orjson" in paths else "json"
+    encodings = ["gzip"] + (["br"] if brotli is not None else [])
+    for encoding in encodings:
+        paths[f"{name}+{encoding}"] = lambda encoding=encoding: compress(fastest(), encoding)
+
+    return {path: {"cpu_ms": cpu_ms(func, repeat), "bytes": len(func())} for path, func in paths.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    results = {
+        "board": {"items": args.items, **measure(board_payload(args.items, args.seed), args.repeat)},
+        "user_list": {"users": args.users, **measure(user_rows(args.users, args.seed), args.repeat, List[UserResponse])},
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+"""Latency and throughput of the real endpoints under concurrent load.
+
+Requests go straight into the FastAPI app over ASGI, in this process: no
+sockets or HTTP client, but every middleware, dependency, query and
+serializer a real request goes through. Startup and shutdown hooks run as
+they do under uvicorn, so the pool, bcrypt workers and background tasks
+behave normally.
+
+Needs MySQL (e.g. ``docker compose up db``) seeded with seed.py; the SQL
+is MySQL-specific, so there is no embedded stand-in. Run from backend/:
+
+    python seed.py seed --users 2000
+    python -m benchmarks.load --concurrency 1 10 50 --requests 500 --output baseline.json
+    # ...change something...
+    python -m benchmarks.load --concurrency 1 10 50 --requests 500 --compare baseline.json
+
+Each scenario is run at each concurrency level and reported as JSON with
+p50/p95/p99 latency and throughput. With ``--compare``, every result also
+gets its change against the matching baseline result, and the exit status
+is 1 if any p95 rose or throughput fell by more than ``--threshold``.
+
+The item scenarios write to the seeded boards; reseed to get back to a
+known state.
+"""
+import argparse
+import asyncio
+import json
+import math
+import platform
+import random
+import sys
+import time
+from datetime import datetime
+
+from main import app
+from database import db_connection
+
+SCENARIOS = ("login", "get_boards", "get_board", "suggested_matches", "opposite_role", "update_item", "move_item")
+
+
+class Client:
+    """Calls an ASGI app in-process and returns (status, body)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def request(self, method: str, path: str, token: str = None, body=None):
+        path, _, query = path.partition("?")
+        payload = b"" if body is None else json.dumps(body).encode()
+        headers = [(b"host", b"benchmark"), (b"content-length", str(len(payload)).encode())]
+        if body is not None:
+            headers.append((b"content-type", b"application/json"))
+        if token:
+            headers.append((b"authorization", f"Bearer {token}".encode()))
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+            "method": method, "scheme": "http", "path": path, "raw_path": path.encode(),
+            "query_string": query.encode(), "root_path": "", "headers": headers,
+            "client": ("127.0.0.1", 0), "server": ("benchmark", 80),
+        }
+
+        finished = asyncio.Event()
+        received = False
+        status, chunks = None, []
+
+        async def receive():
+            nonlocal received
+            if not received:
+                received = True
+                return {"type": "http.request", "body": payload, "more_body": False}
+            # The client only goes away once the response is complete
+            await finished.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+                if not message.get("more_body", False):
+                    finished.set()
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            finished.set()
+        return status, b"".join(chunks)
+
+
+def load_fixtures(prefix: str, users: int, seed: int) -> list:
+    """Random seeded users who own boards, with their boards' stages and items."""
+    pattern = prefix.replace("_", "\\_") + "\\_%"
+    with db_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        try:
+            cursor.execute("""
+                SELECT u.id, u.email
+                FROM users u
+                WHERE u.id LIKE %s AND EXISTS (SELECT 1 FROM boards b WHERE b.user_id = u.id)
+            """, (pattern,))
+            candidates = cursor.fetchall()
+            if not candidates:
+                sys.exit(f"No seeded users with prefix {prefix!r}; run python seed.py seed first")
+            chosen = random.Random(seed).sample(candidates, min(users, len(candidates)))
+
+            for user in chosen:
+                cursor.execute("""
+                    SELECT b.id AS board_id, s.id AS stage_id, i.id, i.content, i.description,
+                           i.status, i.progress, i.subtasks
+                    FROM boards b
+                    JOIN stages s ON s.board_id = b.id
+                    LEFT JOIN items i ON i.stage_id = s.id
+                    WHERE b.user_id = %s
+                """, (user["id"],))
+                boards = {}
+                for row in cursor.fetchall():
+                    board = boards.setdefault(row["board_id"], {"id": row["board_id"], "stages": set(), "items": []})
+                    board["stages"].add(row["stage_id"])
+                    if row["id"] is not None:
+                        board["items"].append({
+                            "id": row["id"], "content": row["content"], "stage_id": row["stage_id"],
+                            "description": row["description"], "status": row["status"],
+                            "progress": row["progress"], "subtasks": json.loads(row["subtasks"] or "[]"),
+                        })
+                user["boards"] = [dict(board, stages=sorted(board["stages"])) for board in boards.values()]
+        finally:
+            cursor.close()
+    return chosen
+
+
+class Scenarios:
+    """One method per scenario, each making a single request as a random seeded user."""
+
+    def __init__(self, client: Client, users: list, password: str, seed: int):
+        self.client = client
+        self.users = users
+        self.password = password
+        self.rng = random.Random(seed)
+
+    async def log_in_all(self):
+        for user in self.users:
+            status, body = await self.client.request(
+                "POST", "/auth/login", body={"email": user["email"], "password": self.password}
+            )
+            if status != 200:
+                sys.exit(f"Login failed for {user['email']} ({status}); is --password the seeded one?")
+            user["token"] = json.loads(body)["access_token"]
+
+    def _user(self):
+        return self.rng.choice(self.users)
+
+    def _item(self):
+        user = self._user()
+        board = self.rng.choice(user["boards"])
+        return user, board, self.rng.choice(board["items"])
+
+    async def login(self):
+        user = self._user()
+        return await self.client.request("POST", "/auth/login", body={"email": user["email"], "password": self.password})
+
+    async def get_boards(self):
+        return await self.client.request("GET", "/boards/", self._user()["token"])
+
+    async def get_board(self):
+        user = self._user()
+        return await self.client.request("GET", f"/boards/{self.rng.choice(user['boards'])['id']}", user["token"])
+
+    async def suggested_matches(self):
+        return await self.client.request("GET", "/users/suggested-matches", self._user()["token"])
+
+    async def opposite_role(self):
+        return await self.client.request("GET", "/users/opposite-role", self._user()["token"])
+
+    async def update_item(self):
+        user, board, item = self._item()
+        item["progress"] = self.rng.randrange(0, 101, 10)
+        return await self.client.request("PUT", f"/boards/{board['id']}/items/{item['id']}", user["token"], item)
+
+    async def move_item(self):
+        user, board, item = self._item()
+        item["stage_id"] = self.rng.choice(board["stages"])
+        move = {"stage_id": item["stage_id"], "position": self.rng.randint(0, 20)}
+        return await self.client.request("POST", f"/boards/{board['id']}/items/{item['id']}/move", user["token"], move)
+
+
+def percentile(samples: list, p: float) -> float:
+    # Nearest rank; samples must be sorted
+    return samples[max(math.ceil(p / 100 * len(samples)) - 1, 0)]
+
+
+async def run(request, total: int, concurrency: int) -> dict:
+    limit = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def one():
+        nonlocal errors
+        async with limit:
+            started = time.perf_counter()
+            status, _ = await request()
+            latencies.append(time.perf_counter() - started)
+            if status >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": total,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 1),
+        **{f"p{p}_ms": round(percentile(latencies, p) * 1000, 2) for p in (50, 95, 99)},
+        "max_ms": round(latencies[-1] * 1000, 2),
+    }
+
+
+def compare(results: list, baseline: dict, threshold: float) -> list:
+    """Annotate ``results`` with changes against ``baseline``; returns the regressions."""
+    previous = {(r["scenario"], r["concurrency"]): r for r in baseline["results"]}
+    regressions = []
+    for result in results:
+        before = previous.get((result["scenario"], result["concurrency"]))
+        if before is None:
+            continue
+        result["p95_change"] = round(result["p95_ms"] / before["p95_ms"] - 1, 3)
+        result["throughput_change"] = round(result["throughput_rps"] / before["throughput_rps"] - 1, 3)
+        if result["p95_change"] > threshold or result["throughput_change"] < -threshold:
+            regressions.append(f"{result['scenario']} @ {result['concurrency']}: "
+                               f"p95 {result['p95_change']:+.1%}, throughput {result['throughput_change']:+.1%}")
+    return regressions
+
+
+async def benchmark(args) -> dict:
+    await app.router.startup()
+    try:
+        users = load_fixtures(args.prefix, args.users, args.seed)
+        scenarios = Scenarios(Client(app), users, args.password, args.seed)
+        await scenarios.log_in_all()
+
+        results = []
+        for concurrency in args.concurrency:
+            for name in args.scenarios:
+                request = getattr(scenarios, name)
+                await run(request, args.warmup, concurrency)
+                result = await run(request, args.requests, concurrency)
+                results.append({"scenario": name, "concurrency": concurrency, **result})
+                print(f"{name} @ {concurrency}: p95 {result['p95_ms']} ms, {result['throughput_rps']} req/s",
+                      file=sys.stderr, flush=True)
+    finally:
+        await app.router.shutdown()
+
+    return {
+        "run": {
+            "started": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+            "python": platform.python_version(),
+            "users": len(users),
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 10, 50])
+    parser.add_argument("--requests", type=int, default=500, help="measured requests per scenario and level")
+    parser.add_argument("--warmup", type=int, default=20, help="unmeasured requests before each run")
+    parser.add_argument("--users", type=int, default=50, help="seeded users to spread requests over")
+    parser.add_argument("--prefix", default="seed", help="seed.py --prefix of the data")
+    parser.add_argument("--password", default="password", help="seed.py --password of the data")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="also write the JSON report here")
+    parser.add_argument("--compare", help="baseline report to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed p95/throughput change")
+    args = parser.parse_args()
+
+    report = asyncio.run(benchmark(args))
+    regressions = []
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report["results"], json.load(f), args.threshold)
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    if regressions:
+        print("Regressions:\n  " + "\n  ".join(regressions), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""Suggested-matches cost: full scan + sort vs inverted index + top-k heap.
+
+``memory`` mode needs no database. It generates ``--users`` synthetic users
+and times, per query, the old handler's work (decode every user's interests,
+score everyone, sort the whole list) against matching.py's (candidates from
+interest/location/age postings, heap selection, details for the winners
+only). The postings are dicts here; in the app they are index range scans.
+
+``db`` mode times matching.top_matches against the configured MySQL for
+randomly chosen existing users, so seed the database first. Run from
+backend/:
+
+    python -m benchmarks.matchmaking --users 100000 --queries 200
+    python -m benchmarks.matchmaking --mode db --queries 200
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from collections import defaultdict
+
+from matching import AGE_RANGE, match_score, select_top
+
+INTERESTS = [f"interest-{n}" for n in range(60)]
+LOCATIONS = [f"city-{n}" for n in range(300)]
+
+
+def generate_users(count, seed):
+    rng = random.Random(seed)
+    return [
+        {
+            "id": f"user_{n}",
+            "name": f"User {n}",
+            "email": f"user{n}@example.com",
+            "age": rng.randint(18, 75),
+            # Skewed so a few locations are large, as real ones are
+            "location": LOCATIONS[min(int(rng.paretovariate(1.2)) - 1, len(LOCATIONS) - 1)],
+            "interests": json.dumps(rng.sample(INTERESTS, rng.randint(1, 5))),
+        }
+        for n in range(count)
+    ]
+
+
+def full_scan(user, rows, limit):
+    # What suggested_matches did before the index: every row, every request
+    suggestions = []
+    for row in rows:
+        if row["id"] == user["id"]:
+            continue
+        candidate = dict(row, interests=json.loads(row["interests"]))
+        common = set(user["interests"]) & set(candidate["interests"])
+        score, within_age_range, same_location = match_score(user, candidate, len(common))
+        suggestions.append({"id": candidate["id"], "common_interests": list(common), "match_score": score,
+                            "within_age_range": within_age_range, "same_location": same_location})
+    suggestions.sort(key=lambda s: s["match_score"], reverse=True)
+    return suggestions[:limit]
+
+
+class Postings:
+    def __init__(self, rows):
+        self.by_id = {row["id"]: row for row in rows}
+        self.by_interest = defaultdict(list)
+        self.by_location = defaultdict(list)
+        self.by_age = defaultdict(list)
+        for row in rows:
+            for interest in json.loads(row["interests"]):
+                self.by_interest[interest].append(row["id"])
+            self.by_location[row["location"]].append(row["id"])
+            self.by_age[row["age"]].append(row["id"])
+
+    def candidates(self, user):
+        common = defaultdict(int)
+        for interest in set(user["interests"]):
+            for user_id in self.by_interest[interest]:
+                common[user_id] += 1
+        nearby = list(self.by_location[user["location"]])
+        for age in range(user["age"] - AGE_RANGE, user["age"] + AGE_RANGE + 1):
+            nearby.extend(self.by_age[age])
+        return common, nearby
+
+
+def indexed(user, postings, limit):
+    # Mirrors matching.top_matches with the SQL lookups swapped for dicts
+    common, nearby = postings.candidates(user)
+    common.pop(user["id"], None)
+    scores = dict(common)
+    for user_id in nearby:
+        if user_id != user["id"]:
+            scores[user_id] = match_score(user, postings.by_id[user_id], common.get(user_id, 0))[0]
+
+    matches = []
+    for score, user_id in select_top(scores, limit):
+        candidate = postings.by_id[user_id]
+        shared = set(user["interests"]) & set(json.loads(candidate["interests"]))
+        matches.append({"id": user_id, "common_interests": sorted(shared), "match_score": score})
+    return matches, len(scores)
+
+
+def summarize(samples):
+    samples = sorted(samples)
+    return {
+        "median_ms": round(statistics.median(samples) * 1000, 3),
+        "p95_ms": round(samples[int(len(samples) * 0.95) - 1] * 1000, 3),
+    }
+
+
+def run_memory(args):
+    rows = generate_users(args.users, args.seed)
+    started = time.perf_counter()
+    postings = Postings(rows)
+    build_seconds = time.perf_counter() - started
+
+    rng = random.Random(args.seed + 1)
+    queries = [dict(row, interests=json.loads(row["interests"])) for row in rng.sample(rows, args.queries)]
+
+    scan_times, index_times, candidate_counts = [], [], []
+    for user in queries:
+        started = time.perf_counter()
+        expected = full_scan(user, rows, args.limit)
+        scan_times.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        matches, candidates = indexed(user, postings, args.limit)
+        index_times.append(time.perf_counter() - started)
+        candidate_counts.append(candidates)
+
+        # Same scores in the same order; ids may differ only within ties
+        assert [m["match_score"] for m in matches] == [m["match_score"] for m in expected]
+
+    return {
+        "users": args.users,
+        "queries": args.queries,
+        "limit": args.limit,
+        "index_build_seconds": round(build_seconds, 3),
+        "mean_candidates": round(statistics.mean(candidate_counts)),
+        "full_scan": summarize(scan_times),
+        "indexed_top_k": summarize(index_times),
+    }
+
+
+async def run_db(args):
+    from database import async_db_connection, pool
+    from matching import top_matches
+
+    pool.prewarm()
+    async with async_db_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        await cursor.execute("SELECT id, age, location, interests FROM users ORDER BY RAND() LIMIT %s", (args.queries,))
+        queries = await cursor.fetchall()
+
+        times = []
+        for user in queries:
+            started = time.perf_counter()
+            await top_matches(cursor, user, args.limit)
+            times.append(time.perf_counter() - started)
+        await cursor.close()
+    pool.close()
+
+    return {"queries": len(times), "limit": args.limit, "top_matches": summarize(times)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mode", choices=["memory", "db"], default="memory")
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    results = run_memory(args) if args.mode == "memory" else asyncio.run(run_db(args))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
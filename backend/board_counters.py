@@ -0,0 +1,118 @@
+# board_counters.py
+"""Denormalized per-board counters and their repair job.
+
+boards.stage_count, item_count, completed_count (items whose status is
+"Done") and progress_sum (the sum of item progress, so the board's progress
+is progress_sum / item_count) are kept current by the board write endpoints
+in the same transaction as the write. Board listings read them directly
+instead of counting through stages and items.
+
+If they ever drift (a manual fix in SQL, a bug), recompute them with:
+
+    python board_counters.py repair             # every board
+    python board_counters.py repair --board ID  # one board
+"""
+import argparse
+
+from database import db_connection
+
+COMPLETED_STATUS = "Done"
+
+# Boards recounted per transaction
+BATCH_SIZE = 500
+
+
+def item_counts(status, progress) -> tuple:
+    """An item's contribution to (completed_count, progress_sum)."""
+    return int(status == COMPLETED_STATUS), progress or 0
+
+
+async def adjust_counters(cursor, board_id: str, stages: int = 0, items: int = 0, completed: int = 0, progress: int = 0):
+    """Apply counter deltas in the caller's transaction (an AsyncCursor).
+
+    Board writers call this after bumping the board's version, which
+    already holds the board row lock.
+    """
+    if stages or items or completed or progress:
+        await cursor.execute("""
+            UPDATE boards
+            SET stage_count = stage_count + %s, item_count = item_count + %s,
+                completed_count = completed_count + %s, progress_sum = progress_sum + %s
+            WHERE id = %s
+        """, (stages, items, completed, progress, board_id))
+
+
+def recount(cursor, board_ids) -> int:
+    """Recompute the counters of ``board_ids``; returns how many were wrong.
+
+    Locks the board rows first, as every board writer does, so no write can
+    change the counts between the recount and the update.
+    """
+    if not board_ids:
+        return 0
+    placeholders = ", ".join(["%s"] * len(board_ids))
+    cursor.execute(f"SELECT id FROM boards WHERE id IN ({placeholders}) FOR UPDATE", tuple(board_ids))
+    cursor.fetchall()
+
+    cursor.execute(f"""
+        UPDATE boards b
+        LEFT JOIN (
+            SELECT board_id, COUNT(*) AS stage_count
+            FROM stages
+            WHERE board_id IN ({placeholders})
+            GROUP BY board_id
+        ) sc ON sc.board_id = b.id
+        LEFT JOIN (
+            SELECT s.board_id,
+                   COUNT(*) AS item_count,
+                   SUM(i.status = %s) AS completed_count,
+                   SUM(COALESCE(i.progress, 0)) AS progress_sum
+            FROM stages s
+            JOIN items i ON i.stage_id = s.id
+            WHERE s.board_id IN ({placeholders})
+            GROUP BY s.board_id
+        ) ic ON ic.board_id = b.id
+        SET b.stage_count = COALESCE(sc.stage_count, 0),
+            b.item_count = COALESCE(ic.item_count, 0),
+            b.completed_count = COALESCE(ic.completed_count, 0),
+            b.progress_sum = COALESCE(ic.progress_sum, 0)
+        WHERE b.id IN ({placeholders})
+    """, (*board_ids, COMPLETED_STATUS, *board_ids, *board_ids))
+    return cursor.rowcount
+
+
+def repair_all(cursor, commit=None) -> int:
+    """Recount every board in batches; ``commit`` is called after each one."""
+    repaired, last_id = 0, ""
+    while True:
+        cursor.execute("SELECT id FROM boards WHERE id > %s ORDER BY id LIMIT %s", (last_id, BATCH_SIZE))
+        board_ids = [row[0] for row in cursor.fetchall()]
+        if not board_ids:
+            return repaired
+        repaired += recount(cursor, board_ids)
+        if commit:
+            commit()
+        last_id = board_ids[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompute denormalized board counters")
+    parser.add_argument("command", choices=["repair"])
+    parser.add_argument("--board", help="repair only this board")
+    args = parser.parse_args()
+
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            if args.board:
+                repaired = recount(cursor, [args.board])
+                conn.commit()
+            else:
+                repaired = repair_all(cursor, conn.commit)
+        finally:
+            cursor.close()
+    print(f"Repaired counters on {repaired} board(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+# board_events.py
+"""Live board change events for WebSocket subscribers.
+
+Board write handlers call ``board_hub.publish(board_id, event)`` after they
+commit. The hub encodes the event once and hands it to its broker, which
+delivers it to every worker's hub, and each hub puts it on the queue of
+every local subscriber to that board.
+
+Delivery never waits on a subscriber: each one has a queue of
+BOARD_EVENTS_QUEUE_SIZE events, and a subscriber whose queue is full is
+dropped (its socket is closed with 1013, "try again later"). Clients resync
+with GET /boards/{id}/changes when they reconnect.
+
+Brokers (BOARD_EVENTS_BROKER):
+
+    local   events stay in this process; enough for a single worker
+    relay   events also go through a relay process shared by all workers
+            on the host (BOARD_EVENTS_RELAY, host:port), started with
+
+                python board_events.py relay
+
+Another broker (Redis pub/sub, say) only needs ``start(deliver)``,
+``publish(board_id, message)``, ``close()`` and ``stats()``.
+"""
+import argparse
+import asyncio
+import json
+
+from config import Settings
+
+# How long the relay broker waits before reconnecting
+RECONNECT_SECONDS = 1.0
+
+# The relay drops a worker that has this much unsent data queued
+RELAY_MAX_BUFFER = 1024 * 1024
+
+
+class Subscriber:
+    def __init__(self, board_id: str, max_queue: int):
+        self.board_id = board_id
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.dropped = False
+
+    async def get(self):
+        """Next encoded event, or None once the subscriber has been dropped."""
+        return await self.queue.get()
+
+
+class LocalBroker:
+    def __init__(self):
+        self._deliver = None
+
+    async def start(self, deliver):
+        self._deliver = deliver
+
+    def publish(self, board_id: str, message: str):
+        # Nobody can be subscribed before start()
+        if self._deliver is None:
+            return
+        self._deliver(board_id, message)
+
+    async def close(self):
+        pass
+
+    def stats(self) -> dict:
+        return {"broker": "local"}
+
+
+class RelayBroker:
+    """Shares events with the other workers through ``python board_events.py relay``.
+
+    Events are delivered locally straight away and forwarded to the relay
+    by a background task; the relay passes them to every other worker. While
+    the relay is unreachable, other workers miss events (up to
+    ``max_queue`` are held for it, then the oldest go first).
+    """
+
+    def __init__(self, host: str, port: int, max_queue: int = 1000):
+        self.host = host
+        self.port = port
+        self.max_queue = max_queue
+        self._deliver = None
+        self._outgoing = None
+        self._task = None
+        self.connected = False
+        self.dropped = 0
+
+    async def start(self, deliver):
+        # The queue is made here, on the serving loop
+        self._deliver = deliver
+        self._outgoing = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.create_task(self._run())
+
+    def publish(self, board_id: str, message: str):
+        # Nobody can be subscribed before start(), here or on the relay
+        if self._deliver is None:
+            return
+        self._deliver(board_id, message)
+        if self._outgoing.full():
+            self._outgoing.get_nowait()
+            self.dropped += 1
+        self._outgoing.put_nowait(json.dumps([board_id, message]).encode() + b"\n")
+
+    async def _run(self):
+        while True:
+            try:
+                reader, writer = await asyncio.open_connection(self.host, self.port)
+            except OSError:
+                await asyncio.sleep(RECONNECT_SECONDS)
+                continue
+
+            self.connected = True
+            receiving = asyncio.create_task(self._receive(reader))
+            try:
+                while True:
+                    # Wait for the next event, or for the relay to hang up
+                    sending = asyncio.ensure_future(self._outgoing.get())
+                    await asyncio.wait({sending, receiving}, return_when=asyncio.FIRST_COMPLETED)
+                    if not sending.done():
+                        sending.cancel()
+                        break
+                    writer.write(sending.result())
+                    await writer.drain()
+            except OSError:
+                pass
+            finally:
+                self.connected = False
+                receiving.cancel()
+                writer.close()
+            await asyncio.sleep(RECONNECT_SECONDS)
+
+    async def _receive(self, reader):
+        try:
+            async for line in reader:
+                board_id, message = json.loads(line)
+                self._deliver(board_id, message)
+        except (OSError, ValueError):
+            pass
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "broker": "relay",
+            "connected": self.connected,
+            "outgoing": self._outgoing.qsize(),
+            "dropped": self.dropped,
+        }
+
+
+class BoardHub:
+    def __init__(self, broker, max_queue: int):
+        self.broker = broker
+        self.max_queue = max_queue
+        self._subscribers = {}  # board id -> set of Subscriber
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    async def start(self):
+        await self.broker.start(self._deliver)
+
+    async def shutdown(self):
+        await self.broker.close()
+        for subscribers in list(self._subscribers.values()):
+            for subscriber in list(subscribers):
+                self._drop(subscriber)
+
+    def subscribe(self, board_id: str) -> Subscriber:
+        subscriber = Subscriber(board_id, self.max_queue)
+        self._subscribers.setdefault(board_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        subscribers = self._subscribers.get(subscriber.board_id)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self._subscribers[subscriber.board_id]
+
+    def publish(self, board_id: str, event: dict):
+        """Send ``event`` to the board's subscribers in every worker; never blocks."""
+        self.published += 1
+        self.broker.publish(board_id, json.dumps({"board_id": board_id, **event}, separators=(",", ":")))
+
+    def _deliver(self, board_id: str, message: str):
+        for subscriber in list(self._subscribers.get(board_id, ())):
+            try:
+                subscriber.queue.put_nowait(message)
+                self.delivered += 1
+            except asyncio.QueueFull:
+                self._drop(subscriber)
+
+    def _drop(self, subscriber: Subscriber):
+        # Too slow to keep up: discard its backlog and wake it with None
+        self.unsubscribe(subscriber)
+        subscriber.dropped = True
+        self.dropped += 1
+        while not subscriber.queue.empty():
+            subscriber.queue.get_nowait()
+        subscriber.queue.put_nowait(None)
+
+    def stats(self) -> dict:
+        return {
+            "boards": len(self._subscribers),
+            "subscribers": sum(len(subscribers) for subscribers in self._subscribers.values()),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            **self.broker.stats(),
+        }
+
+
+def _relay_address(address: str) -> tuple:
+    host, _, port = address.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+def _make_broker():
+    if Settings.BOARD_EVENTS_BROKER == "relay":
+        return RelayBroker(*_relay_address(Settings.BOARD_EVENTS_RELAY))
+    if Settings.BOARD_EVENTS_BROKER != "local":
+        raise ValueError(f"Unknown BOARD_EVENTS_BROKER {Settings.BOARD_EVENTS_BROKER!r}")
+    return LocalBroker()
+
+
+board_hub = BoardHub(_make_broker(), Settings.BOARD_EVENTS_QUEUE_SIZE)
+
+
+async def relay(host: str, port: int):
+    """Pass every line a worker sends to all the other connected workers."""
+    workers = set()
+
+    async def handle(reader, writer):
+        workers.add(writer)
+        try:
+            async for line in reader:
+                for other in list(workers):
+                    if other is writer:
+                        continue
+                    if other.transport.get_write_buffer_size() > RELAY_MAX_BUFFER:
+                        workers.discard(other)
+                        other.close()
+                        continue
+                    other.write(line)
+        except ConnectionError:
+            pass
+        finally:
+            workers.discard(writer)
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    print(f"Relaying board events on {host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Board event relay shared by the workers on this host")
+    parser.add_argument("command", choices=["relay"])
+    parser.add_argument("--address", default=Settings.BOARD_EVENTS_RELAY, help="host:port to listen on")
+    args = parser.parse_args()
+    asyncio.run(relay(*_relay_address(args.address)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,379 @@
+# board_transfer.py
+"""Board export and import as newline-delimited JSON.
+
+An export is one JSON object per line:
+
+    {"type": "board", "format": 1, "title": ..., "created_at": ...}
+    {"type": "stage", "id": ..., "title": ..., "position": ...}     every stage first
+    {"type": "item", "id": ..., "stage_id": ..., ...}               by stage, then position
+    {"type": "activity", "item_id": ..., "text": ..., ...}          right after its item
+    {"type": "end", "stages": n, "items": n, "activities": n}
+
+Rows are read from an unbuffered (server-side) cursor FETCH_SIZE at a time,
+so an export holds one batch in memory however big the board is. Because
+each item's activities follow it, an import only has to remember the board's
+stage ids and the item it is on. Imported rows get new ids, are written in
+transactions of up to IMPORT_BATCH_SIZE rows with the board counters kept
+in step, and a failed import removes whatever it had committed. Attachment
+blobs are not part of an export; activity file entries keep their URLs.
+
+From backend/:
+
+    python board_transfer.py export BOARD_ID > board.ndjson
+    python board_transfer.py import --user USER_ID [--title TITLE] board.ndjson
+"""
+import argparse
+import asyncio
+import json
+import secrets
+import sys
+from datetime import datetime
+
+from slugify import slugify
+
+from board_counters import adjust_counters, item_counts
+from database import async_db_connection, pool
+from ordering import POSITION_GAP
+
+FORMAT_VERSION = 1
+
+FETCH_SIZE = 500
+
+IMPORT_BATCH_SIZE = 1000
+
+# Longest line an import accepts; the whole line is buffered before parsing
+MAX_LINE_BYTES = 1024 * 1024
+
+# Longest title slug in a board id. With the "-<timestamp>" suffix a board id
+# stays within 36 characters, leaving room in stages.id (VARCHAR(50)) for the
+# stage ids built from it ("newbie_<id>", "stage-<n>_<id>").
+BOARD_SLUG_LENGTH = 25
+
+ITEM_FIELDS = ("id", "stage_id", "content", "description", "status", "progress", "subtasks", "position", "created_at")
+ACTIVITY_FIELDS = ("text", "timestamp", "file")
+
+
+class BoardImportError(ValueError):
+    pass
+
+
+def _line(record: dict) -> bytes:
+    return json.dumps(record, default=_json_default, separators=(",", ":")).encode() + b"\n"
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _json_column(value):
+    if isinstance(value, (bytes, bytearray)):
+        value = value.decode()
+    return json.loads(value) if value else None
+
+
+async def export_lines(board_id: str):
+    """Yield the export of ``board_id`` as NDJSON chunks; the board must exist."""
+    async with async_db_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            # fetchall even for one row: an unbuffered cursor has to read the
+            # whole result before the next statement
+            await cursor.execute("SELECT title, created_at FROM boards WHERE id = %s", (board_id,))
+            (title, created_at), = await cursor.fetchall()
+            yield _line({"type": "board", "format": FORMAT_VERSION, "title": title, "created_at": created_at})
+
+            counts = {"stages": 0, "items": 0, "activities": 0}
+            await cursor.execute(
+                "SELECT id, title, position FROM stages WHERE board_id = %s ORDER BY position, id",
+                (board_id,)
+            )
+            while True:
+                rows = await cursor.fetchmany(FETCH_SIZE)
+                if not rows:
+                    break
+                counts["stages"] += len(rows)
+                yield b"".join(
+                    _line({"type": "stage", "id": stage_id, "title": stage_title, "position": position})
+                    for stage_id, stage_title, position in rows
+                )
+
+            # One row per activity (or per item without any); the item's
+            # columns repeat, and a new item id starts a new item line
+            columns = ", ".join([f"i.{field}" for field in ITEM_FIELDS] + [f"a.{field}" for field in ACTIVITY_FIELDS])
+            await cursor.execute(f"""
+                SELECT {columns}, a.id IS NOT NULL
+                FROM stages s
+                JOIN items i ON i.stage_id = s.id
+                LEFT JOIN item_activities a ON a.item_id = i.id
+                WHERE s.board_id = %s
+                ORDER BY s.position, s.id, i.position, i.id, a.timestamp, a.id
+            """, (board_id,))
+            current = None
+            while True:
+                rows = await cursor.fetchmany(FETCH_SIZE)
+                if not rows:
+                    break
+                chunk = []
+                for row in rows:
+                    item = dict(zip(ITEM_FIELDS, row))
+                    if item["id"] != current:
+                        current = item["id"]
+                        counts["items"] += 1
+                        item["subtasks"] = _json_column(item["subtasks"]) or []
+                        chunk.append(_line({"type": "item", **item}))
+                    if row[-1]:
+                        activity = dict(zip(ACTIVITY_FIELDS, row[len(ITEM_FIELDS):-1]))
+                        activity["file"] = _json_column(activity["file"])
+                        counts["activities"] += 1
+                        chunk.append(_line({"type": "activity", "item_id": current, **activity}))
+                yield b"".join(chunk)
+
+            yield _line({"type": "end", **counts})
+        finally:
+            await cursor.close()
+
+
+async def iter_lines(chunks, max_length: int = MAX_LINE_BYTES):
+    """Split an async iterable of byte chunks into lines.
+
+    Raises BoardImportError as soon as a line grows past ``max_length``, so
+    a body without newlines is never buffered whole.
+    """
+    pending = b""
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        if len(pending) > max_length or any(len(line) > max_length for line in lines):
+            raise BoardImportError(f"line longer than {max_length} bytes")
+        for line in lines:
+            yield line
+    if pending:
+        yield pending
+
+
+class _Importer:
+    def __init__(self, conn, cursor, board_id: str):
+        self.conn = conn
+        self.cursor = cursor
+        self.board_id = board_id
+        self.token = secrets.token_hex(4)
+        self.stage_ids = {}  # exported id -> new id
+        self.item = None  # (exported id, new id) of the last item
+        self.stages, self.items, self.activities = [], [], []
+        self.counts = {"stages": 0, "items": 0, "activities": 0}
+        self.counters = {"stages": 0, "items": 0, "completed": 0, "progress": 0}
+
+    def add_stage(self, record: dict):
+        if self.counts["items"] or self.items:
+            raise BoardImportError("stage after the first item")
+        # Ends in the board id, like every stage id
+        new_id = f"stage-{len(self.stage_ids)}_{self.board_id}"
+        self.stage_ids[record["id"]] = new_id
+        # Stages arrive in display order; numbering them afresh keeps the
+        # positions unique on the new board whatever the file says
+        self.stages.append((new_id, self.board_id, record["title"], len(self.stage_ids) * POSITION_GAP))
+        self.counters["stages"] += 1
+
+    def add_item(self, record: dict):
+        stage_id = self.stage_ids.get(record.get("stage_id"))
+        if stage_id is None:
+            raise BoardImportError(f"item {record.get('id')!r} is in an unknown stage")
+        new_id = f"item_{self.token}_{self.counts['items'] + len(self.items)}"
+        self.item = (record["id"], new_id)
+        self.items.append((
+            new_id, record["content"], stage_id, record.get("description"), record.get("status"),
+            record.get("progress"), json.dumps(record.get("subtasks") or []), record["position"]
+        ))
+        completed, progress = item_counts(record.get("status"), record.get("progress"))
+        self.counters["items"] += 1
+        self.counters["completed"] += completed
+        self.counters["progress"] += progress
+
+    def add_activity(self, record: dict):
+        if self.item is None or record.get("item_id") != self.item[0]:
+            raise BoardImportError("activity does not follow its item")
+        timestamp = datetime.fromisoformat(record["timestamp"])
+        file = record.get("file")
+        self.activities.append((self.item[1], record["text"], timestamp, json.dumps(file) if file is not None else None))
+
+    def pending(self) -> int:
+        return len(self.stages) + len(self.items) + len(self.activities)
+
+    async def flush(self):
+        # One transaction: parents before children, then the counters
+        if self.stages:
+            await self.cursor.executemany(
+                "INSERT INTO stages (id, board_id, title, position) VALUES (%s, %s, %s, %s)", self.stages
+            )
+        if self.items:
+            await self.cursor.executemany(
+                """INSERT INTO items (id, content, stage_id, description, status, progress, subtasks, position)
+                   VALUES (%s, %s, %s, %s, %s, %s, %s, %s)""",
+                self.items
+            )
+        if self.activities:
+            await self.cursor.executemany(
+                "INSERT INTO item_activities (item_id, text, timestamp, file) VALUES (%s, %s, %s, %s)",
+                self.activities
+            )
+        await adjust_counters(self.cursor, self.board_id, **self.counters)
+        await self.conn.commit()
+
+        self.counts["stages"] += len(self.stages)
+        self.counts["items"] += len(self.items)
+        self.counts["activities"] += len(self.activities)
+        self.stages, self.items, self.activities = [], [], []
+        self.counters = dict.fromkeys(self.counters, 0)
+
+
+async def new_board_id(cursor, title: str) -> str:
+    """An unused board id derived from ``title``."""
+    board_id = slugify(title)[:BOARD_SLUG_LENGTH].rstrip("-") or "board"
+    await cursor.execute("SELECT id FROM boards WHERE id = %s", (board_id,))
+    if await cursor.fetchone():
+        board_id = f"{board_id}-{int(datetime.now().timestamp())}"
+    return board_id
+
+
+async def _remove_board(conn, cursor, board_id: str):
+    await conn.rollback()
+    # Activities and attachments go with their items (ON DELETE CASCADE)
+    await cursor.execute(
+        "DELETE i FROM items i JOIN stages s ON s.id = i.stage_id WHERE s.board_id = %s", (board_id,)
+    )
+    await cursor.execute("DELETE FROM stages WHERE board_id = %s", (board_id,))
+    await cursor.execute("DELETE FROM boards WHERE id = %s", (board_id,))
+    await conn.commit()
+
+
+async def import_board(conn, lines, user_id: str, title=None, progress=None) -> dict:
+    """Create a board for ``user_id`` from an export read from ``lines``.
+
+    ``lines`` is an async iterable of NDJSON lines (str or bytes).
+    ``progress``, if given, is called with the running counts after every
+    committed batch. Raises BoardImportError for a malformed or truncated
+    export, after removing the partly imported board.
+    """
+    cursor = conn.cursor()
+    importer = None
+    number = 0
+    try:
+        end = None
+        async for line in lines:
+            number += 1
+            if not line.strip():
+                continue
+            if end is not None:
+                raise BoardImportError("data after the end record")
+            try:
+                record = json.loads(line)
+                kind = record["type"]
+            except (ValueError, TypeError, KeyError):
+                raise BoardImportError("not a JSON record with a type")
+
+            if importer is None:
+                if kind != "board" or record.get("format") != FORMAT_VERSION:
+                    raise BoardImportError(f"expected a format {FORMAT_VERSION} board record")
+                board_title = title or record["title"]
+                board_id = await new_board_id(cursor, board_title)
+                await cursor.execute(
+                    "INSERT INTO boards (id, user_id, title) VALUES (%s, %s, %s)",
+                    (board_id, user_id, board_title)
+                )
+                importer = _Importer(conn, cursor, board_id)
+                continue
+
+            try:
+                if kind == "stage":
+                    importer.add_stage(record)
+                elif kind == "item":
+                    importer.add_item(record)
+                elif kind == "activity":
+                    importer.add_activity(record)
+                elif kind == "end":
+                    end = record
+                else:
+                    raise BoardImportError(f"unknown record type {kind!r}")
+            except (KeyError, TypeError, ValueError) as e:
+                if isinstance(e, BoardImportError):
+                    raise
+                raise BoardImportError(f"invalid {kind} record: {e!r}")
+
+            if importer.pending() >= IMPORT_BATCH_SIZE:
+                await importer.flush()
+                if progress:
+                    progress(dict(importer.counts))
+
+        if importer is None:
+            raise BoardImportError("empty export")
+        await importer.flush()
+        if end is None:
+            raise BoardImportError("truncated export: no end record")
+        expected = {key: end.get(key) for key in importer.counts}
+        if expected != importer.counts:
+            raise BoardImportError(f"export announces {expected} but contains {importer.counts}")
+        if progress:
+            progress(dict(importer.counts))
+        return {"id": importer.board_id, "title": board_title, **importer.counts}
+    except BoardImportError as e:
+        if importer is not None:
+            await _remove_board(conn, cursor, importer.board_id)
+        raise BoardImportError(f"line {number}: {e}") from None
+    except Exception:
+        if importer is not None:
+            await _remove_board(conn, cursor, importer.board_id)
+        raise
+    finally:
+        await cursor.close()
+
+
+async def _file_lines(path):
+    with open(path, "rb") as f:
+        for line in f:
+            yield line
+
+
+async def _run(args):
+    pool.prewarm()
+    try:
+        if args.command == "export":
+            async with async_db_connection() as conn:
+                cursor = conn.cursor()
+                await cursor.execute("SELECT 1 FROM boards WHERE id = %s", (args.board_id,))
+                found = await cursor.fetchone()
+                await cursor.close()
+            if not found:
+                sys.exit(f"No board {args.board_id!r}")
+            async for chunk in export_lines(args.board_id):
+                sys.stdout.buffer.write(chunk)
+        else:
+            def report(counts):
+                print(f"imported {counts['stages']} stages, {counts['items']} items, "
+                      f"{counts['activities']} activities", file=sys.stderr)
+
+            async with async_db_connection() as conn:
+                try:
+                    board = await import_board(conn, _file_lines(args.file), args.user, args.title, report)
+                except BoardImportError as e:
+                    sys.exit(f"Import failed: {e}")
+            print(json.dumps(board))
+    finally:
+        pool.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export or import a board as NDJSON")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export", help="write a board to stdout")
+    export.add_argument("board_id")
+    load = commands.add_parser("import", help="create a board from an export file")
+    load.add_argument("file")
+    load.add_argument("--user", required=True, help="owner of the new board")
+    load.add_argument("--title", help="title for the new board (default: the exported one)")
+    asyncio.run(_run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
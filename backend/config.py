@@ -8,10 +8,54 @@ class Settings:
     DB_USER: str = os.getenv("DB_USER", "root")
     DB_PASSWORD: str = os.getenv("DB_PASSWORD", "")
     DB_NAME: str = os.getenv("DB_NAME", "spiritual_journey")
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "10"))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", "5"))
+    DB_POOL_PING_INTERVAL: float = float(os.getenv("DB_POOL_PING_INTERVAL", "30"))
+    # Set to false when migrations run as a separate deploy step (python migrations.py)
+    RUN_MIGRATIONS_ON_STARTUP: bool = os.getenv("RUN_MIGRATIONS_ON_STARTUP", "true").lower() in ("1", "true", "yes")
     API_PORT: int = int(os.getenv("API_PORT", "8000"))
     SECRET_KEY: str = os.getenv("SECRET_KEY", "your-secret-key-here")
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    # bcrypt cost factor; hashes made with another cost are upgraded on next login
+    BCRYPT_ROUNDS: int = int(os.getenv("BCRYPT_ROUNDS", "12"))
+    BCRYPT_WORKERS: int = int(os.getenv("BCRYPT_WORKERS", "2"))
+    BCRYPT_MAX_QUEUE: int = int(os.getenv("BCRYPT_MAX_QUEUE", "32"))
+    BOARD_CACHE_MAX_BYTES: int = int(os.getenv("BOARD_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    USER_CACHE_SIZE: int = int(os.getenv("USER_CACHE_SIZE", "10000"))
+    USER_CACHE_TTL: float = float(os.getenv("USER_CACHE_TTL", "60"))
+    # Let read-only endpoints build the current user from the JWT's profile
+    # claims instead of looking it up (claims may be stale until the token expires)
+    AUTH_TRUST_TOKEN_CLAIMS: bool = os.getenv("AUTH_TRUST_TOKEN_CLAIMS", "false").lower() in ("1", "true", "yes")
+    UPLOAD_DIR: str = os.getenv("UPLOAD_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "uploads"))
+    UPLOAD_MAX_BYTES: int = int(os.getenv("UPLOAD_MAX_BYTES", str(25 * 1024 * 1024)))
+    UPLOAD_CHUNK_SIZE: int = int(os.getenv("UPLOAD_CHUNK_SIZE", str(64 * 1024)))
+    # Suggested matches kept per user in match_scores
+    MATCH_LIST_SIZE: int = int(os.getenv("MATCH_LIST_SIZE", "200"))
+    MATCH_REFRESH_INTERVAL: float = float(os.getenv("MATCH_REFRESH_INTERVAL", "5"))
+    MATCH_REFRESH_BATCH: int = int(os.getenv("MATCH_REFRESH_BATCH", "50"))
+    # JSON responses at least RESPONSE_COMPRESSION_MIN_BYTES long are compressed
+    # with the first of these the client accepts ("br" needs the brotli package);
+    # empty turns compression off
+    RESPONSE_COMPRESSION: str = os.getenv("RESPONSE_COMPRESSION", "br,gzip")
+    RESPONSE_COMPRESSION_MIN_BYTES: int = int(os.getenv("RESPONSE_COMPRESSION_MIN_BYTES", "1024"))
+    GZIP_LEVEL: int = int(os.getenv("GZIP_LEVEL", "6"))
+    BROTLI_QUALITY: int = int(os.getenv("BROTLI_QUALITY", "4"))
+    # SQL statements at least this slow are logged to stderr; 0 turns the log off
+    SLOW_QUERY_MS: float = float(os.getenv("SLOW_QUERY_MS", "250"))
+    # Discipler dashboards may lag board writes by up to this many seconds
+    DASHBOARD_CACHE_TTL: float = float(os.getenv("DASHBOARD_CACHE_TTL", "15"))
+    DASHBOARD_CACHE_SIZE: int = int(os.getenv("DASHBOARD_CACHE_SIZE", "1000"))
+    # "local" (one worker) or "relay" (workers share events via python board_events.py relay)
+    BOARD_EVENTS_BROKER: str = os.getenv("BOARD_EVENTS_BROKER", "local")
+    BOARD_EVENTS_RELAY: str = os.getenv("BOARD_EVENTS_RELAY", "127.0.0.1:8765")
+    # Events held per WebSocket subscriber before it is dropped as too slow
+    BOARD_EVENTS_QUEUE_SIZE: int = int(os.getenv("BOARD_EVENTS_QUEUE_SIZE", "100"))
+    THUMBNAIL_MAX_PX: int = int(os.getenv("THUMBNAIL_MAX_PX", "320"))
+    THUMBNAIL_WORKERS: int = int(os.getenv("THUMBNAIL_WORKERS", "1"))
+    THUMBNAIL_MAX_QUEUE: int = int(os.getenv("THUMBNAIL_MAX_QUEUE", "1000"))
+    # Images with more pixels than this are not decoded at all
+    THUMBNAIL_MAX_PIXELS: int = int(os.getenv("THUMBNAIL_MAX_PIXELS", str(50_000_000)))
 
     @property
     def DB_URL(self):
@@ -1,70 +1,258 @@
 # database.py
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from functools import partial
+
 from fastapi import HTTPException
 from mysql.connector import Error
 import mysql.connector
 from config import Settings
+from metrics import current_route, timed
 
-def get_db_connection():
-    try:
-        conn = mysql.connector.connect(
-            host=Settings.DB_HOST,
-            user=Settings.DB_USER,
-            password=Settings.DB_PASSWORD,
-            database=Settings.DB_NAME
-        )
+
+class ConnectionPool:
+    """Fixed-size pool of MySQL connections shared by every router.
+
+    Connections are created lazily up to ``size`` (or up front by
+    ``prewarm``), handed out LIFO so the hottest connection is reused first,
+    pinged on borrow when they have been idle for longer than
+    ``ping_interval`` seconds, and rolled back on release so no snapshot or
+    half-finished transaction leaks into the next request.
+    """
+
+    def __init__(self, size: int, timeout: float, ping_interval: float):
+        self.size = size
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self._waiting = 0
+        self._created = 0
+        self._discarded = 0
+        self._timeouts = 0
+        self._acquired = 0
+
+    def _connect(self):
+        try:
+            conn = mysql.connector.connect(
+                host=Settings.DB_HOST,
+                user=Settings.DB_USER,
+                password=Settings.DB_PASSWORD,
+                database=Settings.DB_NAME
+            )
+        except Error as e:
+            print(f"Error connecting to MySQL: {e}")
+            raise HTTPException(status_code=500, detail="Database connection error")
+        with self._lock:
+            self._created += 1
         return conn
-    except Error as e:
-        raise HTTPException(status_code=500, detail="Database connection error")
 
-def init_db():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
+    def _discard(self, conn):
+        with self._lock:
+            self._discarded += 1
+        try:
+            conn.close()
+        except Error:
+            pass
+
+    def prewarm(self):
+        # Open every connection at startup so the first requests don't pay
+        # the TCP + auth handshake
+        missing = self.size - self._idle.qsize() - self._in_use
+        for _ in range(max(missing, 0)):
+            self._idle.put((self._connect(), time.monotonic()))
+
+    def acquire(self, timeout: float = None):
+        timeout = self.timeout if timeout is None else timeout
+        with self._lock:
+            self._waiting += 1
+        got_slot = self._slots.acquire(timeout=timeout)
+        with self._lock:
+            self._waiting -= 1
+            if not got_slot:
+                self._timeouts += 1
+        if not got_slot:
+            raise HTTPException(status_code=503, detail="Database connection pool exhausted")
+
+        try:
+            conn = self._checkout()
+        except BaseException:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._in_use += 1
+            self._acquired += 1
+        return conn
+
+    def _checkout(self):
+        while True:
+            try:
+                conn, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+
+            if time.monotonic() - last_used < self.ping_interval:
+                return conn
+            try:
+                conn.ping(reconnect=True, attempts=1, delay=0)
+                return conn
+            except Error:
+                self._discard(conn)
+
+    def release(self, conn):
+        try:
+            # Ends the implicit read snapshot as well as any uncommitted writes
+            conn.rollback()
+            self._idle.put((conn, time.monotonic()))
+        except Error:
+            self._discard(conn)
+        finally:
+            with self._lock:
+                self._in_use -= 1
+            self._slots.release()
+
+    def close(self):
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": self.size,
+                "in_use": self._in_use,
+                "idle": self._idle.qsize(),
+                "waiting": self._waiting,
+                "created": self._created,
+                "discarded": self._discarded,
+                "timeouts": self._timeouts,
+                "acquired": self._acquired,
+            }
+
+
+pool = ConnectionPool(
+    size=Settings.DB_POOL_SIZE,
+    timeout=Settings.DB_POOL_TIMEOUT,
+    ping_interval=Settings.DB_POOL_PING_INTERVAL
+)
+
+
+@contextmanager
+def db_connection():
+    conn = pool.acquire()
     try:
-        # Create boards table first (if not exists)
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS boards (
-                id VARCHAR(50) PRIMARY KEY,
-                user_id VARCHAR(50) NOT NULL,
-                title VARCHAR(100) NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(id)
-            )
-        """)
-        
-        # Create stages table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS stages (
-                id VARCHAR(50) PRIMARY KEY,
-                board_id VARCHAR(50),
-                title VARCHAR(100) NOT NULL,
-                position INT NOT NULL DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (board_id) REFERENCES boards(id)
-            )
-        """)
-        
-        # Create items table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS items (
-                id VARCHAR(50) PRIMARY KEY,
-                content TEXT NOT NULL,
-                stage_id VARCHAR(50),
-                description TEXT,
-                status VARCHAR(50) DEFAULT 'In Progress',
-                progress INT DEFAULT 0,
-                subtasks JSON,
-                activities JSON,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-                FOREIGN KEY (stage_id) REFERENCES stages(id)
-            )
-        """)
-        
-        conn.commit()
-    except Error as e:
-        print(f"Error initializing database: {e}")
-        raise HTTPException(status_code=500, detail="Database initialization error")
+        yield conn
+    finally:
+        pool.release(conn)
+
+
+# Every blocking driver call made from an async handler runs on this
+# executor. It has one thread per pooled connection, and _async_slots keeps
+# at most that many connections checked out from the event loop, so a
+# request waiting on MySQL never stalls the loop or starves another request
+# of a thread.
+_executor = ThreadPoolExecutor(max_workers=Settings.DB_POOL_SIZE, thread_name_prefix="db")
+_async_slots = None
+
+
+async def run_db(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, partial(func, *args, **kwargs))
+
+
+class AsyncCursor:
+    """Awaitable mirror of a mysql.connector cursor.
+
+    Methods that talk to the server are coroutines run on the DB executor;
+    everything else (rowcount, lastrowid, column_names, ...) is passed
+    straight through to the wrapped cursor. Statements are timed into
+    metrics.py under the route being served.
+    """
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    async def execute(self, operation, params=None):
+        return await run_db(timed, current_route.get(), self._cursor.execute, operation, params)
+
+    async def executemany(self, operation, seq_params):
+        return await run_db(timed, current_route.get(), self._cursor.executemany, operation, seq_params)
+
+    async def fetchone(self):
+        return await run_db(self._cursor.fetchone)
+
+    async def fetchmany(self, size=1):
+        return await run_db(self._cursor.fetchmany, size)
+
+    async def fetchall(self):
+        return await run_db(self._cursor.fetchall)
+
+    async def close(self):
+        return await run_db(self._cursor.close)
+
+
+class AsyncConnection:
+    """Awaitable mirror of a pooled connection, as yielded by get_db.
+
+    ``cursor()`` takes the same arguments as the driver's and returns an
+    AsyncCursor, so route code keeps its shape and only gains ``await``.
+    ``run`` executes a plain function against the raw connection in one
+    executor hop, for blocks of statements that don't need the loop between
+    them.
+    """
+
+    def __init__(self, conn):
+        self.raw = conn
+
+    def cursor(self, **kwargs):
+        return AsyncCursor(self.raw.cursor(**kwargs))
+
+    async def commit(self):
+        return await run_db(self.raw.commit)
+
+    async def rollback(self):
+        return await run_db(self.raw.rollback)
+
+    async def run(self, func, *args, **kwargs):
+        return await run_db(func, self.raw, *args, **kwargs)
+
+
+@asynccontextmanager
+async def async_db_connection():
+    global _async_slots
+    if _async_slots is None:
+        _async_slots = asyncio.Semaphore(pool.size)
+
+    try:
+        await asyncio.wait_for(_async_slots.acquire(), timeout=pool.timeout)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=503, detail="Database connection pool exhausted")
+
+    try:
+        conn = await run_db(pool.acquire)
+        try:
+            yield AsyncConnection(conn)
+        finally:
+            await run_db(pool.release, conn)
     finally:
-        cursor.close()
-        conn.close()
\ No newline at end of file
+        _async_slots.release()
+
+
+async def get_db():
+    # FastAPI caches dependencies per request, so get_current_user and the
+    # handler share this single connection
+    async with async_db_connection() as conn:
+        yield conn
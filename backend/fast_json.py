@@ -0,0 +1,111 @@
+# fast_json.py
+"""JSON responses encoded straight to bytes, optionally compressed.
+
+Returning a dict or list from a route makes FastAPI walk it with
+jsonable_encoder, and validate it again against any response_model, before
+json.dumps runs. That is wasted work for rows that just came out of our own
+database. ``json_response`` encodes once, with orjson when it is installed
+(json otherwise). datetimes come out as ISO 8601 and Decimals from SUM()
+as numbers. The heavy read endpoints return it directly. A response_model
+on those routes still documents the schema but is no longer applied.
+
+Bodies of at least RESPONSE_COMPRESSION_MIN_BYTES are compressed with the
+first of RESPONSE_COMPRESSION ("br,gzip" by default) that the client
+accepts. br needs the brotli package and is skipped without it.
+"""
+import gzip
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Optional
+
+from fastapi import Response
+
+from config import Settings
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def _available(encoding: str) -> bool:
+    return encoding == "gzip" or (encoding == "br" and brotli is not None)
+
+
+ENCODINGS = tuple(
+    encoding for encoding in (part.strip() for part in Settings.RESPONSE_COMPRESSION.split(","))
+    if encoding and _available(encoding)
+)
+
+
+def negotiate(accept_encoding: Optional[str]) -> Optional[str]:
+    """The encoding to use for a client sending ``accept_encoding``, if any."""
+    if not accept_encoding or not ENCODINGS:
+        return None
+    accepted = set()
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = params.strip()
+        if quality.startswith("q="):
+            try:
+                if float(quality[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(name.strip().lower())
+    for encoding in ENCODINGS:
+        if encoding in accepted or "*" in accepted:
+            return encoding
+    return None
+
+
+def compress(body: bytes, encoding: Optional[str]) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=Settings.BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=Settings.GZIP_LEVEL, mtime=0)
+    return body
+
+
+def encoding_for(body: bytes, accept_encoding: Optional[str]) -> Optional[str]:
+    if len(body) < Settings.RESPONSE_COMPRESSION_MIN_BYTES:
+        return None
+    return negotiate(accept_encoding)
+
+
+def body_response(body: bytes, encoding: Optional[str], headers=None, status_code: int = 200) -> Response:
+    """A JSON Response for an already encoded (and possibly compressed) body."""
+    response = Response(content=body, status_code=status_code, headers=headers, media_type="application/json")
+    if ENCODINGS:
+        response.headers["Vary"] = "Accept-Encoding"
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def json_response(content, accept_encoding: Optional[str] = None, headers=None, status_code: int = 200) -> Response:
+    body = dumps(content)
+    encoding = encoding_for(body, accept_encoding)
+    return body_response(compress(body, encoding), encoding, headers, status_code)
@@ -1,9 +1,16 @@
 from fastapi import FastAPI, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from routes import auth, boards, users
-import mysql.connector
+from fastapi.responses import PlainTextResponse
+from routes import auth, boards, files, users
 from mysql.connector import Error
+from board_events import board_hub
 from config import settings
+from database import pool
+from migrations import migrate
+from match_scores import match_refresher
+from metrics import MetricsMiddleware, register_stats, render as render_metrics
+from passwords import hashing_pool
+from thumbnails import thumbnail_pipeline
 import os
 from datetime import datetime
 from routes.users import router as users_router
@@ -17,109 +24,49 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["*"]
+    # Named one by one: browsers ignore "*" on credentialed requests
+    expose_headers=["ETag", "X-Next-Cursor", "Content-Range", "Accept-Ranges", "Retry-After"]
 )
 
-def get_db_connection():
-    try:
-        conn = mysql.connector.connect(
-            host=settings.DB_HOST,
-            user=settings.DB_USER,
-            password=settings.DB_PASSWORD,
-            database=settings.DB_NAME
-        )
-        return conn
-    except Error as e:
-        print(f"Error connecting to MySQL: {e}")
-        raise HTTPException(status_code=500, detail="Database connection error")
+# Outermost, so request timings include the other middleware
+app.add_middleware(MetricsMiddleware)
 
-def init_db():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
-        # Create users table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                id VARCHAR(50) PRIMARY KEY,
-                name VARCHAR(100) NOT NULL,
-                role VARCHAR(50) NOT NULL,
-                age INT NOT NULL,
-                location VARCHAR(100) NOT NULL,
-                interests JSON,
-                email VARCHAR(100) UNIQUE NOT NULL,
-                password VARCHAR(255) NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        # Create boards table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS boards (
-                id VARCHAR(50) PRIMARY KEY,
-                user_id VARCHAR(50) NOT NULL,
-                title VARCHAR(100) NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(id)
-            )
-        """)
-        
-        # Create stages table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS stages (
-                id VARCHAR(50) PRIMARY KEY,
-                board_id VARCHAR(50) NOT NULL,
-                title VARCHAR(100) NOT NULL,
-                position INT NOT NULL DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (board_id) REFERENCES boards(id)
-            )
-        """)
-        
-        # Create items table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS items (
-                id VARCHAR(50) PRIMARY KEY,
-                content TEXT NOT NULL,
-                stage_id VARCHAR(50),
-                description TEXT,
-                status VARCHAR(50) DEFAULT 'In Progress',
-                progress INT DEFAULT 0,
-                subtasks JSON,
-                activities JSON,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (stage_id) REFERENCES stages(id)
-            )
-        """)
-        
-        # Create discipleship table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS discipleship (
-                id VARCHAR(50) PRIMARY KEY,
-                discipler_id VARCHAR(50),
-                disciple_id VARCHAR(50) UNIQUE,
-                start_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (discipler_id) REFERENCES users(id),
-                FOREIGN KEY (disciple_id) REFERENCES users(id)
-            )
-        """)
-        
-        conn.commit()
-    except Error as e:
-        print(f"Error initializing database: {e}")
-        raise HTTPException(status_code=500, detail="Database initialization error")
-    finally:
-        cursor.close()
-        conn.close()
+register_stats("db_pool", pool.stats)
+register_stats("bcrypt_pool", hashing_pool.stats)
+register_stats("board_snapshot_cache", boards.board_snapshots.stats)
+register_stats("user_cache", auth.user_cache.stats)
+register_stats("dashboard_cache", users.dashboard_cache.stats)
+register_stats("thumbnail_pipeline", thumbnail_pipeline.stats)
+register_stats("match_refresher", match_refresher.stats)
+register_stats("board_events", board_hub.stats)
 
-# Initialize database on startup
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+# Warm the connection pool and apply pending schema migrations on startup
 @app.on_event("startup")
 async def startup_event():
-    init_db()
+    pool.prewarm()
+    hashing_pool.start()
+    if settings.RUN_MIGRATIONS_ON_STARTUP:
+        migrate()
+    await thumbnail_pipeline.start()
+    match_refresher.start()
+    await board_hub.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await board_hub.shutdown()
+    await thumbnail_pipeline.shutdown()
+    await match_refresher.shutdown()
+    pool.close()
+    hashing_pool.shutdown()
 
 # Include routers
 app.include_router(auth.router, prefix="/auth")
 app.include_router(boards.router)
+app.include_router(files.router, tags=["Files"])
 app.include_router(users.router, prefix="/users", tags=["Users"])
 
 if __name__ == "__main__":
@@ -0,0 +1,397 @@
+# match_scores.py
+"""Precomputed suggested-matches lists.
+
+match_scores holds each user's best MATCH_LIST_SIZE candidates, as scored
+by matching.py, so GET /users/suggested-matches is a single index range
+read. Signup, a profile change to interests, age or location, and a new
+discipleship pairing add the user to match_score_queue in their own
+transaction. A MatchRefresher task in each worker process drains the
+queue in the background:
+
+* the user's own list is recomputed, and
+* because scores are symmetric, the user's new score is pushed into the
+  lists of everyone it affects. A list the user drops out of may need a
+  replacement from outside it, so that list's owner is queued for a
+  recompute of their own list only.
+
+match_lists marks the users whose list has been computed. Lists not built
+yet are left alone by the second step, and the endpoint scores those users
+live instead of serving a partial list.
+
+Run by hand with:
+
+    python match_scores.py rebuild        # recompute every list
+    python match_scores.py check          # compare stored lists with a live scoring
+"""
+import argparse
+import asyncio
+import json
+import sys
+
+from config import Settings
+from database import async_db_connection
+from matching import MATCH_COLUMNS as USER_MATCH_COLUMNS, candidate_scores, match_details, match_entry, select_top
+
+MATCH_COLUMNS = ("candidate_id", "score", "common_interests", "within_age_range", "same_location")
+
+# Ids per IN (...) list when touching other users' lists
+CHUNK_SIZE = 1000
+
+
+def _chunks(ids, size=CHUNK_SIZE):
+    ids = list(ids)
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+async def enqueue(cursor, user_id: str, reverse: bool = True):
+    """Queue ``user_id`` for a refresh; call in the transaction making the change.
+
+    ``reverse`` also pushes the user's scores into other users' lists, which
+    is needed whenever the user's own attributes changed.
+    """
+    await cursor.execute("""
+        INSERT INTO match_score_queue (user_id, reverse) VALUES (%s, %s)
+        ON DUPLICATE KEY UPDATE reverse = reverse OR VALUES(reverse), queued_at = CURRENT_TIMESTAMP(6)
+    """, (user_id, reverse))
+
+
+async def stored_matches(cursor, user_id: str, limit: int, after=None):
+    """Page of ``user_id``'s stored list; ``cursor`` must be a dict cursor.
+
+    Returns (matches, next_cursor), or (None, None) when the list hasn't
+    been computed yet.
+    """
+    await cursor.execute("SELECT 1 FROM match_lists WHERE user_id = %s", (user_id,))
+    if await cursor.fetchone() is None:
+        return None, None
+
+    keyset = ""
+    params = (user_id,)
+    if after is not None:
+        score, candidate_id = -after[0], after[1]
+        keyset = "AND (ms.score < %s OR (ms.score = %s AND ms.candidate_id > %s))"
+        params = (user_id, score, score, candidate_id)
+
+    await cursor.execute(f"""
+        SELECT ms.candidate_id, ms.score, ms.common_interests, ms.within_age_range, ms.same_location,
+               u.name, u.email, u.location
+        FROM match_scores ms
+        JOIN users u ON u.id = ms.candidate_id
+        WHERE ms.user_id = %s {keyset}
+        ORDER BY ms.score DESC, ms.candidate_id ASC
+        LIMIT %s
+    """, (*params, limit + 1))
+    rows = await cursor.fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = f"{rows[-1]['score']}_{rows[-1]['candidate_id']}"
+
+    return [
+        {
+            "id": row["candidate_id"],
+            "name": row["name"],
+            "email": row["email"],
+            "location": row["location"],
+            "common_interests": json.loads(row["common_interests"]),
+            "within_age_range": bool(row["within_age_range"]),
+            "same_location": bool(row["same_location"]),
+            "match_score": row["score"],
+        }
+        for row in rows
+    ], next_cursor
+
+
+async def _load_user(cursor, user_id: str):
+    await cursor.execute(f"SELECT {USER_MATCH_COLUMNS} FROM users WHERE id = %s", (user_id,))
+    return await cursor.fetchone()
+
+
+def _row(user_id: str, match: dict) -> tuple:
+    return (user_id, match["id"], match["match_score"], json.dumps(match["common_interests"]),
+            match["within_age_range"], match["same_location"])
+
+
+async def _write_list(cursor, user_id: str, matches: list):
+    await cursor.execute("DELETE FROM match_scores WHERE user_id = %s", (user_id,))
+    if matches:
+        await cursor.executemany(
+            f"INSERT INTO match_scores (user_id, {', '.join(MATCH_COLUMNS)}) VALUES (%s, %s, %s, %s, %s, %s)",
+            [_row(user_id, match) for match in matches]
+        )
+    await cursor.execute("""
+        INSERT INTO match_lists (user_id) VALUES (%s)
+        ON DUPLICATE KEY UPDATE built_at = CURRENT_TIMESTAMP(6)
+    """, (user_id,))
+
+
+async def refresh_list(cursor, user: dict) -> dict:
+    """Recompute ``user``'s own list and return every candidate's score."""
+    scores = await candidate_scores(cursor, user)
+    top = select_top(scores, Settings.MATCH_LIST_SIZE)
+    await _write_list(cursor, user["id"], await match_details(cursor, user, top))
+    return scores
+
+
+async def _propagate(cursor, user: dict, scores: dict):
+    """Bring other users' lists up to date with ``user``'s new scores."""
+    size = Settings.MATCH_LIST_SIZE
+
+    await cursor.execute("SELECT user_id, score FROM match_scores WHERE candidate_id = %s", (user["id"],))
+    listed = {row["user_id"]: row["score"] for row in await cursor.fetchall()}
+
+    # Each affected list's length and lowest score. Only built lists are
+    # touched; the others will include the user when they are computed.
+    thresholds = {}
+    for chunk in _chunks(set(scores) | set(listed)):
+        placeholders = ", ".join(["%s"] * len(chunk))
+        await cursor.execute(f"""
+            SELECT l.user_id, COUNT(ms.candidate_id) AS size, MIN(ms.score) AS min_score
+            FROM match_lists l
+            LEFT JOIN match_scores ms ON ms.user_id = l.user_id
+            WHERE l.user_id IN ({placeholders}) GROUP BY l.user_id
+        """, tuple(chunk))
+        for row in await cursor.fetchall():
+            thresholds[row["user_id"]] = (row["size"], row["min_score"])
+
+    upserts, removals, requeue = [], [], []
+    for owner_id, (count, min_score) in thresholds.items():
+        score = scores.get(owner_id, 0)
+        kept_place = owner_id in listed and score >= listed[owner_id]
+        if score > 0 and (count < size or score > min_score or kept_place):
+            upserts.append(owner_id)
+        elif owner_id in listed:
+            removals.append(owner_id)
+            if count >= size:
+                # A full list may have someone outside it who now ranks
+                # higher than the user
+                requeue.append(owner_id)
+
+    for chunk in _chunks(removals):
+        placeholders = ", ".join(["%s"] * len(chunk))
+        await cursor.execute(
+            f"DELETE FROM match_scores WHERE candidate_id = %s AND user_id IN ({placeholders})",
+            (user["id"], *chunk)
+        )
+
+    for chunk in _chunks(upserts):
+        # Add or update the user's entry in each of these lists
+        placeholders = ", ".join(["%s"] * len(chunk))
+        await cursor.execute(
+            f"SELECT id, age, location, interests FROM users WHERE id IN ({placeholders})",
+            tuple(chunk)
+        )
+        rows = [_row(owner["id"], match_entry(owner, user)) for owner in await cursor.fetchall()]
+        if rows:
+            await cursor.executemany(f"""
+                INSERT INTO match_scores (user_id, {', '.join(MATCH_COLUMNS)}) VALUES (%s, %s, %s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE score = VALUES(score), common_interests = VALUES(common_interests),
+                    within_age_range = VALUES(within_age_range), same_location = VALUES(same_location)
+            """, rows)
+
+        # Trim lists that grew past the limit
+        await cursor.execute(f"""
+            DELETE ms FROM match_scores ms
+            JOIN (
+                SELECT user_id, candidate_id,
+                       ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY score DESC, candidate_id ASC) AS rn
+                FROM match_scores
+                WHERE user_id IN ({placeholders})
+            ) r ON r.user_id = ms.user_id AND r.candidate_id = ms.candidate_id
+            WHERE r.rn > %s
+        """, (*chunk, size))
+
+    for owner_id in requeue:
+        await enqueue(cursor, owner_id, reverse=False)
+
+
+async def refresh_user(conn, user_id: str, reverse: bool):
+    cursor = conn.cursor(dictionary=True)
+    try:
+        user = await _load_user(cursor, user_id)
+        if user is None:
+            await cursor.execute("DELETE FROM match_scores WHERE user_id = %s OR candidate_id = %s", (user_id, user_id))
+        else:
+            scores = await refresh_list(cursor, user)
+            if reverse:
+                await _propagate(cursor, user, scores)
+        await conn.commit()
+    finally:
+        await cursor.close()
+
+
+class MatchRefresher:
+    """Background task draining match_score_queue.
+
+    ``notify`` wakes it right after a local write; it also polls every
+    ``interval`` seconds for rows queued by other processes or left over
+    from a restart. Several processes may pick up the same row; a refresh
+    is idempotent, so that only costs time.
+    """
+
+    def __init__(self, interval: float, batch_size: int):
+        self.interval = interval
+        self.batch_size = batch_size
+        self._wake = None
+        self._task = None
+        self.completed = 0
+        self.failed = 0
+
+    def start(self):
+        if self._task is None:
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def shutdown(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def notify(self):
+        if self._wake is not None:
+            self._wake.set()
+
+    async def _run(self):
+        while True:
+            try:
+                drained = await self.drain()
+            except Exception as e:
+                print(f"Error refreshing match scores: {e}")
+                drained = True
+            if drained:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+
+    async def drain(self) -> bool:
+        """Refresh one batch of queued users; True when it's time to wait."""
+        failures = 0
+        async with async_db_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            try:
+                await cursor.execute(
+                    "SELECT user_id, reverse, queued_at FROM match_score_queue ORDER BY queued_at LIMIT %s",
+                    (self.batch_size,)
+                )
+                batch = await cursor.fetchall()
+                await conn.commit()
+
+                for entry in batch:
+                    try:
+                        await refresh_user(conn, entry["user_id"], bool(entry["reverse"]))
+                        self.completed += 1
+                    except Exception as e:
+                        await conn.rollback()
+                        failures += 1
+                        self.failed += 1
+                        print(f"Error refreshing match scores for {entry['user_id']}: {e}")
+                        continue
+                    # Left queued if it was queued again while we worked
+                    await cursor.execute(
+                        "DELETE FROM match_score_queue WHERE user_id = %s AND queued_at = %s",
+                        (entry["user_id"], entry["queued_at"])
+                    )
+                    await conn.commit()
+            finally:
+                await cursor.close()
+        # Failed rows stay queued; wait before retrying them
+        return len(batch) < self.batch_size or failures > 0
+
+    def stats(self) -> dict:
+        return {"completed": self.completed, "failed": self.failed}
+
+
+match_refresher = MatchRefresher(interval=Settings.MATCH_REFRESH_INTERVAL, batch_size=Settings.MATCH_REFRESH_BATCH)
+
+
+async def rebuild():
+    async with async_db_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        try:
+            await cursor.execute("SELECT CURRENT_TIMESTAMP(6) AS started")
+            started = (await cursor.fetchone())["started"]
+
+            last_id, done = "", 0
+            while True:
+                await cursor.execute(
+                    "SELECT id, age, location, interests FROM users WHERE id > %s ORDER BY id LIMIT 500",
+                    (last_id,)
+                )
+                users = await cursor.fetchall()
+                if not users:
+                    break
+                for user in users:
+                    await refresh_list(cursor, user)
+                    await conn.commit()
+                done += len(users)
+                last_id = users[-1]["id"]
+                print(f"Rebuilt {done} lists")
+
+            # Every list is current as of the start, so earlier queue rows are done
+            await cursor.execute("DELETE FROM match_score_queue WHERE queued_at < %s", (started,))
+            await conn.commit()
+        finally:
+            await cursor.close()
+
+
+async def check(sample: int) -> bool:
+    """Compare a sample of built lists with a live scoring of the same users.
+
+    Only scores are compared position by position; ids may legitimately
+    differ among candidates tied at the bottom of a full list.
+    """
+    ok = True
+    async with async_db_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        try:
+            await cursor.execute("""
+                SELECT u.id, u.age, u.location, u.interests FROM users u
+                JOIN match_lists l ON l.user_id = u.id
+                ORDER BY RAND() LIMIT %s
+            """, (sample,))
+            users = await cursor.fetchall()
+
+            for user in users:
+                expected = select_top(await candidate_scores(cursor, user), Settings.MATCH_LIST_SIZE)
+                await cursor.execute(
+                    "SELECT candidate_id, score FROM match_scores WHERE user_id = %s "
+                    "ORDER BY score DESC, candidate_id ASC",
+                    (user["id"],)
+                )
+                stored = [(row["score"], row["candidate_id"]) for row in await cursor.fetchall()]
+
+                boundary = expected[-1][0] if len(expected) == Settings.MATCH_LIST_SIZE else 0
+                same_scores = [score for score, _ in stored] == [score for score, _ in expected]
+                same_ids = (
+                    {user_id for score, user_id in stored if score > boundary}
+                    == {user_id for score, user_id in expected if score > boundary}
+                )
+                if not (same_scores and same_ids):
+                    ok = False
+                    print(f"MISMATCH  {user['id']}: {len(stored)} stored, {len(expected)} expected")
+        finally:
+            await cursor.close()
+
+    print(f"Checked {len(users)} users: {'ok' if ok else 'mismatches found'}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild or check precomputed match scores")
+    parser.add_argument("command", choices=["rebuild", "check"])
+    parser.add_argument("--sample", type=int, default=200, help="check: number of users to compare")
+    args = parser.parse_args()
+
+    if args.command == "rebuild":
+        asyncio.run(rebuild())
+    else:
+        sys.exit(0 if asyncio.run(check(args.sample)) else 1)
+
+
+if __name__ == "__main__":
+    main()
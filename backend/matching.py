@@ -0,0 +1,144 @@
+# matching.py
+"""Top-k match suggestions from the user_interests inverted index.
+
+A candidate's score is the number of interests it shares with the user,
+plus one for an age within AGE_RANGE years and one for the same location.
+Anyone scoring above zero shares an interest, the location or the age
+range, so candidates are drawn from the user_interests postings for the
+user's interests and from the location and age indexes on users. Nobody
+else is read, and only the k winners are loaded in full.
+
+Results are ordered by score, then id, and paged with a "<score>_<id>"
+cursor naming the last entry of the previous page.
+"""
+import heapq
+import json
+
+AGE_RANGE = 5
+
+# Longest interest stored in user_interests; longer ones are cut to fit
+INTEREST_MAX_LENGTH = 100
+
+MATCH_COLUMNS = "id, name, email, location, age, interests"
+
+
+def _interests(user: dict) -> list:
+    interests = user.get("interests") or []
+    if isinstance(interests, str):
+        interests = json.loads(interests)
+    return interests
+
+
+def index_terms(interests) -> list:
+    return sorted({interest[:INTEREST_MAX_LENGTH] for interest in interests or []})
+
+
+async def sync_user_interests(cursor, user_id: str, interests):
+    """Make user_interests match ``interests``; call in the user's write transaction."""
+    await cursor.execute("DELETE FROM user_interests WHERE user_id = %s", (user_id,))
+    terms = index_terms(interests)
+    if terms:
+        await cursor.executemany(
+            "INSERT INTO user_interests (user_id, interest) VALUES (%s, %s)",
+            [(user_id, term) for term in terms]
+        )
+
+
+def match_score(user: dict, candidate: dict, common: int) -> tuple:
+    within_age_range = abs(user["age"] - candidate["age"]) <= AGE_RANGE
+    same_location = user["location"].lower() == candidate["location"].lower()
+    return common + within_age_range + same_location, within_age_range, same_location
+
+
+def parse_cursor(cursor):
+    if not cursor:
+        return None
+    score, _, user_id = cursor.partition("_")
+    return -int(score), user_id
+
+
+def select_top(scores: dict, limit: int, after=None) -> list:
+    """The ``limit`` best (score, id) pairs from ``scores`` after the cursor key."""
+    keys = ((-score, user_id) for user_id, score in scores.items() if score > 0)
+    if after is not None:
+        keys = (key for key in keys if key > after)
+    return [(-negated, user_id) for negated, user_id in heapq.nsmallest(limit, keys)]
+
+
+def _interest_query(terms: int) -> str:
+    placeholders = ", ".join(["%s"] * terms)
+    return f"""
+        SELECT user_id, COUNT(*) AS common FROM user_interests
+        WHERE interest IN ({placeholders}) AND user_id <> %s
+        GROUP BY user_id
+    """
+
+
+def _nearby_query() -> str:
+    return """
+        SELECT id, age, location FROM users
+        WHERE id <> %s AND (location = %s OR age BETWEEN %s AND %s)
+    """
+
+
+async def candidate_scores(cursor, user: dict) -> dict:
+    """Score of every candidate scoring above zero for ``user``, by id."""
+    common = {}
+    terms = index_terms(_interests(user))
+    if terms:
+        await cursor.execute(_interest_query(len(terms)), (*terms, user["id"]))
+        common = {row["user_id"]: row["common"] for row in await cursor.fetchall()}
+
+    # Everyone who can score on age or location; an interest candidate
+    # missing from this set scores exactly its shared interests
+    await cursor.execute(
+        _nearby_query(),
+        (user["id"], user["location"], user["age"] - AGE_RANGE, user["age"] + AGE_RANGE)
+    )
+    scores = dict(common)
+    for candidate in await cursor.fetchall():
+        scores[candidate["id"]] = match_score(user, candidate, common.get(candidate["id"], 0))[0]
+    return scores
+
+
+async def top_matches(cursor, user: dict, limit: int, after=None):
+    """Return (matches, next_cursor) for ``user``; ``cursor`` must be a dict cursor."""
+    scores = await candidate_scores(cursor, user)
+
+    top = select_top(scores, limit + 1, after)
+    next_cursor = None
+    if len(top) > limit:
+        top = top[:limit]
+        next_cursor = f"{top[-1][0]}_{top[-1][1]}"
+    return await match_details(cursor, user, top), next_cursor
+
+
+async def match_details(cursor, user: dict, top: list) -> list:
+    """Full match entries for the (score, id) pairs in ``top``, in order."""
+    if not top:
+        return []
+
+    placeholders = ", ".join(["%s"] * len(top))
+    await cursor.execute(
+        f"SELECT {MATCH_COLUMNS} FROM users WHERE id IN ({placeholders})",
+        tuple(user_id for _, user_id in top)
+    )
+    candidates = {row["id"]: row for row in await cursor.fetchall()}
+
+    return [match_entry(user, candidates[user_id]) for _, user_id in top if user_id in candidates]
+
+
+def match_entry(user: dict, candidate: dict) -> dict:
+    """Suggested-match entry for ``candidate``, a row with MATCH_COLUMNS."""
+    common_interests = set(_interests(user)) & set(_interests(candidate))
+    score, within_age_range, same_location = match_score(user, candidate, len(common_interests))
+    return {
+        "id": candidate["id"],
+        "name": candidate["name"],
+        "email": candidate["email"],
+        "location": candidate["location"],
+        "common_interests": sorted(common_interests),
+        "within_age_range": within_age_range,
+        "same_location": same_location,
+        "match_score": score,
+    }
@@ -0,0 +1,236 @@
+# metrics.py
+"""Request and SQL instrumentation, served in Prometheus text format.
+
+MetricsMiddleware records, per route template (``/boards/{board_id}``, never
+the raw path):
+
+    http_request_duration_seconds   histogram, by method, route and status
+    http_response_size_bytes        histogram, by method and route
+    http_requests_in_flight         gauge, by method and route
+
+AsyncCursor (database.py) times every statement it executes into
+
+    db_query_duration_seconds       histogram, by route and statement fingerprint
+
+The fingerprint is the statement with literals and IN lists collapsed, so
+one query shape is one series however its parameters vary. Statements
+slower than SLOW_QUERY_MS are also written to stderr. Anything with a
+``stats()`` dict (the connection pool, caches, worker pools) is exported as
+gauges via ``register_stats``.
+
+Metrics are per process; with several workers, scrape each one.
+"""
+import re
+import sys
+import threading
+from bisect import bisect_left
+from contextvars import ContextVar
+from functools import lru_cache
+from time import perf_counter
+
+from starlette.routing import Match
+
+from config import Settings
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+# Distinct statement fingerprints tracked; later shapes are counted as "other"
+MAX_FINGERPRINTS = 500
+
+# Route of the request being served, for SQL timings; background work has none
+current_route = ContextVar("current_route", default="-")
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: tuple, buckets: tuple):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}  # label values -> [count per bucket..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, values: tuple, amount: float):
+        index = bisect_left(self.buckets, amount)
+        with self._lock:
+            series = self._series.get(values)
+            if series is None:
+                series = self._series[values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {values: list(counts) for values, counts in self._series.items()}
+        for values, counts in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_labels(self.labels, values, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, values)} {counts[-1]}")
+            lines.append(f"{self.name}_count{_labels(self.labels, values)} {cumulative}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name: str, help: str, labels: tuple):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def add(self, values: tuple, amount: float):
+        with self._lock:
+            self._values[values] = self._values.get(values, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            values = dict(self._values)
+        for label_values, value in sorted(values.items()):
+            lines.append(f"{self.name}{_labels(self.labels, label_values)} {value}")
+        return lines
+
+
+request_duration = Histogram(
+    "http_request_duration_seconds", "Time to serve a request, to the end of the response body",
+    ("method", "route", "status"), LATENCY_BUCKETS
+)
+response_size = Histogram(
+    "http_response_size_bytes", "Response body size", ("method", "route"), SIZE_BUCKETS
+)
+requests_in_flight = Gauge(
+    "http_requests_in_flight", "Requests being served", ("method", "route")
+)
+query_duration = Histogram(
+    "db_query_duration_seconds", "Time to execute a SQL statement (results are read afterwards)",
+    ("route", "statement"), QUERY_BUCKETS
+)
+
+_stats_sources = []
+_fingerprints = set()
+_fingerprints_lock = threading.Lock()
+
+
+def register_stats(prefix: str, stats):
+    """Export the numeric entries of ``stats()`` as gauges named ``<prefix>_<key>``."""
+    _stats_sources.append((prefix, stats))
+
+
+_LITERALS = re.compile(r"'(?:[^'\\]|\\.)*'|\b\d+(?:\.\d+)?\b")
+_LISTS = re.compile(r"\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)")
+_ROWS = re.compile(r"(\(\.\.\.\))(?:\s*,\s*\(\.\.\.\))+")
+_SPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(statement: str) -> str:
+    """``statement`` with literals replaced by ? and placeholder lists by (...)."""
+    normalized = _SPACE.sub(" ", statement).strip()
+    normalized = _LITERALS.sub("?", normalized)
+    normalized = _LISTS.sub("(...)", normalized)
+    normalized = _ROWS.sub(r"\1", normalized)
+    with _fingerprints_lock:
+        if normalized not in _fingerprints:
+            if len(_fingerprints) >= MAX_FINGERPRINTS:
+                return "other"
+            _fingerprints.add(normalized)
+    return normalized
+
+
+def record_query(route: str, statement, seconds: float):
+    if isinstance(statement, bytes):
+        statement = statement.decode(errors="replace")
+    shape = fingerprint(statement)
+    query_duration.observe((route, shape), seconds)
+    if Settings.SLOW_QUERY_MS and seconds * 1000 >= Settings.SLOW_QUERY_MS:
+        print(f"Slow query ({seconds * 1000:.1f} ms, {route}): {shape}", file=sys.stderr, flush=True)
+
+
+def timed(route: str, func, statement, *args):
+    """Run ``func(statement, *args)`` and record how long it took."""
+    started = perf_counter()
+    try:
+        return func(statement, *args)
+    finally:
+        record_query(route, statement, perf_counter() - started)
+
+
+def _route_template(app, scope) -> str:
+    partial = None
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+        if match == Match.PARTIAL and partial is None:
+            partial = route.path
+    # Wrong method (405) or no route at all; raw paths would explode the series
+    return partial or "unmatched"
+
+
+class MetricsMiddleware:
+    """Plain ASGI middleware, so streamed responses pass straight through."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        route = _route_template(scope["app"], scope)
+        method = scope["method"]
+        token = current_route.set(route)
+        requests_in_flight.add((method, route), 1)
+        started = perf_counter()
+        status = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            elif message["type"] == "http.response.zerocopy":
+                size += message.get("count") or 0
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            requests_in_flight.add((method, route), -1)
+            request_duration.observe((method, route, str(status)), perf_counter() - started)
+            response_size.observe((method, route), size)
+            current_route.reset(token)
+
+
+def render() -> str:
+    lines = []
+    for metric in (request_duration, response_size, requests_in_flight, query_duration):
+        lines.extend(metric.render())
+    for prefix, stats in _stats_sources:
+        for key, value in stats().items():
+            if isinstance(value, bool):
+                value = int(value)
+            if isinstance(value, (int, float)):
+                name = f"{prefix}_{key}"
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,500 @@
+# migrations.py
+"""Versioned schema migrations.
+
+Each migration runs once per database and is recorded in schema_migrations.
+The runner holds a MySQL named lock while it works, so when several workers
+start together one applies the pending migrations and the others wait and
+then find nothing to do. Run it by hand with:
+
+    python migrations.py              # apply pending migrations
+    python migrations.py status       # list applied and pending migrations
+    python migrations.py check-plans  # EXPLAIN hot queries, fail on full scans
+
+MySQL commits DDL implicitly, so a migration that fails halfway is not
+rolled back; write migrations with the idempotent helpers below so they can
+simply be re-run.
+"""
+import argparse
+import json
+import sys
+from datetime import datetime, timezone
+
+from mysql.connector import Error
+from board_counters import repair_all as repair_board_counters
+from database import db_connection
+from matching import INTEREST_MAX_LENGTH
+from ordering import POSITION_GAP
+
+LOCK_NAME = "motherboard.schema_migrations"
+LOCK_TIMEOUT_SECONDS = 300
+
+MIGRATIONS = []
+
+
+def migration(version: int, name: str):
+    def register(func):
+        MIGRATIONS.append((version, name, func))
+        return func
+    return register
+
+
+def _column(cursor, table, column):
+    cursor.execute("""
+        SELECT is_nullable, datetime_precision FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+    """, (table, column))
+    return cursor.fetchone()
+
+
+def _index_exists(cursor, table, name):
+    cursor.execute("""
+        SELECT 1 FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+        LIMIT 1
+    """, (table, name))
+    return cursor.fetchone() is not None
+
+
+def add_column(cursor, table, column, definition):
+    if _column(cursor, table, column) is None:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+def add_index(cursor, table, name, columns, unique=False):
+    if not _index_exists(cursor, table, name):
+        cursor.execute(f"CREATE {'UNIQUE ' if unique else ''}INDEX {name} ON {table} ({columns})")
+
+
+def drop_index(cursor, table, name):
+    if _index_exists(cursor, table, name):
+        cursor.execute(f"DROP INDEX {name} ON {table}")
+
+
+UPDATED_AT = "TIMESTAMP(6) DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6)"
+
+
+@migration(1, "initial schema")
+def initial_schema(cursor):
+    # Everything main.init_db and database.init_db used to create, with their
+    # disagreements settled. IF NOT EXISTS and the column checks let this
+    # adopt databases those functions already created.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id VARCHAR(50) PRIMARY KEY,
+            name VARCHAR(100) NOT NULL,
+            role VARCHAR(50) NOT NULL,
+            age INT NOT NULL,
+            location VARCHAR(100) NOT NULL,
+            interests JSON,
+            email VARCHAR(100) UNIQUE NOT NULL,
+            password VARCHAR(255) NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS boards (
+            id VARCHAR(50) PRIMARY KEY,
+            user_id VARCHAR(50) NOT NULL,
+            title VARCHAR(100) NOT NULL,
+            version BIGINT NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    """)
+
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS stages (
+            id VARCHAR(50) PRIMARY KEY,
+            board_id VARCHAR(50) NOT NULL,
+            title VARCHAR(100) NOT NULL,
+            position INT NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at {UPDATED_AT},
+            FOREIGN KEY (board_id) REFERENCES boards(id),
+            INDEX idx_stages_board_updated (board_id, updated_at)
+        )
+    """)
+
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS items (
+            id VARCHAR(50) PRIMARY KEY,
+            content TEXT NOT NULL,
+            stage_id VARCHAR(50),
+            description TEXT,
+            status VARCHAR(50) DEFAULT 'In Progress',
+            progress INT DEFAULT 0,
+            subtasks JSON,
+            activities JSON,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at {UPDATED_AT},
+            FOREIGN KEY (stage_id) REFERENCES stages(id),
+            INDEX idx_items_stage_updated (stage_id, updated_at)
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS discipleship (
+            id VARCHAR(50) PRIMARY KEY,
+            discipler_id VARCHAR(50),
+            disciple_id VARCHAR(50) UNIQUE,
+            start_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (discipler_id) REFERENCES users(id),
+            FOREIGN KEY (disciple_id) REFERENCES users(id)
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS board_tombstones (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            board_id VARCHAR(50) NOT NULL,
+            entity VARCHAR(10) NOT NULL,
+            entity_id VARCHAR(50) NOT NULL,
+            deleted_at TIMESTAMP(6) DEFAULT CURRENT_TIMESTAMP(6),
+            INDEX idx_tombstones_board_deleted (board_id, deleted_at)
+        )
+    """)
+
+    add_column(cursor, "boards", "version", "BIGINT NOT NULL DEFAULT 0")
+    add_column(cursor, "stages", "updated_at", UPDATED_AT)
+    add_column(cursor, "items", "updated_at", UPDATED_AT)
+    add_index(cursor, "stages", "idx_stages_board_updated", "board_id, updated_at")
+    add_index(cursor, "items", "idx_items_stage_updated", "stage_id, updated_at")
+
+    # database.init_db created items.updated_at with whole-second precision
+    if _column(cursor, "items", "updated_at")[1] != 6:
+        cursor.execute(f"ALTER TABLE items MODIFY updated_at {UPDATED_AT}")
+
+    # ... and allowed stages without a board, which no endpoint can reach
+    if _column(cursor, "stages", "board_id")[0] == "YES":
+        cursor.execute("SELECT COUNT(*) FROM stages WHERE board_id IS NULL")
+        if cursor.fetchone()[0]:
+            print("Warning: stages with no board_id exist; leaving stages.board_id nullable")
+        else:
+            cursor.execute("ALTER TABLE stages MODIFY board_id VARCHAR(50) NOT NULL")
+
+
+@migration(2, "hot path indexes")
+def hot_path_indexes(cursor):
+    add_index(cursor, "stages", "idx_stages_board_position", "board_id, position")
+    add_index(cursor, "items", "idx_items_stage_created", "stage_id, created_at")
+    add_index(cursor, "boards", "idx_boards_user_created", "user_id, created_at")
+    add_index(cursor, "users", "idx_users_role", "role")
+    add_index(cursor, "discipleship", "idx_discipleship_discipler", "discipler_id")
+
+
+@migration(3, "item positions")
+def item_positions(cursor):
+    add_column(cursor, "items", "position", "INT NOT NULL DEFAULT 0")
+    add_index(cursor, "items", "idx_items_stage_position", "stage_id, position")
+
+    # Spread existing items out in their current (creation) order
+    cursor.execute("""
+        UPDATE items i
+        JOIN (
+            SELECT id, ROW_NUMBER() OVER (PARTITION BY stage_id ORDER BY created_at, id) AS rn
+            FROM items
+        ) r ON r.id = i.id
+        SET i.position = r.rn * %s, i.updated_at = i.updated_at
+    """, (POSITION_GAP,))
+
+
+def _parse_activity_timestamp(value):
+    try:
+        timestamp = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+
+@migration(4, "item activity log")
+def item_activity_log(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS item_activities (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            item_id VARCHAR(50) NOT NULL,
+            text TEXT,
+            timestamp DATETIME(6) NOT NULL,
+            file JSON,
+            created_at TIMESTAMP(6) DEFAULT CURRENT_TIMESTAMP(6),
+            FOREIGN KEY (item_id) REFERENCES items(id) ON DELETE CASCADE,
+            INDEX idx_activities_item_timestamp (item_id, timestamp, id)
+        )
+    """)
+
+    # Copy the items.activities JSON arrays over, a page of items at a time.
+    # The column itself is left in place, no longer read or written, so the
+    # copy can be checked before it is dropped.
+    last_id = ""
+    while True:
+        cursor.execute("""
+            SELECT id, activities FROM items
+            WHERE id > %s AND JSON_LENGTH(activities) > 0
+            ORDER BY id LIMIT 500
+        """, (last_id,))
+        page = cursor.fetchall()
+        if not page:
+            break
+
+        rows = []
+        for item_id, activities in page:
+            for activity in json.loads(activities):
+                timestamp = _parse_activity_timestamp(activity.get("timestamp"))
+                file = activity.get("file")
+                rows.append((
+                    item_id,
+                    activity.get("text"),
+                    timestamp or datetime.utcnow(),
+                    json.dumps(file) if file is not None else None
+                ))
+        if rows:
+            cursor.executemany(
+                "INSERT INTO item_activities (item_id, text, timestamp, file) VALUES (%s, %s, %s, %s)",
+                rows
+            )
+        last_id = page[-1][0]
+
+
+@migration(5, "item attachments")
+def item_attachments(cursor):
+    # The bytes live in the content-addressed store (storage.py); this is
+    # the per-item record of each upload pointing at them
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS item_files (
+            id VARCHAR(50) PRIMARY KEY,
+            item_id VARCHAR(50) NOT NULL,
+            sha256 CHAR(64) NOT NULL,
+            name VARCHAR(255) NOT NULL,
+            content_type VARCHAR(255) NOT NULL,
+            size BIGINT NOT NULL,
+            uploaded_by VARCHAR(50),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (item_id) REFERENCES items(id) ON DELETE CASCADE,
+            INDEX idx_item_files_item (item_id, created_at),
+            INDEX idx_item_files_sha256 (sha256)
+        )
+    """)
+
+
+@migration(6, "attachment derivatives")
+def attachment_derivatives(cursor):
+    # Existing uploads start out pending and are processed on next startup
+    add_column(cursor, "item_files", "status", "VARCHAR(20) NOT NULL DEFAULT 'pending'")
+    add_column(cursor, "item_files", "width", "INT")
+    add_column(cursor, "item_files", "height", "INT")
+    add_column(cursor, "item_files", "detected_type", "VARCHAR(255)")
+    add_column(cursor, "item_files", "thumbnail", "VARCHAR(100)")
+    add_column(cursor, "item_files", "thumbnail_size", "BIGINT")
+    add_index(cursor, "item_files", "idx_item_files_status", "status")
+
+
+@migration(7, "user interest index")
+def user_interest_index(cursor):
+    # Inverted index of users.interests for matchmaking (matching.py). The
+    # binary collation keeps matching exact, as the JSON comparison was.
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS user_interests (
+            user_id VARCHAR(50) NOT NULL,
+            interest VARCHAR({INTEREST_MAX_LENGTH}) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NOT NULL,
+            PRIMARY KEY (user_id, interest),
+            INDEX idx_user_interests_interest (interest, user_id),
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+    """)
+    cursor.execute(f"""
+        INSERT IGNORE INTO user_interests (user_id, interest)
+        SELECT u.id, LEFT(j.interest, {INTEREST_MAX_LENGTH})
+        FROM users u,
+             JSON_TABLE(u.interests, '$[*]' COLUMNS (interest TEXT PATH '$')) j
+        WHERE j.interest IS NOT NULL
+    """)
+    add_index(cursor, "users", "idx_users_location", "location")
+    add_index(cursor, "users", "idx_users_age", "age")
+
+
+@migration(8, "match score lists")
+def match_score_lists(cursor):
+    # Precomputed suggested-matches lists (match_scores.py)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS match_scores (
+            user_id VARCHAR(50) NOT NULL,
+            candidate_id VARCHAR(50) NOT NULL,
+            score INT NOT NULL,
+            common_interests JSON NOT NULL,
+            within_age_range BOOLEAN NOT NULL,
+            same_location BOOLEAN NOT NULL,
+            PRIMARY KEY (user_id, candidate_id),
+            INDEX idx_match_scores_user_score (user_id, score, candidate_id),
+            INDEX idx_match_scores_candidate (candidate_id),
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+            FOREIGN KEY (candidate_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS match_score_queue (
+            user_id VARCHAR(50) PRIMARY KEY,
+            reverse BOOLEAN NOT NULL DEFAULT TRUE,
+            queued_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+            INDEX idx_match_score_queue_queued (queued_at)
+        )
+    """)
+
+    # Every existing user's list gets computed in the background; no
+    # reverse pass is needed when all of them are
+    cursor.execute("INSERT IGNORE INTO match_score_queue (user_id, reverse) SELECT id, FALSE FROM users")
+
+
+@migration(9, "user listing indexes")
+def user_listing_indexes(cursor):
+    # Keyset pages of user listings walk these in id order (InnoDB appends
+    # the primary key to every secondary index)
+    add_index(cursor, "users", "idx_users_role_location", "role, location")
+    add_index(cursor, "users", "idx_users_role_age", "role, age")
+    add_index(cursor, "discipleship", "idx_discipleship_discipler_disciple", "discipler_id, disciple_id")
+
+
+@migration(10, "board counters")
+def board_counters(cursor):
+    add_column(cursor, "boards", "stage_count", "INT NOT NULL DEFAULT 0")
+    add_column(cursor, "boards", "item_count", "INT NOT NULL DEFAULT 0")
+    add_column(cursor, "boards", "completed_count", "INT NOT NULL DEFAULT 0")
+    add_column(cursor, "boards", "progress_sum", "BIGINT NOT NULL DEFAULT 0")
+    # From here on the board write endpoints keep them current
+    repair_board_counters(cursor)
+
+
+@migration(11, "board templates")
+def board_templates(cursor):
+    add_column(cursor, "boards", "is_template", "BOOLEAN NOT NULL DEFAULT FALSE")
+    add_index(cursor, "boards", "idx_boards_template_title", "is_template, title")
+
+
+@migration(12, "stage ordering")
+def stage_ordering(cursor):
+    # Stages were numbered 1, 2, 3... with MAX(position) + 1, which could hand
+    # two concurrent creates the same position. Space every board's stages
+    # POSITION_GAP apart in their current display order, then make positions
+    # unique per board; the unique index replaces the plain one. The first
+    # pass numbers them -1, -2, ... (positions were never negative), so a
+    # rerun with the index already in place can't collide with it.
+    cursor.execute("""
+        UPDATE stages t
+        JOIN (
+            SELECT id, ROW_NUMBER() OVER (PARTITION BY board_id ORDER BY position, created_at, id) AS rn
+            FROM stages
+        ) r ON r.id = t.id
+        SET t.position = -r.rn
+    """)
+    cursor.execute("""
+        UPDATE stages t
+        JOIN (
+            SELECT id, ROW_NUMBER() OVER (PARTITION BY board_id ORDER BY position DESC) AS rn
+            FROM stages
+        ) r ON r.id = t.id
+        SET t.position = r.rn * %s
+    """, (POSITION_GAP,))
+    add_index(cursor, "stages", "uq_stages_board_position", "board_id, position", unique=True)
+    drop_index(cursor, "stages", "idx_stages_board_position")
+
+
+@migration(13, "match list markers")
+def match_list_markers(cursor):
+    # One row per user whose match_scores list has been computed, so an
+    # empty list can be told apart from one not built yet
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS match_lists (
+            user_id VARCHAR(50) PRIMARY KEY,
+            built_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+    """)
+    # Migration 8 queued every user, and a user leaves the queue only once
+    # their list has been computed
+    cursor.execute("""
+        INSERT IGNORE INTO match_lists (user_id)
+        SELECT u.id FROM users u
+        WHERE NOT EXISTS (SELECT 1 FROM match_score_queue q WHERE q.user_id = u.id)
+    """)
+
+
+def _ensure_history_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            name VARCHAR(100) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def _applied_versions(cursor):
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def migrate():
+    with db_connection() as conn:
+        cursor = conn.cursor()
+
+        try:
+            cursor.execute("SELECT GET_LOCK(%s, %s)", (LOCK_NAME, LOCK_TIMEOUT_SECONDS))
+            if cursor.fetchone()[0] != 1:
+                raise RuntimeError("Timed out waiting for the schema migration lock")
+
+            try:
+                _ensure_history_table(cursor)
+                applied = _applied_versions(cursor)
+
+                for version, name, func in sorted(MIGRATIONS):
+                    if version in applied:
+                        continue
+                    print(f"Applying migration {version}: {name}")
+                    func(cursor)
+                    cursor.execute(
+                        "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                        (version, name)
+                    )
+                    conn.commit()
+            finally:
+                cursor.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+                cursor.fetchall()
+        except Error as e:
+            print(f"Error applying migrations: {e}")
+            raise
+        finally:
+            cursor.close()
+
+
+def status():
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            _ensure_history_table(cursor)
+            applied = _applied_versions(cursor)
+        finally:
+            cursor.close()
+
+    for version, name, _ in sorted(MIGRATIONS):
+        print(f"{version:>4}  {'applied' if version in applied else 'pending':<8} {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply or inspect schema migrations")
+    parser.add_argument("command", nargs="?", default="migrate", choices=["migrate", "status", "check-plans"])
+    parser.add_argument("--min-rows", type=int, default=100,
+                        help="check-plans: ignore full scans of tables estimated below this many rows")
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        migrate()
+    elif args.command == "status":
+        status()
+    else:
+        from query_plans import check_query_plans
+        sys.exit(0 if check_query_plans(min_rows=args.min_rows) else 1)
+
+
+if __name__ == "__main__":
+    main()
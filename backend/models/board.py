@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import List, Dict, Optional
+from pydantic import BaseModel, Field, field_validator
+from typing import Annotated, List, Dict, Literal, Optional, Union
 from datetime import datetime
 
 class Subtask(BaseModel):
@@ -21,13 +21,16 @@ class Activity(BaseModel):
             "file": self.file
         }
 
+# Percent complete, as the item detail view derives it from the subtasks
+Progress = Annotated[int, Field(ge=0, le=100)]
+
 class Item(BaseModel):
     id: str
     content: str
     stage_id: str
     description: Optional[str] = None
     status: Optional[str] = "In Progress"
-    progress: Optional[int] = 0
+    progress: Optional[Progress] = 0
     subtasks: List[Subtask] = []
     activities: List[Activity] = []
 
@@ -41,9 +44,14 @@ class Stage(BaseModel):
 class StageCreate(BaseModel):
     id: str
     title: str
+    # Index among the board's stages; None adds the stage at the end
     position: Optional[int] = None
     board_id: str
 
+class StageOrder(BaseModel):
+    # Every stage of the board, in the new order
+    stage_ids: List[str] = Field(min_length=1)
+
 class Board(BaseModel):
     id: str
     user_id: str
@@ -54,3 +62,60 @@ class Board(BaseModel):
 class BoardCreate(BaseModel):
     user_id: str
     title: str
+    # Start from a copy of this board (a template, or one of the user's own)
+    template_id: Optional[str] = None
+
+class BoardClone(BaseModel):
+    # Defaults to the source board's title
+    title: Optional[str] = None
+
+class BoardTemplate(BaseModel):
+    is_template: bool
+
+class ItemPatch(BaseModel):
+    # Fields left out stay as they are; only the description can be cleared
+    content: Optional[str] = None
+    description: Optional[str] = None
+    status: Optional[str] = None
+    progress: Optional[Progress] = None
+    subtasks: Optional[List[Subtask]] = None
+
+    @field_validator("content", "status", "progress")
+    @classmethod
+    def not_null(cls, value):
+        if value is None:
+            raise ValueError("may not be null")
+        return value
+
+class ItemMove(BaseModel):
+    stage_id: str
+    # Index among the target stage's items; None moves the item to the end
+    position: Optional[int] = None
+
+# Largest number of operations accepted in one POST .../items/batch
+ITEM_BATCH_MAX_OPERATIONS = 500
+
+class ItemCreateOperation(BaseModel):
+    op: Literal["create"]
+    item: Item
+
+class ItemUpdateOperation(BaseModel):
+    op: Literal["update"]
+    id: str
+    patch: ItemPatch
+
+class ItemMoveOperation(ItemMove):
+    op: Literal["move"]
+    id: str
+
+class ItemDeleteOperation(BaseModel):
+    op: Literal["delete"]
+    id: str
+
+ItemOperation = Annotated[
+    Union[ItemCreateOperation, ItemUpdateOperation, ItemMoveOperation, ItemDeleteOperation],
+    Field(discriminator="op")
+]
+
+class ItemBatch(BaseModel):
+    operations: List[ItemOperation] = Field(min_length=1, max_length=ITEM_BATCH_MAX_OPERATIONS)
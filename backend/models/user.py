@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, field_validator
 from typing import List, Optional
 from enum import Enum
 
@@ -24,3 +24,17 @@ class UserResponse(BaseModel):
     location: str
     interests: List[str]
     email: str
+
+class UserUpdate(BaseModel):
+    # Fields left out stay as they are; none of them can be cleared
+    name: Optional[str] = None
+    age: Optional[int] = None
+    location: Optional[str] = None
+    interests: Optional[List[str]] = None
+
+    @field_validator("name", "age", "location", "interests")
+    @classmethod
+    def not_null(cls, value):
+        if value is None:
+            raise ValueError("may not be null")
+        return value
@@ -0,0 +1,96 @@
+# ordering.py
+"""Sparse integer positions for ordered rows (a stage's items, a board's stages).
+
+Rows are spaced POSITION_GAP apart, so moving one row means giving it a
+position between its new neighbours: a single-row UPDATE. Only when two
+neighbours end up adjacent is the whole scope renumbered.
+
+Stages have a unique (board_id, position) index, which InnoDB checks row
+by row during a multi-row UPDATE. Renumbering therefore parks the scope's
+rows below every position in use first, then assigns the final positions.
+"""
+
+POSITION_GAP = 1024
+
+
+def _between(before, after):
+    if before is None and after is None:
+        return POSITION_GAP
+    if before is None:
+        return after - POSITION_GAP
+    if after is None:
+        return before + POSITION_GAP
+    if after - before > 1:
+        return (before + after) // 2
+    return None
+
+
+async def _neighbours(cursor, table, scope_column, scope_id, index, exclude_id):
+    where = f"WHERE {scope_column} = %s AND id <> %s"
+    order = "ORDER BY position ASC, created_at ASC, id ASC"
+
+    if index is not None and index <= 0:
+        await cursor.execute(f"SELECT position FROM {table} {where} {order} LIMIT 1", (scope_id, exclude_id))
+        row = await cursor.fetchone()
+        return None, row[0] if row else None
+
+    if index is not None:
+        await cursor.execute(
+            f"SELECT position FROM {table} {where} {order} LIMIT %s, 2",
+            (scope_id, exclude_id, index - 1)
+        )
+        rows = await cursor.fetchall()
+        if rows:
+            return rows[0][0], rows[1][0] if len(rows) > 1 else None
+
+    # Appending, or an index past the end
+    await cursor.execute(f"SELECT MAX(position) FROM {table} {where}", (scope_id, exclude_id))
+    return (await cursor.fetchone())[0], None
+
+
+async def park(cursor, table, scope_column, scope_id):
+    """Move the scope's rows, in order, to negative positions below any in use.
+
+    Every position assigned afterwards, whether by rebalance or by an
+    explicit reordering, is positive, so it can't collide with a parked row.
+    """
+    await cursor.execute(
+        f"SELECT LEAST(COALESCE(MIN(position), 0), 0) FROM {table} WHERE {scope_column} = %s",
+        (scope_id,)
+    )
+    floor = (await cursor.fetchone())[0]
+    # Numbered from the end, so the first row gets the lowest position
+    await cursor.execute(f"""
+        UPDATE {table} t
+        JOIN (
+            SELECT id, ROW_NUMBER() OVER (ORDER BY position DESC, created_at DESC, id DESC) AS rn
+            FROM {table}
+            WHERE {scope_column} = %s
+        ) r ON r.id = t.id
+        SET t.position = %s - r.rn
+    """, (scope_id, floor))
+
+
+async def rebalance(cursor, table, scope_column, scope_id):
+    await park(cursor, table, scope_column, scope_id)
+    await cursor.execute(f"""
+        UPDATE {table} t
+        JOIN (
+            SELECT id, ROW_NUMBER() OVER (ORDER BY position ASC, created_at ASC, id ASC) AS rn
+            FROM {table}
+            WHERE {scope_column} = %s
+        ) r ON r.id = t.id
+        SET t.position = r.rn * %s
+    """, (scope_id, POSITION_GAP))
+
+
+async def position_for_index(cursor, table, scope_column, scope_id, index=None, exclude_id=""):
+    """Position that places a row at ``index`` among the other rows of the
+    scope (``exclude_id`` is the row being moved); None means at the end."""
+    before, after = await _neighbours(cursor, table, scope_column, scope_id, index, exclude_id)
+    position = _between(before, after)
+    if position is None:
+        await rebalance(cursor, table, scope_column, scope_id)
+        before, after = await _neighbours(cursor, table, scope_column, scope_id, index, exclude_id)
+        position = _between(before, after)
+    return position
@@ -0,0 +1,90 @@
+# passwords.py
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+
+import bcrypt
+from fastapi import HTTPException
+from config import Settings
+
+
+def _hash(password: bytes, rounds: int) -> bytes:
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+
+
+def _check(password: bytes, hashed: bytes) -> bool:
+    return bcrypt.checkpw(password, hashed)
+
+
+class HashingPool:
+    """Runs bcrypt in worker processes so it never blocks the event loop.
+
+    At most ``workers`` hashes run at once and up to ``max_queue`` more may
+    wait for a worker; anything beyond that is rejected immediately with a
+    503 instead of piling up behind a login burst.
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = None
+        self._pending = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def start(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def submit(self, func, *args):
+        # Only touched from the event loop, so the counter needs no lock
+        if self._pending >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Too many authentication requests, please retry",
+                headers={"Retry-After": "1"}
+            )
+
+        self.start()
+        self._pending += 1
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+            self.completed += 1
+            return result
+        finally:
+            self._pending -= 1
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "in_flight": min(self._pending, self.workers),
+            "queued": max(self._pending - self.workers, 0),
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+
+hashing_pool = HashingPool(workers=Settings.BCRYPT_WORKERS, max_queue=Settings.BCRYPT_MAX_QUEUE)
+
+
+async def hash_password(password: str) -> str:
+    hashed = await hashing_pool.submit(_hash, password.encode(), Settings.BCRYPT_ROUNDS)
+    return hashed.decode()
+
+
+async def verify_password(password: str, hashed: str) -> bool:
+    return await hashing_pool.submit(_check, password.encode(), hashed.encode())
+
+
+def needs_rehash(hashed: str) -> bool:
+    # bcrypt hashes look like $2b$<cost>$<salt+digest>
+    try:
+        return int(hashed.split("$")[2]) != Settings.BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
@@ -0,0 +1,89 @@
+# query_plans.py
+"""EXPLAIN-based guard for the queries on our hot paths.
+
+Run ``python migrations.py check-plans`` against a database with realistic
+data; it exits non-zero if any query below makes MySQL scan a whole table
+of at least ``--min-rows`` rows, which usually means an index is missing or
+no longer usable.
+"""
+from database import db_connection
+from matching import _interest_query, _nearby_query
+from routes.auth import USER_COLUMNS
+from routes.boards import BOARD_LIST_QUERY, TEMPLATE_LIST_QUERY, _board_query
+from routes.users import DASHBOARD_QUERIES
+
+# (name, statement, representative parameters)
+HOT_QUERIES = [
+    ("auth.current_user", f"SELECT {USER_COLUMNS} FROM users WHERE id = %s", ("user",)),
+    ("auth.login", "SELECT * FROM users WHERE email = %s", ("user@example.com",)),
+    ("boards.list", BOARD_LIST_QUERY, ("user",)),
+    ("boards.templates", TEMPLATE_LIST_QUERY, ()),
+    ("boards.version", "SELECT user_id, version FROM boards WHERE id = %s", ("board",)),
+    ("boards.get_board", _board_query(True), ("board",)),
+    ("boards.changes.stages", """
+        SELECT id, title, position, created_at, updated_at
+        FROM stages WHERE board_id = %s AND updated_at >= %s
+    """, ("board", "2024-01-01")),
+    ("boards.changes.items", """
+        SELECT i.id, i.updated_at
+        FROM stages s JOIN items i ON i.stage_id = s.id
+        WHERE s.board_id = %s AND i.updated_at >= %s
+    """, ("board", "2024-01-01")),
+    ("boards.changes.tombstones", """
+        SELECT entity, entity_id, deleted_at FROM board_tombstones
+        WHERE board_id = %s AND deleted_at >= %s
+    """, ("board", "2024-01-01")),
+    ("items.move_neighbours", """
+        SELECT position FROM items WHERE stage_id = %s AND id <> %s
+        ORDER BY position ASC, created_at ASC, id ASC LIMIT 3, 2
+    """, ("stage", "item")),
+    ("items.activities_page", """
+        SELECT id, text, timestamp, file FROM item_activities
+        WHERE item_id = %s AND (timestamp < %s OR (timestamp = %s AND id < %s))
+        ORDER BY timestamp DESC, id DESC LIMIT 51
+    """, ("item", "2024-01-01", "2024-01-01", 1)),
+    ("matching.interest_postings", _interest_query(2), ("Prayer", "Worship", "user")),
+    ("matching.age_location", _nearby_query(), ("user", "Manila", 25, 35)),
+    ("match_scores.page", """
+        SELECT ms.candidate_id, ms.score, u.name FROM match_scores ms
+        JOIN users u ON u.id = ms.candidate_id
+        WHERE ms.user_id = %s AND (ms.score < %s OR (ms.score = %s AND ms.candidate_id > %s))
+        ORDER BY ms.score DESC, ms.candidate_id ASC LIMIT 21
+    """, ("user", 3, 3, "user_1")),
+    ("users.dashboard.boards", DASHBOARD_QUERIES["boards"], ("user",)),
+    ("users.dashboard.stages", DASHBOARD_QUERIES["stages"], ("Done", "user")),
+    ("users.opposite_role", """
+        SELECT u.id FROM users u
+        WHERE u.role = %s AND u.id > %s ORDER BY u.id LIMIT 51
+    """, ("Disciple", "user")),
+    ("users.opposite_role.location", """
+        SELECT u.id FROM users u
+        WHERE u.role = %s AND u.location = %s AND u.id > %s ORDER BY u.id LIMIT 51
+    """, ("Disciple", "Manila", "user")),
+    ("users.disciples", """
+        SELECT u.id FROM discipleship d JOIN users u ON u.id = d.disciple_id
+        WHERE d.discipler_id = %s AND d.disciple_id > %s ORDER BY d.disciple_id LIMIT 51
+    """, ("user", "user")),
+]
+
+
+def check_query_plans(min_rows: int = 100) -> bool:
+    ok = True
+    with db_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        try:
+            for name, statement, params in HOT_QUERIES:
+                cursor.execute(f"EXPLAIN {statement}", params)
+                full_scans = [
+                    f"{row['table']} (~{row['rows']} rows)"
+                    for row in cursor.fetchall()
+                    if row['type'] == 'ALL' and (row['rows'] or 0) >= min_rows
+                ]
+                if full_scans:
+                    ok = False
+                    print(f"FULL SCAN  {name}: {', '.join(full_scans)}")
+                else:
+                    print(f"ok         {name}")
+        finally:
+            cursor.close()
+    return ok
@@ -1,29 +1,20 @@
 
 from fastapi import APIRouter, HTTPException, Depends
 from models.user import User, UserResponse
-import bcrypt
 import jwt
 import json
 from datetime import datetime, timedelta
 from config import Settings
-import mysql.connector
+from database import get_db, async_db_connection
+from cache import TTLCache
+from passwords import hash_password, verify_password, needs_rehash
+from matching import sync_user_interests
+from match_scores import enqueue as enqueue_match_refresh, match_refresher
 from mysql.connector import Error
 from fastapi.security import OAuth2PasswordBearer
 
 router = APIRouter()
 
-def get_db_connection():
-    try:
-        conn = mysql.connector.connect(
-            host=Settings.DB_HOST,
-            user=Settings.DB_USER,
-            password=Settings.DB_PASSWORD,
-            database=Settings.DB_NAME
-        )
-        return conn
-    except Error as e:
-        raise HTTPException(status_code=500, detail="Database connection error")
-
 def create_access_token(data: dict):
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=Settings.ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -31,24 +22,34 @@ def create_access_token(data: dict):
     encoded_jwt = jwt.encode(to_encode, Settings.SECRET_KEY, algorithm=Settings.ALGORITHM)
     return encoded_jwt
 
+# signup and login borrow a pooled connection only around their queries, so a
+# request waiting for a bcrypt worker doesn't hold one
+
 @router.post("/signup", response_model=UserResponse)
 async def signup(user: User):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
-        hashed_password = bcrypt.hashpw(user.password.encode(), bcrypt.gensalt())
-        cursor.execute(
-            """INSERT INTO users (id, name, role, age, location, interests, email, password) 
-               VALUES (%s, %s, %s, %s, %s, %s, %s, %s)""",
-            (user.id, user.name, user.role, user.age, user.location, 
-             json.dumps(user.interests), user.email, hashed_password)
-        )
-        conn.commit()
-        return {**user.dict(exclude={'password'})}
-    finally:
-        cursor.close()
-        conn.close()
+    hashed_password = await hash_password(user.password)
+
+    async with async_db_connection() as conn:
+        cursor = conn.cursor()
+
+        try:
+            await cursor.execute(
+                """INSERT INTO users (id, name, role, age, location, interests, email, password) 
+                   VALUES (%s, %s, %s, %s, %s, %s, %s, %s)""",
+                (user.id, user.name, user.role, user.age, user.location, 
+                 json.dumps(user.interests), user.email, hashed_password)
+            )
+            await sync_user_interests(cursor, user.id, user.interests)
+            await enqueue_match_refresh(cursor, user.id)
+            await conn.commit()
+        finally:
+            await cursor.close()
+
+    match_refresher.notify()
+
+    invalidate_user(user.id)
+    return {**user.dict(exclude={'password'})}
+
 from pydantic import BaseModel
 
 class LoginData(BaseModel):
@@ -57,56 +58,111 @@ class LoginData(BaseModel):
 
 @router.post("/login")
 async def login(login_data: LoginData):
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    
-    try:
-        cursor.execute("SELECT * FROM users WHERE email = %s", (login_data.email,))
-        user = cursor.fetchone()
-        
-        if not user or not bcrypt.checkpw(login_data.password.encode(), user['password'].encode()):
-            raise HTTPException(status_code=401, detail="Invalid credentials")
-            
-        access_token = create_access_token({"sub": user['email'], "user_id": user['id']})
-        return {
-            "access_token": access_token,
-            "token_type": "bearer",
-            "user": {**user, 'password': None}
-        }
-    finally:
-        cursor.close()
-        conn.close()
+    async with async_db_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        try:
+            await cursor.execute("SELECT * FROM users WHERE email = %s", (login_data.email,))
+            user = await cursor.fetchone()
+        finally:
+            await cursor.close()
+
+    if not user or not await verify_password(login_data.password, user['password']):
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+
+    # Upgrade hashes made with a different cost factor while we have the plaintext
+    if needs_rehash(user['password']):
+        new_hash = await hash_password(login_data.password)
+        async with async_db_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                await cursor.execute(
+                    "UPDATE users SET password = %s WHERE id = %s",
+                    (new_hash, user['id'])
+                )
+                await conn.commit()
+            finally:
+                await cursor.close()
+
+    access_token = create_access_token({
+        "sub": user['email'],
+        "user_id": user['id'],
+        "profile": _profile_claims(user)
+    })
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "user": {**user, 'password': None}
+    }
 
 from fastapi.security import OAuth2PasswordBearer
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
-async def get_current_user(token: str = Depends(oauth2_scheme)):
+# Authenticated user records keyed by user id; never holds the password hash
+user_cache = TTLCache(maxsize=Settings.USER_CACHE_SIZE, ttl=Settings.USER_CACHE_TTL)
+
+USER_COLUMNS = "id, name, role, age, location, interests, email, created_at"
+
+# Profile fields copied into the token so read-only endpoints can skip the lookup
+PROFILE_CLAIMS = ("id", "name", "role", "age", "location", "interests", "email")
+
+def invalidate_user(user_id: str):
+    user_cache.invalidate(user_id)
+
+def _profile_claims(user: dict) -> dict:
+    profile = {key: user[key] for key in PROFILE_CLAIMS}
+    if isinstance(profile["interests"], str):
+        profile["interests"] = json.loads(profile["interests"])
+    return profile
+
+def _decode_token(token: str) -> dict:
     try:
         payload = jwt.decode(token, Settings.SECRET_KEY, algorithms=[Settings.ALGORITHM])
-        email = payload.get("sub")
-        if email is None:
-            raise HTTPException(status_code=401, detail="Invalid authentication credentials")
+    except jwt.ExpiredSignatureError:
+        raise HTTPException(status_code=401, detail="Token has expired")
+    except jwt.PyJWTError:
+        raise HTTPException(status_code=401, detail="Could not validate credentials")
+
+    if payload.get("user_id") is None:
+        raise HTTPException(status_code=401, detail="Invalid authentication credentials")
+    return payload
 
-        conn = get_db_connection()
+async def _load_user(conn, user_id: str) -> dict:
+    user = user_cache.get(user_id)
+    if user is None:
         cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM users WHERE email = %s", (email,))
-        user = cursor.fetchone()
+        try:
+            await cursor.execute(f"SELECT {USER_COLUMNS} FROM users WHERE id = %s", (user_id,))
+            user = await cursor.fetchone()
+        finally:
+            await cursor.close()
 
         if user is None:
             raise HTTPException(status_code=401, detail="User not found")
-        
+
         # Decode interests if it exists and is a string
         if user.get("interests") and isinstance(user["interests"], str):
             user["interests"] = json.loads(user["interests"])
-        
-        return user
-    except jwt.ExpiredSignatureError:
-        raise HTTPException(status_code=401, detail="Token has expired")
-    except jwt.JWTError as e:
-        raise HTTPException(status_code=401, detail="Could not validate credentials")
 
+        user_cache.set(user_id, user)
 
+    # Handlers may modify the dict they get, so never hand out the cached one
+    return dict(user)
 
+async def get_current_user(token: str = Depends(oauth2_scheme), conn = Depends(get_db)):
+    payload = _decode_token(token)
+    return await _load_user(conn, payload["user_id"])
 
+async def get_token_user(token: str = Depends(oauth2_scheme), conn = Depends(get_db)):
+    # For read-only endpoints: optionally trust the token's profile claims
+    payload = _decode_token(token)
+    if Settings.AUTH_TRUST_TOKEN_CLAIMS and "profile" in payload:
+        return dict(payload["profile"])
+    return await _load_user(conn, payload["user_id"])
 
+async def get_streaming_user(token: str = Depends(oauth2_scheme)):
+    # For handlers that stream a request or response body: the connection is
+    # borrowed only for the lookup, so a slow client doesn't hold one
+    payload = _decode_token(token)
+    async with async_db_connection() as conn:
+        return await _load_user(conn, payload["user_id"])
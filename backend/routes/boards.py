@@ -1,61 +1,62 @@
-from fastapi import APIRouter, HTTPException, Depends
-from models.board import Board, BoardCreate, Stage, Item, StageCreate
-from typing import List, Dict
-from datetime import datetime
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Request, Response, WebSocket
+from fastapi.responses import StreamingResponse
+from models.board import (
+    Board, BoardCreate, BoardClone, BoardTemplate, Stage, Item, StageCreate, StageOrder, ItemPatch, ItemMove,
+    Activity, ItemBatch
+)
+from typing import List, Dict, Optional
+from datetime import datetime, timezone
+import asyncio
 import json
-import mysql.connector
+import secrets
 from mysql.connector import Error
 from config import Settings
-from .auth import get_current_user
-from slugify import slugify
+from database import async_db_connection, get_db
+from cache import SizedLRUCache
+from fast_json import body_response, compress, dumps, encoding_for, json_response
+from ordering import POSITION_GAP, park, position_for_index
+from board_counters import COMPLETED_STATUS, adjust_counters, item_counts
+from board_events import board_hub
+from board_transfer import BoardImportError, export_lines, import_board, iter_lines, new_board_id
+from .auth import get_current_user, get_streaming_user, get_token_user
 
 router = APIRouter(
     prefix="/boards",
     tags=["boards"]
 )
 
-def get_db_connection():
-    try:
-        conn = mysql.connector.connect(
-            host=Settings.DB_HOST,
-            user=Settings.DB_USER,
-            password=Settings.DB_PASSWORD,
-            database=Settings.DB_NAME
-        )
-        return conn
-    except Error as e:
-        raise HTTPException(status_code=500, detail="Database connection error")
-
 @router.post("/")
-async def create_board(board: BoardCreate, current_user = Depends(get_current_user)):
+async def create_board(board: BoardCreate, current_user = Depends(get_current_user), conn = Depends(get_db)):
     board.user_id = current_user['id']
-    conn = get_db_connection()
     cursor = conn.cursor()
     
     try:
+        if board.template_id:
+            created = await _clone_board(cursor, board.template_id, board.user_id, board.title)
+            await conn.commit()
+            return created
+
         # Create board with authenticated user as owner
-        board_id = slugify(board.title)
-        cursor.execute("SELECT id FROM boards WHERE id = %s", (board_id,))
-        if cursor.fetchone():
-            board_id = f"{board_id}-{int(datetime.now().timestamp())}"
+        board_id = await new_board_id(cursor, board.title)
             
-        cursor.execute(
-            "INSERT INTO boards (id, user_id, title) VALUES (%s, %s, %s)",
+        # Counted up front: the default stage and welcome item below
+        await cursor.execute(
+            "INSERT INTO boards (id, user_id, title, stage_count, item_count) VALUES (%s, %s, %s, 1, 1)",
             (board_id, board.user_id, board.title)
         )
         
         # Create default stage
         stage_id = f"newbie_{board_id}"
-        cursor.execute(
+        await cursor.execute(
             "INSERT INTO stages (id, board_id, title, position) VALUES (%s, %s, %s, %s)",
-            (stage_id, board_id, "Newbie", 1)
+            (stage_id, board_id, "Newbie", POSITION_GAP)
         )
         
         # Create default item
         item_id = f"item_{datetime.now().timestamp()}"
-        cursor.execute(
+        await cursor.execute(
             """INSERT INTO items 
-               (id, content, stage_id, description, status, progress, subtasks, activities) 
+               (id, content, stage_id, description, status, progress, subtasks, position) 
                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)""",
             (
                 item_id,
@@ -65,184 +66,510 @@ async def create_board(board: BoardCreate, current_user = Depends(get_current_us
                 "In Progress",
                 0,
                 "[]",
-                "[]"
+                POSITION_GAP
             )
         )
             
-        conn.commit()
+        await conn.commit()
         return {"id": board_id, "title": board.title, "user_id": board.user_id}
     finally:
-        cursor.close()
-        conn.close()
+        await cursor.close()
+
+# Board listings read the counters kept on the board row (board_counters.py);
+# progress is the average progress of the board's items
+BOARD_LIST_QUERY = """
+    SELECT id, user_id, title, version, is_template, created_at,
+           stage_count, item_count, completed_count,
+           COALESCE(ROUND(progress_sum / NULLIF(item_count, 0)), 0) AS progress
+    FROM boards
+    WHERE user_id = %s
+    ORDER BY created_at DESC
+"""
+
+async def list_boards(cursor, user_id: str) -> list:
+    await cursor.execute(BOARD_LIST_QUERY, (user_id,))
+    boards = await cursor.fetchall()
+    for board in boards:
+        board['progress'] = int(board['progress'])
+        board['is_template'] = bool(board['is_template'])
+    return boards
 
 @router.get("/")
-async def get_boards(current_user = Depends(get_current_user)):
+async def get_boards(
+    accept_encoding: Optional[str] = Header(None),
+    current_user = Depends(get_token_user),
+    conn = Depends(get_db)
+):
+    cursor = conn.cursor(dictionary=True)
+
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        cursor.execute("""
-            SELECT b.*, 
-                   COUNT(DISTINCT s.id) as stage_count, 
-                   COUNT(DISTINCT i.id) as item_count
-            FROM boards b
-            LEFT JOIN stages s ON b.id = s.board_id
-            LEFT JOIN items i ON s.id = i.stage_id
-            WHERE b.user_id = %s
-            GROUP BY b.id
-            ORDER BY b.created_at DESC
-        """, (current_user['id'],))
-        
-        boards = cursor.fetchall()
-        return boards
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        return json_response(await list_boards(cursor, current_user['id']), accept_encoding)
     finally:
-        cursor.close()
-        conn.close()
+        await cursor.close()
 
 from .auth import get_current_user
 
-@router.get("/{board_id}")
-async def get_board(board_id: str, current_user = Depends(get_current_user)):
-    conn = get_db_connection()
+# Serialized get_board payloads keyed by (board_id, version, details). A write
+# bumps the version, so stale snapshots are never served and just age out.
+board_snapshots = SizedLRUCache(max_bytes=Settings.BOARD_CACHE_MAX_BYTES)
+
+TEMPLATE_LIST_QUERY = """
+    SELECT id, user_id, title, stage_count, item_count, created_at
+    FROM boards
+    WHERE is_template = TRUE
+    ORDER BY title
+"""
+
+@router.get("/templates")
+async def get_templates(
+    accept_encoding: Optional[str] = Header(None),
+    current_user = Depends(get_token_user),
+    conn = Depends(get_db)
+):
+    # Every user can start a board from any template
     cursor = conn.cursor(dictionary=True)
+
+    try:
+        await cursor.execute(TEMPLATE_LIST_QUERY)
+        return json_response(await cursor.fetchall(), accept_encoding)
+    finally:
+        await cursor.close()
+
+# Numbers a board's stages in order; a copy's new stage ids come from the
+# numbering, so its items can look up their new stage by recomputing it. Like
+# every stage id, they end in "_<board id>" of the board they belong to.
+STAGE_NUMBERING = """
+    SELECT id, title, position,
+           CONCAT('stage-', ROW_NUMBER() OVER (ORDER BY position, id), '_', %s) AS new_id
+    FROM stages WHERE board_id = %s
+"""
+
+async def _clone_board(cursor, source_id: str, user_id: str, title: Optional[str] = None) -> dict:
+    # Copies the board row, stages and items with INSERT ... SELECT, so the
+    # statement count doesn't depend on the board's size. Activities and
+    # attachments stay behind. The share lock keeps the source's writers
+    # (all of which take its row lock in _bump_version) out until commit.
+    await cursor.execute("SELECT user_id, title, is_template FROM boards WHERE id = %s FOR SHARE", (source_id,))
+    source = await cursor.fetchone()
+
+    if not source:
+        raise HTTPException(status_code=404, detail="Board not found")
+    if source[0] != user_id and not source[2]:
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    title = title or source[1]
+    board_id = await new_board_id(cursor, title)
+    token = secrets.token_hex(4)
+
+    # Same rows, so the same counts
+    await cursor.execute("""
+        INSERT INTO boards (id, user_id, title, stage_count, item_count, completed_count, progress_sum)
+        SELECT %s, %s, %s, stage_count, item_count, completed_count, progress_sum
+        FROM boards WHERE id = %s
+    """, (board_id, user_id, title, source_id))
+    await cursor.execute(f"""
+        INSERT INTO stages (id, board_id, title, position)
+        SELECT new_id, %s, title, position FROM ({STAGE_NUMBERING}) n
+    """, (board_id, board_id, source_id))
+    await cursor.execute(f"""
+        INSERT INTO items (id, content, stage_id, description, status, progress, subtasks, position)
+        SELECT CONCAT('item_', %s, '_', ROW_NUMBER() OVER (ORDER BY i.id)),
+               i.content, n.new_id, i.description, i.status, i.progress, i.subtasks, i.position
+        FROM items i JOIN ({STAGE_NUMBERING}) n ON n.id = i.stage_id
+    """, (token, board_id, source_id))
+
+    return {"id": board_id, "title": title, "user_id": user_id}
+
+async def _bump_version(cursor, board_id: str) -> int:
+    # Every write to a board's stages or items calls this before its other
+    # writes, so concurrent writers to one board queue on the board row.
+    # Returns the new version (LAST_INSERT_ID(expr) hands it back in the
+    # same round trip).
+    await cursor.execute("UPDATE boards SET version = LAST_INSERT_ID(version + 1) WHERE id = %s", (board_id,))
+    return cursor.lastrowid
+
+def _publish(board_id: str, event_type: str, version: Optional[int] = None, **data):
+    # Only once the write has committed, so subscribers never see an event
+    # for a change they can't read yet. New boards (create, clone, import)
+    # have no subscribers, so they aren't announced.
+    board_hub.publish(board_id, {"type": event_type, "version": version, **data})
+
+
+ITEM_SUMMARY_COLUMNS = ("id", "content", "stage_id", "description", "status", "progress", "position", "created_at")
+# Activities live in item_activities and are paged separately, so card
+# history never adds to board loads
+ITEM_DETAIL_COLUMNS = ITEM_SUMMARY_COLUMNS + ("subtasks",)
+
+def _board_query(details: bool) -> str:
+    item_columns = ITEM_DETAIL_COLUMNS if details else ITEM_SUMMARY_COLUMNS
+    # One LEFT JOIN pass returns the owner, every stage (even empty ones) and
+    # every item, already in display order
+    return f"""
+        SELECT b.user_id, s.id, s.title, s.position, s.created_at,
+               {", ".join(f"i.{column}" for column in item_columns)}
+        FROM boards b
+        LEFT JOIN stages s ON s.board_id = b.id
+        LEFT JOIN items i ON i.stage_id = s.id
+        WHERE b.id = %s
+        ORDER BY s.position ASC, s.created_at ASC, s.id ASC, i.position ASC, i.created_at ASC, i.id ASC
+    """
+
+def _assemble_stages(rows, details: bool) -> dict:
+    item_columns = ITEM_DETAIL_COLUMNS if details else ITEM_SUMMARY_COLUMNS
+    stages = {}
+    for row in rows:
+        stage_id = row[1]
+        if stage_id is None:
+            continue
+
+        stage = stages.get(stage_id)
+        if stage is None:
+            stage = stages[stage_id] = {
+                "id": stage_id,
+                "title": row[2],
+                "position": row[3],
+                "created_at": row[4].isoformat() if row[4] else None,
+                "items": []
+            }
+
+        if row[5] is not None:
+            item = dict(zip(item_columns, row[5:]))
+            if details:
+                item['subtasks'] = json.loads(item['subtasks'] or '[]')
+            stage["items"].append(item)
+    return stages
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+@router.get("/{board_id}")
+async def get_board(
+    board_id: str,
+    details: bool = True,
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None),
+    current_user = Depends(get_token_user),
+    conn = Depends(get_db)
+):
+    # details=false leaves out subtasks so the board view only gets card
+    # summaries; GET /boards/{board_id}/items/{item_id} has the rest
+    cursor = conn.cursor()
     
     try:
-        # First verify board ownership
-        cursor.execute("SELECT user_id FROM boards WHERE id = %s", (board_id,))
-        board = cursor.fetchone()
-        
+        await cursor.execute("SELECT user_id, version FROM boards WHERE id = %s", (board_id,))
+        board = await cursor.fetchone()
+
         if not board:
             raise HTTPException(status_code=404, detail="Board not found")
-        
-        if board['user_id'] != current_user['id']:
+
+        if board[0] != current_user['id']:
             raise HTTPException(status_code=403, detail="Not authorized to access this board")
-        
-        # Get stages ordered by position and created_at
-        cursor.execute("""
-            SELECT * FROM stages 
-            WHERE board_id = %s 
-            ORDER BY position ASC, created_at ASC
-        """, (board_id,))
-        stages = cursor.fetchall()
-        
-        # Get items with all their data
-        cursor.execute("""
-            SELECT * FROM items 
-            WHERE stage_id IN (SELECT id FROM stages WHERE board_id = %s)
-            ORDER BY created_at ASC
-        """, (board_id,))
-        items = cursor.fetchall()
-        
-        # Process JSON fields
-        for item in items:
-            item['subtasks'] = json.loads(item['subtasks'] or '[]')
-            item['activities'] = json.loads(item['activities'] or '[]')
-        
-        # Organize data
-        board = {}
-        for stage in stages:
-            stage_items = [item for item in items if item['stage_id'] == stage['id']]
-            board[stage['id']] = {
-                "id": stage['id'],
-                "title": stage['title'],
-                "position": stage['position'],
-                "created_at": stage['created_at'].isoformat() if stage['created_at'] else None,
-                "items": stage_items
-            }
-        
-        return {"stages": board}
+
+        version = board[1]
+        etag = f'"{board_id}-{version}-{"full" if details else "summary"}"'
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if _etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+
+        cache_key = (board_id, version, details)
+        body = board_snapshots.get(cache_key)
+        if body is None:
+            # Same transaction as the version read, so the snapshot matches it
+            await cursor.execute(_board_query(details), (board_id,))
+            rows = await cursor.fetchall()
+            body = dumps({"stages": _assemble_stages(rows, details)})
+            board_snapshots.set(cache_key, body)
     finally:
-        cursor.close()
-        conn.close()
+        await cursor.close()
 
-@router.post("/{board_id}/stages")
-async def create_stage(board_id: str, stage: StageCreate, current_user = Depends(get_current_user)):
-    conn = get_db_connection()
+    encoding = encoding_for(body, accept_encoding)
+    if encoding:
+        # Compressed copies are cached next to the snapshot, so a version is
+        # compressed once per encoding. The ETag turns weak, as the same
+        # version is now served in more than one encoding.
+        compressed_key = cache_key + (encoding,)
+        compressed = board_snapshots.get(compressed_key)
+        if compressed is None:
+            compressed = compress(body, encoding)
+            board_snapshots.set(compressed_key, compressed)
+        body = compressed
+        headers["ETag"] = f"W/{etag}"
+    return body_response(body, encoding, headers)
+
+@router.get("/{board_id}/items/{item_id}")
+async def get_item(board_id: str, item_id: str, current_user = Depends(get_token_user), conn = Depends(get_db)):
+    cursor = conn.cursor(dictionary=True)
+
+    try:
+        await cursor.execute(f"""
+            SELECT b.user_id, {", ".join(f"i.{column}" for column in ITEM_DETAIL_COLUMNS)}
+            FROM boards b
+            JOIN stages s ON b.id = s.board_id
+            JOIN items i ON s.id = i.stage_id
+            WHERE b.id = %s AND i.id = %s
+        """, (board_id, item_id))
+        item = await cursor.fetchone()
+    finally:
+        await cursor.close()
+
+    if not item:
+        raise HTTPException(status_code=404, detail="Item not found")
+
+    if item.pop('user_id') != current_user['id']:
+        raise HTTPException(status_code=403, detail="Not authorized to access this board")
+
+    item['subtasks'] = json.loads(item['subtasks'] or '[]')
+    return item
+
+@router.get("/{board_id}/changes")
+async def get_board_changes(
+    board_id: str,
+    since: Optional[datetime] = None,
+    details: bool = True,
+    accept_encoding: Optional[str] = Header(None),
+    current_user = Depends(get_token_user),
+    conn = Depends(get_db)
+):
+    # Stages and items created or updated, and tombstones for those deleted,
+    # at or after `since`. Pass the returned cursor back as the next `since`;
+    # omitting it returns the whole board in the same shape. Every lookup is
+    # a range scan on an (owner, updated_at) index, so the cost follows the
+    # number of changes plus the number of stages, not the number of items.
     cursor = conn.cursor()
-    
+    item_columns = ITEM_DETAIL_COLUMNS if details else ITEM_SUMMARY_COLUMNS
+
     try:
-        # Get the maximum position
-        cursor.execute(
-            "SELECT MAX(position) FROM stages WHERE board_id = %s",
+        # Locking read: writers hold the board row from _bump_version until
+        # they commit, so this waits them out and nothing they wrote can be
+        # stamped earlier than the cursor yet still be invisible to us. The
+        # commit first drops any snapshot the auth lookup opened, so the reads
+        # below see what the writers committed.
+        await conn.commit()
+        await cursor.execute(
+            "SELECT user_id, version, NOW(6) FROM boards WHERE id = %s LOCK IN SHARE MODE",
             (board_id,)
         )
-        max_position = cursor.fetchone()[0] or 0
+        board = await cursor.fetchone()
+
+        if not board:
+            raise HTTPException(status_code=404, detail="Board not found")
+
+        if board[0] != current_user['id']:
+            raise HTTPException(status_code=403, detail="Not authorized to access this board")
+
+        since_clause = "AND {column} >= %s" if since else ""
+        params = (board_id, since) if since else (board_id,)
+
+        await cursor.execute(f"""
+            SELECT id, title, position, created_at, updated_at
+            FROM stages
+            WHERE board_id = %s {since_clause.format(column="updated_at")}
+        """, params)
+        stages = [
+            dict(zip(("id", "title", "position", "created_at", "updated_at"), row))
+            for row in await cursor.fetchall()
+        ]
+
+        await cursor.execute(f"""
+            SELECT {", ".join(f"i.{column}" for column in item_columns)}, i.updated_at
+            FROM stages s
+            JOIN items i ON i.stage_id = s.id
+            WHERE s.board_id = %s {since_clause.format(column="i.updated_at")}
+        """, params)
+        items = []
+        for row in await cursor.fetchall():
+            item = dict(zip(item_columns + ("updated_at",), row))
+            if details:
+                item['subtasks'] = json.loads(item['subtasks'] or '[]')
+            items.append(item)
+
+        deleted = []
+        if since:
+            await cursor.execute("""
+                SELECT entity, entity_id, deleted_at
+                FROM board_tombstones
+                WHERE board_id = %s AND deleted_at >= %s
+            """, params)
+            deleted = [
+                {"entity": entity, "id": entity_id, "deleted_at": deleted_at}
+                for entity, entity_id, deleted_at in await cursor.fetchall()
+            ]
+    finally:
+        await cursor.close()
+
+    return json_response({
+        "version": board[1],
+        "cursor": board[2],
+        "stages": stages,
+        "items": items,
+        "deleted": deleted
+    }, accept_encoding)
+
+@router.post("/{board_id}/stages")
+async def create_stage(board_id: str, stage: StageCreate, current_user = Depends(get_current_user), conn = Depends(get_db)):
+    cursor = conn.cursor()
+    
+    try:
+        await cursor.execute("SELECT user_id FROM boards WHERE id = %s", (board_id,))
+        board = await cursor.fetchone()
+
+        if not board:
+            raise HTTPException(status_code=404, detail="Board not found")
+
+        if board[0] != current_user['id']:
+            raise HTTPException(status_code=403, detail="Not authorized to access this board")
+
+        # Holding the board row lock from here to commit keeps concurrent
+        # creates from picking the same position
+        version = await _bump_version(cursor, board_id)
+        position = await position_for_index(cursor, "stages", "board_id", board_id, stage.position)
         
         # Generate stage ID
         stage_id = f"{stage.id}_{board_id}"
         
-        # Insert with next position
-        cursor.execute(
+        await cursor.execute(
             """INSERT INTO stages (id, board_id, title, position) 
                VALUES (%s, %s, %s, %s)""",
-            (stage_id, board_id, stage.title, max_position + 1)
+            (stage_id, board_id, stage.title, position)
         )
-        conn.commit()
-        return {"id": stage_id, "title": stage.title, "board_id": board_id}
+        await adjust_counters(cursor, board_id, stages=1)
+        await conn.commit()
+        _publish(board_id, "stage.created", version, id=stage_id, position=position)
+        return {"id": stage_id, "title": stage.title, "board_id": board_id, "position": position}
     finally:
-        cursor.close()
-        conn.close()
+        await cursor.close()
 
 # Add these endpoints at the end of your boards.py file
 
 @router.delete("/{board_id}/stages/{stage_id}")
-async def delete_stage(board_id: str, stage_id: str, current_user = Depends(get_current_user)):
-    conn = get_db_connection()
-    cursor = conn.cursor()
+async def delete_stage(board_id: str, stage_id: str, current_user = Depends(get_current_user), conn = Depends(get_db)):
+    cursor = conn.cursor(dictionary=True)
     
     try:
         # First verify board ownership
-        cursor.execute("SELECT user_id FROM boards WHERE id = %s", (board_id,))
-        board = cursor.fetchone()
+        await cursor.execute("SELECT user_id FROM boards WHERE id = %s", (board_id,))
+        board = await cursor.fetchone()
         
         if not board or board['user_id'] != current_user['id']:
             raise HTTPException(status_code=403, detail="Not authorized")
 
+        version = await _bump_version(cursor, board_id)
+
+        # What the stage's items add to the board counters; this also makes
+        # sure the stage is on this board before anything is deleted
+        await cursor.execute("""
+            SELECT COUNT(i.id) AS items,
+                   COALESCE(SUM(i.status = %s), 0) AS completed,
+                   COALESCE(SUM(COALESCE(i.progress, 0)), 0) AS progress
+            FROM stages s
+            LEFT JOIN items i ON i.stage_id = s.id
+            WHERE s.id = %s AND s.board_id = %s
+            GROUP BY s.id
+        """, (COMPLETED_STATUS, stage_id, board_id))
+        removed = await cursor.fetchone()
+        if not removed:
+            raise HTTPException(status_code=404, detail="Stage not found")
+
+        # Leave tombstones for the change feed
+        await cursor.execute("""
+            INSERT INTO board_tombstones (board_id, entity, entity_id)
+            SELECT %s, 'item', id FROM items WHERE stage_id = %s
+        """, (board_id, stage_id))
+        await cursor.execute(
+            "INSERT INTO board_tombstones (board_id, entity, entity_id) VALUES (%s, 'stage', %s)",
+            (board_id, stage_id)
+        )
+
         # Delete all items in the stage first
-        cursor.execute("DELETE FROM items WHERE stage_id = %s", (stage_id,))
-        
-        # Then delete the stage
-        cursor.execute("DELETE FROM stages WHERE id = %s AND board_id = %s", (stage_id, board_id))
+        await cursor.execute("DELETE FROM items WHERE stage_id = %s", (stage_id,))
         
-        # Reorder remaining stages
-        cursor.execute("""
-            UPDATE stages 
-            SET position = position - 1 
-            WHERE board_id = %s AND position > (
-                SELECT position FROM (
-                    SELECT position FROM stages WHERE id = %s
-                ) AS p
-            )
-        """, (board_id, stage_id))
+        # Then delete the stage; positions are sparse, so the stages after it
+        # keep theirs
+        await cursor.execute("DELETE FROM stages WHERE id = %s AND board_id = %s", (stage_id, board_id))
+        await adjust_counters(
+            cursor, board_id,
+            stages=-1,
+            items=-removed['items'],
+            completed=-int(removed['completed']),
+            progress=-int(removed['progress'])
+        )
         
-        conn.commit()
+        await conn.commit()
+        _publish(board_id, "stage.deleted", version, id=stage_id)
         return {"message": "Stage deleted successfully"}
     except Error as e:
-        conn.rollback()
+        await conn.rollback()
         raise HTTPException(status_code=500, detail=str(e))
     finally:
-        cursor.close()
-        conn.close()
+        await cursor.close()
+
+@router.put("/{board_id}/stages/order")
+async def reorder_stages(board_id: str, order: StageOrder, current_user = Depends(get_current_user), conn = Depends(get_db)):
+    # Applies a whole new stage order in one transaction: stage_ids must list
+    # every stage of the board exactly once. The stages are renumbered
+    # POSITION_GAP apart in the new order.
+    if len(set(order.stage_ids)) != len(order.stage_ids):
+        raise HTTPException(status_code=400, detail="stage_ids contains duplicates")
+
+    cursor = conn.cursor()
+
+    try:
+        await cursor.execute("SELECT user_id FROM boards WHERE id = %s", (board_id,))
+        board = await cursor.fetchone()
+
+        if not board or board[0] != current_user['id']:
+            raise HTTPException(status_code=403, detail="Not authorized")
+
+        # Read under the board lock, so no stage can be added or removed
+        # between the check and the update
+        version = await _bump_version(cursor, board_id)
+        await cursor.execute("SELECT id FROM stages WHERE board_id = %s", (board_id,))
+        current = {row[0] for row in await cursor.fetchall()}
+        if current != set(order.stage_ids):
+            raise HTTPException(status_code=409, detail="stage_ids must list every stage of the board exactly once")
+
+        positions = [(stage_id, (index + 1) * POSITION_GAP) for index, stage_id in enumerate(order.stage_ids)]
+        values, params = _row_table(("id", "position"), positions)
+        await park(cursor, "stages", "board_id", board_id)
+        await cursor.execute(f"""
+            UPDATE stages s
+            JOIN ({values}) v ON v.id = s.id
+            SET s.position = v.position
+            WHERE s.board_id = %s
+        """, (*params, board_id))
+        await conn.commit()
+        _publish(board_id, "stages.reordered", version, stage_ids=order.stage_ids)
+        return {"stages": [{"id": stage_id, "position": position} for stage_id, position in positions]}
+    finally:
+        await cursor.close()
 
 @router.post("/{board_id}/items")
-async def create_item(board_id: str, item: Item, current_user = Depends(get_current_user)):
-    conn = get_db_connection()
+async def create_item(board_id: str, item: Item, current_user = Depends(get_current_user), conn = Depends(get_db)):
     cursor = conn.cursor(dictionary=True)
     
     try:
         # Verify board ownership
-        cursor.execute("SELECT user_id FROM boards WHERE id = %s", (board_id,))
-        board = cursor.fetchone()
+        await cursor.execute("SELECT user_id FROM boards WHERE id = %s", (board_id,))
+        board = await cursor.fetchone()
         
         if not board or board['user_id'] != current_user['id']:
             raise HTTPException(status_code=403, detail="Not authorized")
 
-        cursor.execute(
+        version = await _bump_version(cursor, board_id)
+
+        await cursor.execute("SELECT 1 FROM stages WHERE id = %s AND board_id = %s", (item.stage_id, board_id))
+        if not await cursor.fetchone():
+            raise HTTPException(status_code=404, detail="Stage not found")
+
+        # New items go to the end of their stage
+        await cursor.execute(
             """INSERT INTO items 
-               (id, content, stage_id, description, status, progress, subtasks, activities) 
-               VALUES (%s, %s, %s, %s, %s, %s, %s, %s)""",
+               (id, content, stage_id, description, status, progress, subtasks, position) 
+               SELECT %s, %s, %s, %s, %s, %s, %s, COALESCE(MAX(position), 0) + %s
+               FROM items WHERE stage_id = %s""",
             (
                 item.id,
                 item.content,
@@ -250,43 +577,58 @@ async def create_item(board_id: str, item: Item, current_user = Depends(get_curr
                 item.description,
                 item.status,
                 item.progress,
-                json.dumps(item.subtasks),
-                json.dumps(item.activities)
+                json.dumps([subtask.dict() for subtask in item.subtasks]),
+                POSITION_GAP,
+                item.stage_id
             )
         )
-        conn.commit()
+        completed, progress = item_counts(item.status, item.progress)
+        await adjust_counters(cursor, board_id, items=1, completed=completed, progress=progress)
+        if item.activities:
+            await _insert_activities(cursor, item.id, item.activities)
+        await conn.commit()
+        _publish(board_id, "item.created", version, id=item.id, stage_id=item.stage_id)
         return {"message": "Item created successfully"}
     finally:
-        cursor.close()
-        conn.close()
+        await cursor.close()
 
 @router.put("/{board_id}/items/{item_id}")
-async def update_item(board_id: str, item_id: str, item: Item, current_user = Depends(get_current_user)):
-    conn = get_db_connection()
+async def update_item(board_id: str, item_id: str, item: Item, current_user = Depends(get_current_user), conn = Depends(get_db)):
     cursor = conn.cursor(dictionary=True)
     
     try:
-        # Verify board ownership
-        cursor.execute("""
-            SELECT b.user_id 
+        # Verify board ownership, and that the item stays on this board
+        await cursor.execute("""
+            SELECT b.user_id, t.id AS target_stage
             FROM boards b
             JOIN stages s ON b.id = s.board_id
             JOIN items i ON s.id = i.stage_id
+            LEFT JOIN stages t ON t.id = %s AND t.board_id = b.id
             WHERE b.id = %s AND i.id = %s
-        """, (board_id, item_id))
-        result = cursor.fetchone()
+        """, (item.stage_id, board_id, item_id))
+        result = await cursor.fetchone()
         
         if not result or result['user_id'] != current_user['id']:
             raise HTTPException(status_code=403, detail="Not authorized")
+        if result['target_stage'] is None:
+            raise HTTPException(status_code=404, detail="Stage not found")
 
-        # Convert subtasks and activities to JSON-serializable format
+        version = await _bump_version(cursor, board_id)
+
+        # Counter deltas against the item as it is now, read under the board lock
+        await cursor.execute("SELECT status, progress FROM items WHERE id = %s", (item_id,))
+        before = await cursor.fetchone()
+        completed, progress = item_counts(item.status, item.progress)
+        old_completed, old_progress = item_counts(before['status'], before['progress'])
+
+        # Convert subtasks to JSON-serializable format. Activities are
+        # append-only now (POST .../activities), so item.activities is ignored.
         subtasks_json = json.dumps([subtask.dict() for subtask in item.subtasks])
-        activities_json = json.dumps([activity.dict() for activity in item.activities])
 
-        cursor.execute(
+        await cursor.execute(
             """UPDATE items 
                SET content=%s, stage_id=%s, description=%s, status=%s, 
-                   progress=%s, subtasks=%s, activities=%s 
+                   progress=%s, subtasks=%s 
                WHERE id=%s""",
             (
                 item.content,
@@ -295,46 +637,535 @@ async def update_item(board_id: str, item_id: str, item: Item, current_user = De
                 item.status,
                 item.progress,
                 subtasks_json,
-                activities_json,
                 item_id
             )
         )
-        conn.commit()
+        await adjust_counters(cursor, board_id, completed=completed - old_completed, progress=progress - old_progress)
+        await conn.commit()
+        _publish(board_id, "item.updated", version, id=item_id, stage_id=item.stage_id)
         return {"message": "Item updated successfully"}
     except Error as e:
-        conn.rollback()
+        await conn.rollback()
         raise HTTPException(status_code=500, detail=str(e))
     finally:
-        cursor.close()
-        conn.close()
+        await cursor.close()
         
+@router.patch("/{board_id}/items/{item_id}")
+async def patch_item(board_id: str, item_id: str, patch: ItemPatch, current_user = Depends(get_current_user), conn = Depends(get_db)):
+    # Writes only the fields present in the request body
+    changes = patch.dict(exclude_unset=True)
+    if "subtasks" in changes:
+        changes["subtasks"] = json.dumps([subtask.dict() for subtask in patch.subtasks or []])
+
+    cursor = conn.cursor()
+
+    try:
+        await cursor.execute("""
+            SELECT b.user_id 
+            FROM boards b
+            JOIN stages s ON b.id = s.board_id
+            JOIN items i ON s.id = i.stage_id
+            WHERE b.id = %s AND i.id = %s
+        """, (board_id, item_id))
+        result = await cursor.fetchone()
+
+        if not result or result[0] != current_user['id']:
+            raise HTTPException(status_code=403, detail="Not authorized")
+
+        if changes:
+            version = await _bump_version(cursor, board_id)
+
+            deltas = {}
+            if "status" in changes or "progress" in changes:
+                await cursor.execute("SELECT status, progress FROM items WHERE id = %s", (item_id,))
+                status, progress = await cursor.fetchone()
+                old_completed, old_progress = item_counts(status, progress)
+                completed, progress = item_counts(changes.get("status", status), changes.get("progress", progress))
+                deltas = {"completed": completed - old_completed, "progress": progress - old_progress}
+
+            assignments = ", ".join(f"{column} = %s" for column in changes)
+            await cursor.execute(
+                f"UPDATE items SET {assignments} WHERE id = %s",
+                (*changes.values(), item_id)
+            )
+            await adjust_counters(cursor, board_id, **deltas)
+            await conn.commit()
+            _publish(board_id, "item.updated", version, id=item_id, fields=sorted(changes))
+        return {"message": "Item updated successfully"}
+    finally:
+        await cursor.close()
+
+@router.post("/{board_id}/items/{item_id}/move")
+async def move_item(board_id: str, item_id: str, move: ItemMove, current_user = Depends(get_current_user), conn = Depends(get_db)):
+    cursor = conn.cursor()
+
+    try:
+        # Ownership of the item and the target stage in one lookup
+        await cursor.execute("""
+            SELECT b.user_id, t.id
+            FROM boards b
+            JOIN stages s ON b.id = s.board_id
+            JOIN items i ON s.id = i.stage_id
+            LEFT JOIN stages t ON t.id = %s AND t.board_id = b.id
+            WHERE b.id = %s AND i.id = %s
+        """, (move.stage_id, board_id, item_id))
+        result = await cursor.fetchone()
+
+        if not result or result[0] != current_user['id']:
+            raise HTTPException(status_code=403, detail="Not authorized")
+        if result[1] is None:
+            raise HTTPException(status_code=404, detail="Stage not found")
+
+        version = await _bump_version(cursor, board_id)
+        position = await position_for_index(cursor, "items", "stage_id", move.stage_id, move.position, item_id)
+        await cursor.execute(
+            "UPDATE items SET stage_id = %s, position = %s WHERE id = %s",
+            (move.stage_id, position, item_id)
+        )
+        await conn.commit()
+        _publish(board_id, "item.moved", version, id=item_id, stage_id=move.stage_id, position=position)
+        return {"id": item_id, "stage_id": move.stage_id, "position": position}
+    finally:
+        await cursor.close()
+
+ACTIVITY_COLUMNS = ("id", "text", "timestamp", "file")
+
+def _utc_naive(timestamp: datetime) -> datetime:
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+def _activity_row(row) -> dict:
+    activity = dict(zip(ACTIVITY_COLUMNS, row))
+    activity['timestamp'] = activity['timestamp'].replace(tzinfo=timezone.utc).isoformat()
+    activity['file'] = json.loads(activity['file']) if activity['file'] else None
+    return activity
+
+ACTIVITY_INSERT = "INSERT INTO item_activities (item_id, text, timestamp, file) VALUES (%s, %s, %s, %s)"
+
+def _activity_params(item_id: str, activity: Activity) -> tuple:
+    return (item_id, activity.text, _utc_naive(activity.timestamp),
+            json.dumps(activity.file) if activity.file is not None else None)
+
+async def _insert_activities(cursor, item_id: str, activities: List[Activity]):
+    await cursor.executemany(ACTIVITY_INSERT, [_activity_params(item_id, activity) for activity in activities])
+
+async def _check_item_owner(cursor, board_id: str, item_id: str, user_id: str):
+    await cursor.execute("""
+        SELECT b.user_id 
+        FROM boards b
+        JOIN stages s ON b.id = s.board_id
+        JOIN items i ON s.id = i.stage_id
+        WHERE b.id = %s AND i.id = %s
+    """, (board_id, item_id))
+    result = await cursor.fetchone()
+
+    if not result or result[0] != user_id:
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+@router.post("/{board_id}/items/{item_id}/activities")
+async def add_activity(board_id: str, item_id: str, activity: Activity, current_user = Depends(get_current_user), conn = Depends(get_db)):
+    # A single-row append; the item row and the board version are untouched
+    cursor = conn.cursor()
+
+    try:
+        await _check_item_owner(cursor, board_id, item_id, current_user['id'])
+        await _insert_activities(cursor, item_id, [activity])
+        activity_id = cursor.lastrowid
+        await conn.commit()
+        _publish(board_id, "activity.created", item_id=item_id, id=activity_id)
+        return {"id": activity_id, **activity.dict()}
+    finally:
+        await cursor.close()
+
+@router.get("/{board_id}/items/{item_id}/activities")
+async def get_activities(
+    board_id: str,
+    item_id: str,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    current_user = Depends(get_token_user),
+    conn = Depends(get_db)
+):
+    # Newest first. Pass next_cursor back as ?cursor= for the page before.
+    after = None
+    if cursor:
+        try:
+            timestamp, activity_id = cursor.rsplit("_", 1)
+            after = (datetime.fromisoformat(timestamp), int(activity_id))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    db_cursor = conn.cursor()
+
+    try:
+        await _check_item_owner(db_cursor, board_id, item_id, current_user['id'])
+
+        keyset = "AND (timestamp < %s OR (timestamp = %s AND id < %s))" if after else ""
+        params = (item_id, after[0], after[0], after[1]) if after else (item_id,)
+        await db_cursor.execute(f"""
+            SELECT {", ".join(ACTIVITY_COLUMNS)}
+            FROM item_activities
+            WHERE item_id = %s {keyset}
+            ORDER BY timestamp DESC, id DESC
+            LIMIT %s
+        """, (*params, limit + 1))
+        rows = await db_cursor.fetchall()
+    finally:
+        await db_cursor.close()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = f"{rows[-1][2].isoformat()}_{rows[-1][0]}"
+
+    return {"activities": [_activity_row(row) for row in rows], "next_cursor": next_cursor}
+
 @router.delete("/{board_id}/items/{item_id}")
-async def delete_item(board_id: str, item_id: str, current_user = Depends(get_current_user)):
-    conn = get_db_connection()
+async def delete_item(board_id: str, item_id: str, current_user = Depends(get_current_user), conn = Depends(get_db)):
     cursor = conn.cursor()
     
     try:
         # Verify board ownership
-        cursor.execute("""
+        await cursor.execute("""
             SELECT b.user_id 
             FROM boards b
             JOIN stages s ON b.id = s.board_id
             JOIN items i ON s.id = i.stage_id
             WHERE b.id = %s AND i.id = %s
         """, (board_id, item_id))
-        result = cursor.fetchone()
+        result = await cursor.fetchone()
         
-        if not result or result['user_id'] != current_user['id']:
+        if not result or result[0] != current_user['id']:
             raise HTTPException(status_code=403, detail="Not authorized")
 
-        cursor.execute("DELETE FROM items WHERE id = %s", (item_id,))
-        conn.commit()
+        version = await _bump_version(cursor, board_id)
+
+        await cursor.execute("SELECT status, progress FROM items WHERE id = %s", (item_id,))
+        status, progress = await cursor.fetchone()
+        completed, progress = item_counts(status, progress)
+
+        await cursor.execute(
+            "INSERT INTO board_tombstones (board_id, entity, entity_id) VALUES (%s, 'item', %s)",
+            (board_id, item_id)
+        )
+        await cursor.execute("DELETE FROM items WHERE id = %s", (item_id,))
+        await adjust_counters(cursor, board_id, items=-1, completed=-completed, progress=-progress)
+        await conn.commit()
+        _publish(board_id, "item.deleted", version, id=item_id)
         return {"message": "Item deleted successfully"}
     finally:
-        cursor.close()
-        conn.close()
+        await cursor.close()
 
 
 
 
-        
\ No newline at end of file
+        
+def _row_table(columns: tuple, rows: list) -> tuple:
+    # ``rows`` as a derived table to join against: (sql, params)
+    first = "SELECT " + ", ".join(f"%s AS {column}" for column in columns)
+    rest = " UNION ALL SELECT " + ", ".join(["%s"] * len(columns))
+    return first + rest * (len(rows) - 1), [value for row in rows for value in row]
+
+class _ItemBatch:
+    """Applies a batch's operations in order against one board.
+
+    The board's stages and the referenced items are read once up front and
+    tracked in memory from then on, so each operation is validated without
+    a query. Consecutive operations of the same kind are queued and written
+    together: creates as one multi-row INSERT, updates with the same fields
+    as one UPDATE joined to their values, deletes as one DELETE ... IN.
+    Moves run one at a time, since their position depends on the rows
+    around them.
+    """
+
+    def __init__(self, cursor, board_id: str):
+        self.cursor = cursor
+        self.board_id = board_id
+        self.stages = set()
+        self.stage_ends = {}  # stage id -> its last position, for appending
+        self.items = {}  # item id -> {"status", "progress"} for items on the board
+        self.taken = set()  # item ids used on other boards
+        self.kind = None
+        self.pending = []
+        self.counters = {"items": 0, "completed": 0, "progress": 0}
+
+    async def load(self, operations):
+        await self.cursor.execute("""
+            SELECT s.id, COALESCE(MAX(i.position), 0)
+            FROM stages s LEFT JOIN items i ON i.stage_id = s.id
+            WHERE s.board_id = %s
+            GROUP BY s.id
+        """, (self.board_id,))
+        self.stage_ends = dict(await self.cursor.fetchall())
+        self.stages = set(self.stage_ends)
+
+        ids = list({operation.item.id if operation.op == "create" else operation.id for operation in operations})
+        placeholders = ", ".join(["%s"] * len(ids))
+        await self.cursor.execute(f"""
+            SELECT i.id, i.status, i.progress, s.board_id
+            FROM items i JOIN stages s ON s.id = i.stage_id
+            WHERE i.id IN ({placeholders})
+        """, tuple(ids))
+        for item_id, status, progress, board_id in await self.cursor.fetchall():
+            if board_id == self.board_id:
+                self.items[item_id] = {"status": status, "progress": progress}
+            else:
+                self.taken.add(item_id)
+
+    async def apply(self, index: int, operation) -> dict:
+        def reject(status_code, detail):
+            return HTTPException(status_code=status_code, detail={"index": index, "op": operation.op, "detail": detail})
+
+        if operation.op == "create":
+            item = operation.item
+            if item.id in self.items or item.id in self.taken:
+                raise reject(409, "Item already exists")
+            if item.stage_id not in self.stages:
+                raise reject(404, "Stage not found")
+            position = await self._append_position(item.stage_id)
+            await self._queue("create", (item, position))
+            self.items[item.id] = {"status": item.status, "progress": item.progress}
+            self._count(1, None, self.items[item.id])
+            return {"op": "create", "id": item.id, "stage_id": item.stage_id, "position": position}
+
+        state = self.items.get(operation.id)
+        if state is None:
+            raise reject(404, "Item not found")
+
+        if operation.op == "update":
+            changes = operation.patch.dict(exclude_unset=True)
+            if "subtasks" in changes:
+                changes["subtasks"] = json.dumps([subtask.dict() for subtask in operation.patch.subtasks or []])
+            if changes:
+                await self._queue(("update", tuple(changes)), (*changes.values(), operation.id))
+                before = dict(state)
+                state.update({column: changes[column] for column in ("status", "progress") if column in changes})
+                self._count(0, before, state)
+            return {"op": "update", "id": operation.id}
+
+        if operation.op == "move":
+            if operation.stage_id not in self.stages:
+                raise reject(404, "Stage not found")
+            await self._flush()
+            position = await position_for_index(
+                self.cursor, "items", "stage_id", operation.stage_id, operation.position, operation.id
+            )
+            await self.cursor.execute(
+                "UPDATE items SET stage_id = %s, position = %s WHERE id = %s",
+                (operation.stage_id, position, operation.id)
+            )
+            # The move may have renumbered the stage
+            self.stage_ends.pop(operation.stage_id, None)
+            return {"op": "move", "id": operation.id, "stage_id": operation.stage_id, "position": position}
+
+        await self._queue("delete", operation.id)
+        del self.items[operation.id]
+        self._count(-1, state, None)
+        return {"op": "delete", "id": operation.id}
+
+    def _count(self, items: int, before: Optional[dict], after: Optional[dict]):
+        # Counter deltas for an item going from ``before`` to ``after``
+        # (None when it doesn't exist on that side)
+        completed, progress = item_counts(after["status"], after["progress"]) if after else (0, 0)
+        if before:
+            old_completed, old_progress = item_counts(before["status"], before["progress"])
+            completed, progress = completed - old_completed, progress - old_progress
+        self.counters["items"] += items
+        self.counters["completed"] += completed
+        self.counters["progress"] += progress
+
+    async def _append_position(self, stage_id: str) -> int:
+        if stage_id not in self.stage_ends:
+            await self.cursor.execute("SELECT COALESCE(MAX(position), 0) FROM items WHERE stage_id = %s", (stage_id,))
+            self.stage_ends[stage_id] = (await self.cursor.fetchone())[0]
+        self.stage_ends[stage_id] += POSITION_GAP
+        return self.stage_ends[stage_id]
+
+    async def _queue(self, kind, entry):
+        if kind != self.kind:
+            await self._flush()
+            self.kind = kind
+        self.pending.append(entry)
+
+    async def _flush(self):
+        kind, pending = self.kind, self.pending
+        self.kind, self.pending = None, []
+        if not pending:
+            return
+
+        if kind == "create":
+            await self.cursor.executemany(
+                """INSERT INTO items
+                   (id, content, stage_id, description, status, progress, subtasks, position)
+                   VALUES (%s, %s, %s, %s, %s, %s, %s, %s)""",
+                [
+                    (item.id, item.content, item.stage_id, item.description, item.status, item.progress,
+                     json.dumps([subtask.dict() for subtask in item.subtasks]), position)
+                    for item, position in pending
+                ]
+            )
+            activities = [_activity_params(item.id, activity) for item, _ in pending for activity in item.activities]
+            if activities:
+                await self.cursor.executemany(ACTIVITY_INSERT, activities)
+        elif kind == "delete":
+            await self.cursor.executemany(
+                "INSERT INTO board_tombstones (board_id, entity, entity_id) VALUES (%s, 'item', %s)",
+                [(self.board_id, item_id) for item_id in pending]
+            )
+            placeholders = ", ".join(["%s"] * len(pending))
+            await self.cursor.execute(f"DELETE FROM items WHERE id IN ({placeholders})", tuple(pending))
+        else:
+            columns = kind[1]
+            values, params = _row_table((*columns, "id"), pending)
+            assignments = ", ".join(f"i.{column} = v.{column}" for column in columns)
+            await self.cursor.execute(
+                f"UPDATE items i JOIN ({values}) v ON v.id = i.id SET {assignments}",
+                tuple(params)
+            )
+
+    async def finish(self):
+        await self._flush()
+        await adjust_counters(self.cursor, self.board_id, **self.counters)
+
+@router.post("/{board_id}/items/batch")
+async def batch_items(board_id: str, batch: ItemBatch, current_user = Depends(get_current_user), conn = Depends(get_db)):
+    # All or nothing: the operations apply in order in one transaction, and
+    # the first one that fails rejects the batch with its index in the detail
+    cursor = conn.cursor()
+
+    try:
+        await cursor.execute("SELECT user_id FROM boards WHERE id = %s", (board_id,))
+        board = await cursor.fetchone()
+
+        if not board or board[0] != current_user['id']:
+            raise HTTPException(status_code=403, detail="Not authorized")
+
+        version = await _bump_version(cursor, board_id)
+
+        writer = _ItemBatch(cursor, board_id)
+        await writer.load(batch.operations)
+        results = [await writer.apply(index, operation) for index, operation in enumerate(batch.operations)]
+        await writer.finish()
+        await conn.commit()
+        # One event for the whole batch; subscribers fetch /changes for the rest
+        _publish(board_id, "items.batch", version, operations=len(results))
+        return {"results": results}
+    finally:
+        await cursor.close()
+
+# Export and import don't use get_db: FastAPI would hold that connection
+# until the whole stream has gone through, on top of the stream's own
+
+@router.get("/{board_id}/export")
+async def export_board(board_id: str, current_user = Depends(get_streaming_user)):
+    # NDJSON, see board_transfer.py; memory use doesn't grow with the board
+    async with async_db_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            await cursor.execute("SELECT user_id FROM boards WHERE id = %s", (board_id,))
+            board = await cursor.fetchone()
+        finally:
+            await cursor.close()
+
+    if not board or board[0] != current_user['id']:
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    return StreamingResponse(
+        export_lines(board_id),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{board_id}.ndjson"'}
+    )
+
+@router.post("/import")
+async def import_board_stream(request: Request, title: Optional[str] = None, current_user = Depends(get_streaming_user)):
+    # The request body is an export; it becomes a new board of the current
+    # user, committed in batches as it is read
+    async with async_db_connection() as conn:
+        try:
+            return await import_board(conn, iter_lines(request.stream()), current_user['id'], title)
+        except BoardImportError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/{board_id}/clone")
+async def clone_board(board_id: str, clone: BoardClone, current_user = Depends(get_current_user), conn = Depends(get_db)):
+    # A new board for the current user with a copy of a template's (or one
+    # of their own boards') stages and items
+    cursor = conn.cursor()
+
+    try:
+        created = await _clone_board(cursor, board_id, current_user['id'], clone.title)
+        await conn.commit()
+        return created
+    finally:
+        await cursor.close()
+
+@router.put("/{board_id}/template")
+async def set_template(board_id: str, template: BoardTemplate, current_user = Depends(get_current_user), conn = Depends(get_db)):
+    # Disciplers publish their own boards as templates for everyone
+    if current_user['role'] != "Discipler":
+        raise HTTPException(status_code=403, detail="Only disciplers can publish templates")
+
+    cursor = conn.cursor()
+
+    try:
+        await cursor.execute("SELECT user_id FROM boards WHERE id = %s", (board_id,))
+        board = await cursor.fetchone()
+
+        if not board or board[0] != current_user['id']:
+            raise HTTPException(status_code=403, detail="Not authorized")
+
+        await cursor.execute("UPDATE boards SET is_template = %s WHERE id = %s", (template.is_template, board_id))
+        await conn.commit()
+        _publish(board_id, "board.updated", is_template=template.is_template)
+        return {"id": board_id, "is_template": template.is_template}
+    finally:
+        await cursor.close()
+
+@router.websocket("/{board_id}/events")
+async def board_events(websocket: WebSocket, board_id: str, token: str = Query(...)):
+    # Change events for one board, as JSON text messages: {"board_id",
+    # "type", "version", ...}. Browsers can't set headers on a WebSocket, so
+    # the access token comes as ?token=. Close codes: 1008 not allowed, 1013
+    # fell too far behind (reconnect and catch up with /changes).
+    try:
+        current_user = await get_streaming_user(token)
+        async with async_db_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                await cursor.execute("SELECT user_id FROM boards WHERE id = %s", (board_id,))
+                board = await cursor.fetchone()
+            finally:
+                await cursor.close()
+    except HTTPException:
+        board = None
+    if not board or board[0] != current_user['id']:
+        await websocket.close(code=1008)
+        return
+
+    await websocket.accept()
+    subscriber = board_hub.subscribe(board_id)
+
+    async def send_events():
+        while True:
+            message = await subscriber.get()
+            if message is None:
+                await websocket.close(code=1013)
+                return
+            await websocket.send_text(message)
+
+    async def wait_for_close():
+        # Nothing is expected from the client; this just notices it leaving
+        while True:
+            if (await websocket.receive())["type"] == "websocket.disconnect":
+                return
+
+    tasks = [asyncio.ensure_future(send_events()), asyncio.ensure_future(wait_for_close())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        board_hub.unsubscribe(subscriber)
+        for task in tasks:
+            task.cancel()
+        # A send to a socket that just went away raises; that's expected
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,183 @@
+from fastapi import APIRouter, HTTPException, Depends, Header, Request, Response
+from typing import Optional
+from urllib.parse import quote
+import secrets
+from database import async_db_connection
+from routes.auth import get_streaming_user
+from storage import receive_upload, parse_range, blob_path, BlobResponse
+from thumbnails import thumbnail_pipeline, thumbnail_path
+
+router = APIRouter()
+
+# Neither handler uses get_db: FastAPI keeps yield dependencies open until the
+# response has been sent, and an upload or download can take far longer than
+# the queries around it
+
+# Downloads and thumbnails are linked from activity entries and loaded by the
+# browser (<a href>, <img src>), which can't send a bearer token. For those
+# two the file id is the capability: 128 random bits, so knowing the item id
+# doesn't help guess it. Everything else checks the item's owner.
+
+FILE_COLUMNS = ("id", "item_id", "sha256", "name", "content_type", "size", "created_at",
+                "status", "width", "height", "detected_type", "thumbnail", "thumbnail_size")
+
+# Filled in by the thumbnail pipeline once it has looked at the blob
+DERIVED_COLUMNS = ("status", "width", "height", "detected_type", "thumbnail", "thumbnail_size")
+
+# Detected types a download may show inline; anything else (including a
+# declared-only type, which the client chose) is served as an opaque attachment
+INLINE_TYPES = ("image/png", "image/jpeg", "image/gif", "image/webp")
+
+def _file_response(file: dict) -> dict:
+    url = f"/items/{file['item_id']}/files/{file['id']}"
+    return {
+        "id": file["id"],
+        "name": file["name"],
+        "url": url,
+        # Set while the thumbnail is still pending too, so an activity entry
+        # can store it straight away; it 404s until the pipeline is done
+        "thumbnail_url": f"{url}/thumbnail" if file["status"] in ("pending", "ready") else None,
+        "size": file["size"],
+        "content_type": file["detected_type"] or file["content_type"],
+        "status": file["status"],
+        "width": file["width"],
+        "height": file["height"],
+        "sha256": file["sha256"],
+    }
+
+async def _get_file(item_id: str, file_id: str) -> dict:
+    async with async_db_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        try:
+            await cursor.execute(
+                f"SELECT {', '.join(FILE_COLUMNS)} FROM item_files WHERE id = %s AND item_id = %s",
+                (file_id, item_id)
+            )
+            file = await cursor.fetchone()
+        finally:
+            await cursor.close()
+
+    if not file:
+        raise HTTPException(status_code=404, detail="File not found")
+    return file
+
+async def _check_item_owner(item_id: str, user_id: str):
+    async with async_db_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            await cursor.execute("""
+                SELECT b.user_id
+                FROM items i
+                JOIN stages s ON s.id = i.stage_id
+                JOIN boards b ON b.id = s.board_id
+                WHERE i.id = %s
+            """, (item_id,))
+            result = await cursor.fetchone()
+        finally:
+            await cursor.close()
+
+    if not result:
+        raise HTTPException(status_code=404, detail="Item not found")
+    if result[0] != user_id:
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+@router.post("/items/{item_id}/files")
+async def upload_file(item_id: str, request: Request, current_user = Depends(get_streaming_user)):
+    await _check_item_owner(item_id, current_user['id'])
+
+    blob = await receive_upload(request)
+    file = {"id": secrets.token_hex(16), "item_id": item_id, **blob, **dict.fromkeys(DERIVED_COLUMNS)}
+    file["status"] = "pending"
+
+    async with async_db_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        try:
+            await cursor.execute(
+                """INSERT INTO item_files (id, item_id, sha256, name, content_type, size, uploaded_by)
+                   VALUES (%s, %s, %s, %s, %s, %s, %s)""",
+                (file["id"], item_id, file["sha256"], file["name"],
+                 file["content_type"], file["size"], current_user['id'])
+            )
+
+            # The same bytes may have been processed already. Checked after
+            # the insert, so a pipeline update racing with it still sees
+            # this row as pending and fills it in.
+            await cursor.execute(
+                f"""SELECT {', '.join(DERIVED_COLUMNS)} FROM item_files
+                    WHERE sha256 = %s AND status <> 'pending' LIMIT 1""",
+                (file["sha256"],)
+            )
+            processed = await cursor.fetchone()
+            if processed:
+                await cursor.execute(
+                    f"UPDATE item_files SET {', '.join(f'{column} = %s' for column in DERIVED_COLUMNS)} WHERE id = %s",
+                    (*processed.values(), file["id"])
+                )
+                file.update(processed)
+            await conn.commit()
+        finally:
+            await cursor.close()
+
+    if file["status"] == "pending":
+        thumbnail_pipeline.submit(file["sha256"])
+    return _file_response(file)
+
+@router.get("/items/{item_id}/files/{file_id}/info")
+async def get_file_info(item_id: str, file_id: str, current_user = Depends(get_streaming_user)):
+    await _check_item_owner(item_id, current_user['id'])
+    return _file_response(await _get_file(item_id, file_id))
+
+@router.get("/items/{item_id}/files/{file_id}/thumbnail")
+async def download_thumbnail(item_id: str, file_id: str, if_none_match: Optional[str] = Header(None)):
+    # No bearer token; the file id grants access (see above)
+    file = await _get_file(item_id, file_id)
+    if file["status"] == "pending":
+        raise HTTPException(status_code=404, detail="Thumbnail not ready", headers={"Retry-After": "2"})
+    if file["status"] != "ready":
+        raise HTTPException(status_code=404, detail="File has no thumbnail")
+
+    etag = f'"{file["thumbnail"]}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "private, max-age=31536000, immutable",
+        "X-Content-Type-Options": "nosniff",
+    }
+    if if_none_match and etag in if_none_match:
+        return Response(status_code=304, headers=headers)
+    return BlobResponse(thumbnail_path(file["thumbnail"]), file["thumbnail_size"], headers=headers, media_type="image/webp")
+
+@router.get("/items/{item_id}/files/{file_id}")
+async def download_file(
+    item_id: str,
+    file_id: str,
+    range_header: Optional[str] = Header(None, alias="range"),
+    if_range: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None)
+):
+    # No bearer token; the file id grants access (see above)
+    file = await _get_file(item_id, file_id)
+
+    # Blobs are content-addressed, so a file id's bytes never change
+    etag = f'"{file["sha256"]}"'
+    if file["detected_type"] in INLINE_TYPES:
+        disposition, media_type = "inline", file["detected_type"]
+    else:
+        disposition, media_type = "attachment", "application/octet-stream"
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "private, max-age=31536000, immutable",
+        "Content-Disposition": f"{disposition}; filename*=UTF-8''{quote(file['name'])}",
+        "X-Content-Type-Options": "nosniff",
+    }
+    if if_none_match and etag in if_none_match:
+        return Response(status_code=304, headers=headers)
+
+    # If-Range lets a client resume only if the file hasn't changed
+    byte_range = parse_range(range_header, file["size"]) if not if_range or if_range == etag else None
+    return BlobResponse(
+        blob_path(file["sha256"]),
+        file["size"],
+        byte_range,
+        headers=headers,
+        media_type=media_type
+    )
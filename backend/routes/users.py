@@ -1,189 +1,321 @@
 
-from fastapi import APIRouter, Depends, HTTPException
-from models.user import User, UserResponse
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from models.user import User, UserResponse, UserUpdate
 from models.discipleship import Discipleship, DiscipleshipCreate
-from typing import List
-import mysql.connector
+from typing import List, Optional
 from mysql.connector import Error
 from config import Settings
+from database import get_db
+from cache import TTLCache
+from fast_json import json_response
 from datetime import datetime
-from .auth import get_current_user
+from matching import parse_cursor, sync_user_interests, top_matches
+from match_scores import enqueue as enqueue_match_refresh, match_refresher, stored_matches
+from .boards import list_boards
+from board_counters import COMPLETED_STATUS
+from .auth import USER_COLUMNS, get_current_user, get_token_user, invalidate_user
 import json
 
 router = APIRouter()
 
-def get_db_connection():
-    try:
-        conn = mysql.connector.connect(
-            host=Settings.DB_HOST,
-            user=Settings.DB_USER,
-            password=Settings.DB_PASSWORD,
-            database=Settings.DB_NAME
-        )
-        return conn
-    except Error as e:
-        raise HTTPException(status_code=500, detail="Database connection error")
+# Profile fields that feed into match scores
+MATCH_FIELDS = {"interests", "age", "location"}
+
+# Never SELECT * from users: it drags the password hash along
+USER_SELECT = ", ".join(f"u.{column}" for column in USER_COLUMNS.split(", "))
+
+def _decode_interests(user: dict) -> dict:
+    if user.get("interests") and isinstance(user["interests"], str):
+        user["interests"] = json.loads(user["interests"])
+    return user
+
+def user_filters(
+    location: Optional[str] = None,
+    min_age: Optional[int] = Query(None, ge=0),
+    max_age: Optional[int] = Query(None, ge=0),
+    interest: Optional[str] = None
+):
+    conditions, params = [], []
+    if location:
+        conditions.append("u.location = %s")
+        params.append(location)
+    if min_age is not None:
+        conditions.append("u.age >= %s")
+        params.append(min_age)
+    if max_age is not None:
+        conditions.append("u.age <= %s")
+        params.append(max_age)
+    if interest:
+        conditions.append("EXISTS (SELECT 1 FROM user_interests ui WHERE ui.user_id = u.id AND ui.interest = %s)")
+        params.append(interest)
+    return conditions, params
+
+async def _list_users(cursor, response: Response, source: str, conditions: list, params: list,
+                      limit: int, after: Optional[str], key: str = "u.id"):
+    # Keyset page ordered by user id (``key`` names the column holding it
+    # that the index walks); X-Next-Cursor holds the ?cursor= for the next
+    # page when there is one
+    if after:
+        conditions = [*conditions, f"{key} > %s"]
+        params = [*params, after]
+
+    await cursor.execute(f"""
+        SELECT {USER_SELECT} FROM {source}
+        WHERE {" AND ".join(conditions)}
+        ORDER BY {key}
+        LIMIT %s
+    """, (*params, limit + 1))
+    users = await cursor.fetchall()
+
+    if len(users) > limit:
+        users = users[:limit]
+        response.headers["X-Next-Cursor"] = users[-1]["id"]
+    return [_decode_interests(user) for user in users]
 
 @router.get("/users/{user_id}", response_model=UserResponse)
-async def get_user(user_id: str):
-    conn = get_db_connection()
+async def get_user(user_id: str, conn = Depends(get_db)):
     cursor = conn.cursor(dictionary=True)
     
     try:
-        cursor.execute("SELECT * FROM users WHERE id = %s", (user_id,))
-        user = cursor.fetchone()
+        await cursor.execute(f"SELECT {USER_SELECT} FROM users u WHERE u.id = %s", (user_id,))
+        user = await cursor.fetchone()
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
-        return user
+        return _decode_interests(user)
     finally:
-        cursor.close()
-        conn.close()
+        await cursor.close()
+
+@router.patch("/me", response_model=UserResponse)
+async def update_profile(update: UserUpdate, current_user: dict = Depends(get_current_user), conn = Depends(get_db)):
+    changes = update.dict(exclude_unset=True)
+    if not changes:
+        return current_user
+    if "interests" in changes:
+        changes["interests"] = json.dumps(changes["interests"])
 
-@router.get("/opposite-role", response_model=List[UserResponse])
-async def get_users_by_opposite_role(current_user: UserResponse = Depends(get_current_user)):
-    conn = get_db_connection()
     cursor = conn.cursor(dictionary=True)
 
     try:
-        opposite_role = "Discipler" if current_user["role"] == "Disciple" else "Disciple"
-
-        cursor.execute("SELECT * FROM users WHERE role = %s", (opposite_role,))
-        users = cursor.fetchall()
+        assignments = ", ".join(f"{column} = %s" for column in changes)
+        await cursor.execute(
+            f"UPDATE users SET {assignments} WHERE id = %s",
+            (*changes.values(), current_user["id"])
+        )
+        if "interests" in changes:
+            await sync_user_interests(cursor, current_user["id"], update.interests)
+        rescore = bool(MATCH_FIELDS & changes.keys())
+        if rescore:
+            await enqueue_match_refresh(cursor, current_user["id"])
+        await cursor.execute(f"SELECT {USER_SELECT} FROM users u WHERE u.id = %s", (current_user["id"],))
+        user = await cursor.fetchone()
+        await conn.commit()
+        invalidate_user(current_user["id"])
+        if rescore:
+            match_refresher.notify()
+        return _decode_interests(user)
+    finally:
+        await cursor.close()
 
-        # Decode interests for each user
-        for user in users:
-            if user.get("interests") and isinstance(user["interests"], str):
-                user["interests"] = json.loads(user["interests"])
+@router.get("/opposite-role", response_model=List[UserResponse])
+async def get_users_by_opposite_role(
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    filters = Depends(user_filters),
+    accept_encoding: Optional[str] = Header(None),
+    current_user: UserResponse = Depends(get_token_user),
+    conn = Depends(get_db)
+):
+    db_cursor = conn.cursor(dictionary=True)
 
-        return users
+    try:
+        opposite_role = "Discipler" if current_user["role"] == "Disciple" else "Disciple"
+        conditions, params = filters
+        users = await _list_users(
+            db_cursor, response, "users u",
+            ["u.role = %s", *conditions], [opposite_role, *params],
+            limit, cursor
+        )
+        # Rows straight from users need no second pass through UserResponse
+        return json_response(users, accept_encoding, response.headers)
     finally:
-        cursor.close()
-        conn.close()
+        await db_cursor.close()
 
 @router.get("/suggested-matches")
-async def suggested_matches(current_user: dict = Depends(get_current_user)):
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-
+async def suggested_matches(
+    response: Response,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    accept_encoding: Optional[str] = Header(None),
+    current_user: dict = Depends(get_token_user),
+    conn = Depends(get_db)
+):
+    # Best matches first, read from the precomputed list; when there are
+    # more, X-Next-Cursor holds the ?cursor= for the next page
     try:
-        # Fetch all users except the current user
-        cursor.execute("SELECT * FROM users WHERE id != %s", (current_user["id"],))
-        all_users = cursor.fetchall()
-
-        suggestions = []
-
-        for user in all_users:
-            # Decode interests if it's stored as a JSON string
-            if isinstance(user["interests"], str):
-                user["interests"] = json.loads(user["interests"])
-
-            # Calculate common interests
-            common_interests = set(current_user["interests"]) & set(user["interests"])
-
-            # Calculate age difference
-            age_difference = abs(current_user["age"] - user["age"])
-            within_age_range = age_difference <= 5  # Example: within 5 years
-
-            # Check location similarity
-            same_location = current_user["location"].lower() == user["location"].lower()
-
-            # Add match score
-            match_score = len(common_interests)
-            if within_age_range:
-                match_score += 1
-            if same_location:
-                match_score += 1
-
-            suggestions.append({
-                "id": user["id"],
-                "name": user["name"],
-                "email": user["email"],
-                "location": user["location"],
-                "common_interests": list(common_interests),
-                "within_age_range": within_age_range,
-                "same_location": same_location,
-                "match_score": match_score,
-            })
-
-        # Sort suggestions by match score, descending
-        suggestions.sort(key=lambda x: x["match_score"], reverse=True)
-
-        return suggestions
-    finally:
-        cursor.close()
-        conn.close()
+        after = parse_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
+    db_cursor = conn.cursor(dictionary=True)
 
+    try:
+        matches, next_cursor = await stored_matches(db_cursor, current_user["id"], limit, after)
+        if matches is None:
+            # Just signed up, so the list hasn't been computed yet
+            matches, next_cursor = await top_matches(db_cursor, current_user, limit, after)
+    finally:
+        await db_cursor.close()
 
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return json_response(matches, accept_encoding, response.headers)
 
 @router.get("/discipler/{discipler_id}/disciples")
-async def get_disciples(discipler_id: str):
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    
+async def get_disciples(
+    discipler_id: str,
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    filters = Depends(user_filters),
+    accept_encoding: Optional[str] = Header(None),
+    conn = Depends(get_db)
+):
+    db_cursor = conn.cursor(dictionary=True)
+
     try:
-        cursor.execute("""
-            SELECT u.* FROM users u
-            JOIN discipleship d ON u.id = d.disciple_id
-            WHERE d.discipler_id = %s
-        """, (discipler_id,))
-        return cursor.fetchall()
+        conditions, params = filters
+        users = await _list_users(
+            db_cursor, response, "discipleship d JOIN users u ON u.id = d.disciple_id",
+            ["d.discipler_id = %s", *conditions], [discipler_id, *params],
+            limit, cursor, key="d.disciple_id"
+        )
+        return json_response(users, accept_encoding, response.headers)
     finally:
-        cursor.close()
-        conn.close()
+        await db_cursor.close()
+
+# Every query the dashboard makes (besides the current-user lookup); the
+# count doesn't grow with disciples, boards or stages
+DASHBOARD_QUERIES = {
+    "disciples": f"""
+        SELECT {USER_SELECT} FROM discipleship d
+        JOIN users u ON u.id = d.disciple_id
+        WHERE d.discipler_id = %s
+        ORDER BY d.disciple_id
+    """,
+    "boards": """
+        SELECT b.id, b.user_id, b.title, b.created_at,
+               b.stage_count, b.item_count, b.completed_count,
+               COALESCE(ROUND(b.progress_sum / NULLIF(b.item_count, 0)), 0) AS progress
+        FROM discipleship d
+        JOIN boards b ON b.user_id = d.disciple_id
+        WHERE d.discipler_id = %s
+        ORDER BY b.user_id, b.created_at DESC
+    """,
+    "stages": """
+        SELECT s.board_id, s.id, s.title, s.position,
+               COUNT(i.id) AS item_count,
+               COALESCE(SUM(i.status = %s), 0) AS completed_count,
+               COALESCE(ROUND(AVG(COALESCE(i.progress, 0))), 0) AS progress
+        FROM discipleship d
+        JOIN boards b ON b.user_id = d.disciple_id
+        JOIN stages s ON s.board_id = b.id
+        LEFT JOIN items i ON i.stage_id = s.id
+        WHERE d.discipler_id = %s
+        GROUP BY s.id
+        ORDER BY s.board_id, s.position, s.id
+    """,
+}
+
+dashboard_cache = TTLCache(maxsize=Settings.DASHBOARD_CACHE_SIZE, ttl=Settings.DASHBOARD_CACHE_TTL)
+
+async def _build_dashboard(cursor, discipler_id: str) -> dict:
+    await cursor.execute(DASHBOARD_QUERIES["disciples"], (discipler_id,))
+    disciples = [_decode_interests(user) for user in await cursor.fetchall()]
+
+    await cursor.execute(DASHBOARD_QUERIES["boards"], (discipler_id,))
+    boards = await cursor.fetchall()
+
+    await cursor.execute(DASHBOARD_QUERIES["stages"], (COMPLETED_STATUS, discipler_id))
+    stages = {}
+    for stage in await cursor.fetchall():
+        board_id = stage.pop("board_id")
+        stage["completed_count"] = int(stage["completed_count"])
+        stage["progress"] = int(stage["progress"])
+        stages.setdefault(board_id, []).append(stage)
+
+    boards_by_user = {}
+    for board in boards:
+        board["progress"] = int(board["progress"])
+        board["stages"] = stages.get(board["id"], [])
+        boards_by_user.setdefault(board.pop("user_id"), []).append(board)
+
+    for disciple in disciples:
+        disciple["boards"] = boards_by_user.get(disciple["id"], [])
+    return {"discipler_id": discipler_id, "disciples": disciples}
+
+@router.get("/discipler/{discipler_id}/dashboard")
+async def get_dashboard(
+    discipler_id: str,
+    accept_encoding: Optional[str] = Header(None),
+    current_user = Depends(get_token_user),
+    conn = Depends(get_db)
+):
+    # Every disciple with their boards and per-stage progress in one
+    # response, from the three DASHBOARD_QUERIES. Cached for
+    # DASHBOARD_CACHE_TTL seconds, so board changes can take that long to show.
+    if current_user["id"] != discipler_id:
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    dashboard = dashboard_cache.get(discipler_id)
+    if dashboard is None:
+        cursor = conn.cursor(dictionary=True)
+        try:
+            dashboard = await _build_dashboard(cursor, discipler_id)
+        finally:
+            await cursor.close()
+        dashboard_cache.set(discipler_id, dashboard)
+    return json_response(dashboard, accept_encoding)
 
 @router.get("/disciple/{disciple_id}/discipler")
-async def get_discipler(disciple_id: str):
-    conn = get_db_connection()
+async def get_discipler(disciple_id: str, conn = Depends(get_db)):
     cursor = conn.cursor(dictionary=True)
     
     try:
-        cursor.execute("""
-            SELECT u.* FROM users u
+        await cursor.execute(f"""
+            SELECT {USER_SELECT} FROM users u
             JOIN discipleship d ON u.id = d.discipler_id
             WHERE d.disciple_id = %s
         """, (disciple_id,))
-        return cursor.fetchone()
+        discipler = await cursor.fetchone()
+        return _decode_interests(discipler) if discipler else None
     finally:
-        cursor.close()
-        conn.close()
+        await cursor.close()
 
 @router.post("/discipleship")
-async def create_discipleship(discipleship: DiscipleshipCreate):
-    conn = get_db_connection()
+async def create_discipleship(discipleship: DiscipleshipCreate, conn = Depends(get_db)):
     cursor = conn.cursor()
     
     try:
-        cursor.execute(
+        await cursor.execute(
             "INSERT INTO discipleship (id, discipler_id, disciple_id) VALUES (%s, %s, %s)",
             (f"disc_{datetime.now().timestamp()}", discipleship.discipler_id, discipleship.disciple_id)
         )
-        conn.commit()
+        # Both sides' lists are recomputed when a pairing is made
+        await enqueue_match_refresh(cursor, discipleship.discipler_id, reverse=False)
+        await enqueue_match_refresh(cursor, discipleship.disciple_id, reverse=False)
+        await conn.commit()
+        match_refresher.notify()
+        dashboard_cache.invalidate(discipleship.discipler_id)
         return {"message": "Discipleship relationship created"}
     finally:
-        cursor.close()
-        conn.close()
+        await cursor.close()
 
 @router.get("/{user_id}/boards")
-async def get_user_boards(user_id: str):
-    conn = get_db_connection()
+async def get_user_boards(user_id: str, accept_encoding: Optional[str] = Header(None), conn = Depends(get_db)):
     cursor = conn.cursor(dictionary=True)
     
     try:
-        cursor.execute("""
-            SELECT b.*, 
-                   COUNT(DISTINCT s.id) as stage_count, 
-                   COUNT(DISTINCT i.id) as item_count
-            FROM boards b
-            LEFT JOIN stages s ON b.id = s.board_id
-            LEFT JOIN items i ON s.id = i.stage_id
-            WHERE b.user_id = %s
-            GROUP BY b.id
-            ORDER BY b.created_at DESC
-        """, (user_id,))
-        
-        boards = cursor.fetchall()
-        return boards if boards else []
+        return json_response(await list_boards(cursor, user_id), accept_encoding)
     finally:
-        cursor.close()
-        conn.close()
+        await cursor.close()
@@ -0,0 +1,247 @@
+# seed.py
+"""Synthetic data at a realistic scale, for benchmarks and load tests.
+
+Generates users split between Disciplers and Disciples, with interests and
+locations skewed the way real ones are, discipleship pairs, and boards for
+every user with a fixed number of stages, items per stage and activities per
+item. Output depends only on the options, so two runs with the same options
+produce the same rows.
+
+Every id and email starts with ``--prefix`` and every user has the password
+``--password``, so the load benchmark (benchmarks/load.py) can find the data
+and log in, and ``reset`` can remove it again:
+
+    python seed.py seed --users 2000 --boards 2 --stages 5 --items 20 --activities 3
+    python seed.py reset
+
+Board counters and stage and item positions are written as the app would
+leave them. Suggested-match lists are rebuilt at the end unless
+``--skip-matches`` is given, in which case the seeded users are queued for
+the background refresher.
+"""
+import argparse
+import asyncio
+import json
+import random
+from datetime import datetime, timedelta
+
+import bcrypt
+
+from board_counters import item_counts
+from config import Settings
+from database import db_connection
+from match_scores import rebuild as rebuild_matches
+from ordering import POSITION_GAP
+
+# Rows per multi-row INSERT
+INSERT_BATCH = 1000
+
+# Users generated (with their boards) per transaction
+USER_BATCH = 200
+
+FIRST_NAMES = ["Aaron", "Abigail", "Daniel", "Deborah", "Elijah", "Esther", "Gabriel", "Hannah", "Isaac",
+               "Joanna", "Jonah", "Leah", "Lydia", "Micah", "Miriam", "Naomi", "Nathan", "Priscilla",
+               "Ruth", "Samuel", "Sarah", "Silas", "Timothy", "Tabitha"]
+LAST_NAMES = ["Bautista", "Cruz", "Garcia", "Johnson", "Kim", "Lopez", "Mendoza", "Nguyen", "Reyes",
+              "Santos", "Smith", "Torres", "Villanueva", "Williams"]
+INTERESTS = ["Bible study", "Prayer", "Worship", "Music", "Missions", "Youth ministry", "Evangelism",
+             "Apologetics", "Theology", "Church history", "Counseling", "Hospitality", "Teaching",
+             "Leadership", "Discipleship", "Family", "Marriage", "Parenting", "Fasting", "Journaling",
+             "Scripture memory", "Small groups", "Outreach", "Volunteering", "Sports", "Hiking", "Reading",
+             "Writing", "Art", "Photography", "Cooking", "Languages", "Technology", "Business",
+             "Medicine", "Education", "Finance", "Gardening", "Travel", "Film"]
+LOCATIONS = [f"City {n}" for n in range(1, 201)]
+STAGE_TITLES = ["Backlog", "This Week", "In Progress", "Review", "Done", "Someday", "Blocked", "Archive"]
+ITEM_VERBS = ["Read", "Memorize", "Pray through", "Journal on", "Discuss", "Teach", "Study", "Share"]
+STATUSES = ["In Progress", "Done", "Skipped"]
+
+SEEDED_AT = datetime(2024, 1, 1)
+
+
+def _like(prefix: str) -> str:
+    # LIKE pattern for ids starting with "<prefix>_"
+    return prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "\\_%"
+
+
+def _insert(cursor, table: str, columns: tuple, rows: list):
+    statement = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+    for start in range(0, len(rows), INSERT_BATCH):
+        cursor.executemany(statement, rows[start:start + INSERT_BATCH])
+
+
+class Generator:
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        # One hash at the configured cost, so logins cost what real ones do
+        self.password = bcrypt.hashpw(args.password.encode(), bcrypt.gensalt(Settings.BCRYPT_ROUNDS)).decode()
+
+    def user_id(self, n: int) -> str:
+        return f"{self.args.prefix}_user_{n}"
+
+    def user(self, n: int) -> tuple:
+        rng = self.rng
+        role = "Discipler" if rng.random() < self.args.disciplers else "Disciple"
+        # Pareto-skewed, so a few locations and interests are far more common
+        location = LOCATIONS[min(int(rng.paretovariate(1.2)) - 1, len(LOCATIONS) - 1)]
+        interests = set()
+        for _ in range(rng.randint(1, 6)):
+            interests.add(INTERESTS[min(int(rng.paretovariate(0.8)) - 1, len(INTERESTS) - 1)])
+        interests = sorted(interests)
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        email = f"{self.args.prefix}-{n}@example.com"
+        return (self.user_id(n), name, role, rng.randint(18, 75), location, json.dumps(interests),
+                email, self.password), interests
+
+    def board(self, user_id: str, n: int, rows: dict):
+        rng, args = self.rng, self.args
+        board_id = f"{user_id}_board_{n}"
+        created = SEEDED_AT + timedelta(minutes=rng.randint(0, 500_000))
+        completed = progress_sum = 0
+
+        for s in range(args.stages):
+            stage_id = f"{board_id}_stage_{s}"
+            rows["stages"].append((stage_id, board_id, STAGE_TITLES[s % len(STAGE_TITLES)], (s + 1) * POSITION_GAP, created))
+
+            for i in range(args.items):
+                item_id = f"{stage_id}_item_{i}"
+                status = rng.choices(STATUSES, weights=(6, 3, 1))[0]
+                progress = 100 if status == "Done" else rng.randrange(0, 100, 10)
+                done, points = item_counts(status, progress)
+                completed += done
+                progress_sum += points
+                subtasks = [{"text": f"Step {k + 1}", "completed": rng.random() < progress / 100}
+                            for k in range(rng.randint(0, 4))]
+                rows["items"].append((
+                    item_id, f"{rng.choice(ITEM_VERBS)} {rng.choice(INTERESTS).lower()} ({i + 1})", stage_id,
+                    "Generated by seed.py", status, progress, json.dumps(subtasks),
+                    (i + 1) * POSITION_GAP, created
+                ))
+
+                timestamp = created
+                for a in range(args.activities):
+                    timestamp += timedelta(minutes=rng.randint(5, 5000))
+                    rows["item_activities"].append((item_id, f"Update {a + 1} on {item_id}", timestamp, None))
+
+        rows["boards"].append((
+            board_id, user_id, f"Journey {n + 1}", created,
+            args.stages, args.stages * args.items, completed, progress_sum
+        ))
+
+
+COLUMNS = {
+    "users": ("id", "name", "role", "age", "location", "interests", "email", "password"),
+    "user_interests": ("user_id", "interest"),
+    "boards": ("id", "user_id", "title", "created_at", "stage_count", "item_count", "completed_count", "progress_sum"),
+    "stages": ("id", "board_id", "title", "position", "created_at"),
+    "items": ("id", "content", "stage_id", "description", "status", "progress", "subtasks", "position", "created_at"),
+    "item_activities": ("item_id", "text", "timestamp", "file"),
+}
+
+
+def seed(args) -> dict:
+    generator = Generator(args)
+    counts = dict.fromkeys(COLUMNS, 0)
+    disciplers, disciples = [], []
+
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            for start in range(0, args.users, USER_BATCH):
+                rows = {table: [] for table in COLUMNS}
+                for n in range(start, min(start + USER_BATCH, args.users)):
+                    user, interests = generator.user(n)
+                    rows["users"].append(user)
+                    rows["user_interests"].extend((user[0], interest) for interest in interests)
+                    (disciplers if user[2] == "Discipler" else disciples).append(user[0])
+                    for b in range(args.boards):
+                        generator.board(user[0], b, rows)
+
+                # Parents before children, for the foreign keys
+                for table, columns in COLUMNS.items():
+                    _insert(cursor, table, columns, rows[table])
+                    counts[table] += len(rows[table])
+                conn.commit()
+                print(f"Seeded {min(start + USER_BATCH, args.users)} of {args.users} users", flush=True)
+
+            rng = generator.rng
+            pairs = []
+            if disciplers:
+                for disciple_id in disciples:
+                    if rng.random() < args.paired:
+                        pairs.append((f"{disciple_id}_pair", rng.choice(disciplers), disciple_id))
+            _insert(cursor, "discipleship", ("id", "discipler_id", "disciple_id"), pairs)
+            counts["discipleship"] = len(pairs)
+
+            if args.skip_matches:
+                cursor.execute(
+                    "INSERT IGNORE INTO match_score_queue (user_id, reverse) SELECT id, TRUE FROM users WHERE id LIKE %s",
+                    (_like(args.prefix),)
+                )
+            conn.commit()
+        finally:
+            cursor.close()
+
+    if not args.skip_matches:
+        asyncio.run(rebuild_matches())
+    return counts
+
+
+def reset(prefix: str) -> int:
+    """Delete everything a seed run with ``prefix`` created; returns users removed."""
+    pattern = _like(prefix)
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            # Activities, files, interests and match lists go with their
+            # items and users (ON DELETE CASCADE)
+            cursor.execute("""
+                DELETE i FROM items i
+                JOIN stages s ON s.id = i.stage_id
+                JOIN boards b ON b.id = s.board_id
+                WHERE b.user_id LIKE %s
+            """, (pattern,))
+            cursor.execute("DELETE s FROM stages s JOIN boards b ON b.id = s.board_id WHERE b.user_id LIKE %s", (pattern,))
+            cursor.execute("""
+                DELETE t FROM board_tombstones t
+                JOIN boards b ON b.id = t.board_id
+                WHERE b.user_id LIKE %s
+            """, (pattern,))
+            cursor.execute("DELETE FROM boards WHERE user_id LIKE %s", (pattern,))
+            cursor.execute(
+                "DELETE FROM discipleship WHERE disciple_id LIKE %s OR discipler_id LIKE %s", (pattern, pattern)
+            )
+            cursor.execute("DELETE FROM match_score_queue WHERE user_id LIKE %s", (pattern,))
+            cursor.execute("DELETE FROM users WHERE id LIKE %s", (pattern,))
+            removed = cursor.rowcount
+            conn.commit()
+        finally:
+            cursor.close()
+    return removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate or remove synthetic benchmark data")
+    parser.add_argument("command", choices=["seed", "reset"])
+    parser.add_argument("--prefix", default="seed", help="id and email prefix of the generated rows")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--disciplers", type=float, default=0.3, help="fraction of users who are Disciplers")
+    parser.add_argument("--paired", type=float, default=0.6, help="fraction of Disciples given a Discipler")
+    parser.add_argument("--boards", type=int, default=2, help="boards per user")
+    parser.add_argument("--stages", type=int, default=5, help="stages per board")
+    parser.add_argument("--items", type=int, default=20, help="items per stage")
+    parser.add_argument("--activities", type=int, default=3, help="activities per item")
+    parser.add_argument("--password", default="password", help="password of every generated user")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skip-matches", action="store_true",
+                        help="queue the users for the match refresher instead of rebuilding lists now")
+    args = parser.parse_args()
+
+    if args.command == "reset":
+        print(f"Removed {reset(args.prefix)} seeded user(s)")
+    else:
+        print(json.dumps(seed(args), indent=2))
+
+
+if __name__ == "__main__":
+    main()
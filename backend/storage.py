@@ -0,0 +1,261 @@
+# storage.py
+"""Content-addressed store for item attachments.
+
+Blobs live under ``UPLOAD_DIR/<sha256[:2]>/<sha256>``, so identical uploads
+share one file on disk. Uploads are streamed into a temporary file while
+being hashed and measured, then renamed into place; nothing larger than one
+chunk is ever held in memory.
+"""
+import hashlib
+import mimetypes
+import os
+import uuid
+from typing import Optional, Tuple
+
+import aiofiles
+from fastapi import HTTPException, Request
+from multipart.exceptions import MultipartParseError
+from multipart.multipart import MultipartParser, parse_options_header
+from starlette.responses import Response
+from config import Settings
+
+TMP_DIR = os.path.join(Settings.UPLOAD_DIR, "tmp")
+
+
+def blob_path(sha256: str) -> str:
+    return os.path.join(Settings.UPLOAD_DIR, sha256[:2], sha256)
+
+
+class BlobWriter:
+    """Streams one upload to a temporary file, hashing it on the way.
+
+    ``write`` raises 413 as soon as more than ``max_bytes`` have arrived, so
+    an oversized upload is cut off instead of being stored and then rejected.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._hash = hashlib.sha256()
+        self._tmp_path = os.path.join(TMP_DIR, uuid.uuid4().hex)
+        self._file = None
+
+    async def open(self):
+        os.makedirs(TMP_DIR, exist_ok=True)
+        self._file = await aiofiles.open(self._tmp_path, "wb")
+
+    async def write(self, data: bytes):
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            raise HTTPException(status_code=413, detail=f"File exceeds {self.max_bytes} bytes")
+        self._hash.update(data)
+        await self._file.write(data)
+
+    async def commit(self) -> str:
+        await self._file.close()
+        sha256 = self._hash.hexdigest()
+        path = blob_path(sha256)
+        if os.path.exists(path):
+            # Already stored; keep the existing copy
+            os.remove(self._tmp_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(self._tmp_path, path)
+        return sha256
+
+    async def discard(self):
+        if self._file is not None:
+            await self._file.close()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+
+class _FilePartParser:
+    """multipart callbacks that pick out the first file field named ``field``.
+
+    The parser calls these synchronously, so data is only collected here and
+    written out by ``receive_upload`` between chunks.
+    """
+
+    def __init__(self, field: str):
+        self.field = field
+        self.filename = None
+        self.content_type = None
+        self.pending = []
+        self._headers = {}
+        self._header_field = b""
+        self._header_value = b""
+        self._capturing = False
+
+    def on_part_begin(self):
+        self._headers = {}
+
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        name = options.get(b"name", b"").decode("utf-8", "replace")
+        if name == self.field and b"filename" in options and self.filename is None:
+            self.filename = options[b"filename"].decode("utf-8", "replace")
+            self.content_type = self._headers.get(b"content-type", b"").decode("latin-1") or None
+            self._capturing = True
+
+    def on_part_data(self, data: bytes, start: int, end: int):
+        if self._capturing:
+            self.pending.append(data[start:end])
+
+    def on_part_end(self):
+        self._capturing = False
+
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+        }
+
+
+async def receive_upload(request: Request, field: str = "file", max_bytes: int = None) -> dict:
+    """Stream the ``field`` file of a multipart request into the blob store.
+
+    Returns the stored blob's sha256 and size with the client's filename and
+    content type.
+    """
+    max_bytes = Settings.UPLOAD_MAX_BYTES if max_bytes is None else max_bytes
+
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise HTTPException(status_code=415, detail="Expected a multipart/form-data upload")
+
+    # Reject what is obviously too large before reading any of it; the 64KB
+    # allows for the multipart framing around the file
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > max_bytes + 64 * 1024:
+        raise HTTPException(status_code=413, detail=f"File exceeds {max_bytes} bytes")
+
+    part = _FilePartParser(field)
+    parser = MultipartParser(params[b"boundary"], part.callbacks())
+    writer = BlobWriter(max_bytes)
+    await writer.open()
+
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            for data in part.pending:
+                await writer.write(data)
+            part.pending.clear()
+        parser.finalize()
+
+        if part.filename is None:
+            raise HTTPException(status_code=400, detail=f"No file field named '{field}'")
+        sha256 = await writer.commit()
+    except MultipartParseError:
+        await writer.discard()
+        raise HTTPException(status_code=400, detail="Malformed multipart body") from None
+    except BaseException:
+        await writer.discard()
+        raise
+
+    name = os.path.basename(part.filename.replace("\\", "/"))[:255] or "file"
+    return {
+        "sha256": sha256,
+        "size": writer.size,
+        "name": name,
+        "content_type": part.content_type or mimetypes.guess_type(name)[0] or "application/octet-stream",
+    }
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single ``bytes=`` Range header into an inclusive (start, end).
+
+    Returns None when the whole file should be sent (no header, a unit other
+    than bytes, or several ranges) and raises 416 when the range can't be
+    satisfied.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+
+    first, _, last = header[len("bytes="):].strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+        else:
+            # bytes=-N is the last N bytes
+            start = max(size - int(last), 0)
+            end = size - 1
+    except ValueError:
+        return None
+
+    if start > end or start >= size:
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+    return start, min(end, size - 1)
+
+
+class BlobResponse(Response):
+    """Sends a stored blob, or one byte range of it.
+
+    When the server offers the ASGI ``http.response.zerocopy`` extension the
+    file descriptor is handed over to be sent with sendfile; otherwise the
+    file is read and sent in ``UPLOAD_CHUNK_SIZE`` pieces.
+    """
+
+    def __init__(self, path: str, size: int, byte_range: Optional[Tuple[int, int]] = None,
+                 headers: dict = None, media_type: str = None):
+        self.path = path
+        self.start, self.end = byte_range or (0, size - 1)
+        headers = dict(headers or {})
+        headers["accept-ranges"] = "bytes"
+        headers["content-length"] = str(self.end - self.start + 1)
+        if byte_range:
+            headers["content-range"] = f"bytes {self.start}-{self.end}/{size}"
+        super().__init__(status_code=206 if byte_range else 200, headers=headers, media_type=media_type)
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+
+        count = self.end - self.start + 1
+        if scope["method"] == "HEAD" or count <= 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        if "http.response.zerocopy" in scope.get("extensions", {}):
+            with open(self.path, "rb") as file:
+                await send({
+                    "type": "http.response.zerocopy",
+                    "file": file,
+                    "offset": self.start,
+                    "count": count,
+                    "more_body": False,
+                })
+            return
+
+        async with aiofiles.open(self.path, "rb") as file:
+            await file.seek(self.start)
+            remaining = count
+            while remaining > 0:
+                chunk = await file.read(min(Settings.UPLOAD_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                # The file was shorter than recorded; end the response anyway
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
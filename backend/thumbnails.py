@@ -0,0 +1,176 @@
+# thumbnails.py
+"""Background pipeline that derives thumbnails and metadata from uploads.
+
+Uploads are queued here as soon as their blob is stored and the request
+returns with the file still ``pending``. Worker tasks hand each blob to a
+process pool, which reads its real type and dimensions and writes a
+thumbnail no larger than THUMBNAIL_MAX_PX on either side, and then record
+the result on every item_files row for that blob.
+
+Thumbnails are named after the blob's hash and the size limit, so uploads
+of the same bytes share one thumbnail. Rows still pending when the process
+stops are queued again on the next startup.
+"""
+import asyncio
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, ImageOps
+from config import Settings
+from database import async_db_connection
+from storage import blob_path
+
+THUMBNAIL_DIR = os.path.join(Settings.UPLOAD_DIR, "thumbnails")
+
+
+def thumbnail_name(sha256: str, max_px: int) -> str:
+    return f"{sha256}_{max_px}.webp"
+
+
+def thumbnail_path(name: str) -> str:
+    return os.path.join(THUMBNAIL_DIR, name)
+
+
+def _render(sha256: str, max_px: int, max_pixels: int) -> dict:
+    # Runs in a worker process. Pillow's own limit only raises at twice
+    # MAX_IMAGE_PIXELS, so the size is checked here instead; open() has only
+    # read the header at that point.
+    Image.MAX_IMAGE_PIXELS = None
+    try:
+        image = Image.open(blob_path(sha256))
+    except Image.UnidentifiedImageError:
+        return {"status": "none"}
+
+    with image:
+        if image.width * image.height > max_pixels:
+            return {"status": "none"}
+        meta = {
+            "status": "ready",
+            "width": image.width,
+            "height": image.height,
+            "detected_type": Image.MIME.get(image.format),
+            "thumbnail": thumbnail_name(sha256, max_px),
+        }
+        path = thumbnail_path(meta["thumbnail"])
+        if not os.path.exists(path):
+            # draft() lets JPEG decode straight at a reduced scale
+            image.draft("RGB", (max_px, max_px))
+            thumbnail = ImageOps.exif_transpose(image)
+            thumbnail.thumbnail((max_px, max_px))
+            if thumbnail.mode not in ("RGB", "RGBA"):
+                thumbnail = thumbnail.convert("RGBA" if "A" in thumbnail.getbands() else "RGB")
+
+            os.makedirs(THUMBNAIL_DIR, exist_ok=True)
+            tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+            thumbnail.save(tmp_path, "WEBP", quality=80)
+            os.replace(tmp_path, path)
+        meta["thumbnail_size"] = os.path.getsize(path)
+    return meta
+
+
+class ThumbnailPipeline:
+    """Queue of blobs waiting for derivatives, drained by ``workers`` tasks.
+
+    ``submit`` never blocks the upload: when the queue is full the file just
+    stays pending until the next startup picks it up again.
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = None
+        self._queue = None
+        self._tasks = []
+        self.completed = 0
+        self.failed = 0
+        self.dropped = 0
+
+    async def start(self):
+        if self._executor is not None:
+            return
+        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+        async with async_db_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                await cursor.execute(
+                    "SELECT DISTINCT sha256 FROM item_files WHERE status = 'pending' LIMIT %s",
+                    (self.max_queue,)
+                )
+                pending = await cursor.fetchall()
+            finally:
+                await cursor.close()
+        for (sha256,) in pending:
+            self.submit(sha256)
+
+    async def shutdown(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def submit(self, sha256: str):
+        if self._queue is None:
+            self.dropped += 1
+            return
+        try:
+            self._queue.put_nowait(sha256)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    async def _work(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            sha256 = await self._queue.get()
+            try:
+                try:
+                    meta = await loop.run_in_executor(
+                        self._executor, _render, sha256,
+                        Settings.THUMBNAIL_MAX_PX, Settings.THUMBNAIL_MAX_PIXELS
+                    )
+                    self.completed += 1
+                except Exception as e:
+                    print(f"Error generating thumbnail for {sha256}: {e}")
+                    meta = {"status": "failed"}
+                    self.failed += 1
+                await self._record(sha256, meta)
+            except Exception as e:
+                print(f"Error recording thumbnail for {sha256}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _record(self, sha256: str, meta: dict):
+        async with async_db_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                await cursor.execute(
+                    """UPDATE item_files
+                       SET status = %s, width = %s, height = %s,
+                           detected_type = %s, thumbnail = %s, thumbnail_size = %s
+                       WHERE sha256 = %s AND status = 'pending'""",
+                    (meta["status"], meta.get("width"), meta.get("height"),
+                     meta.get("detected_type"), meta.get("thumbnail"),
+                     meta.get("thumbnail_size"), sha256)
+                )
+                await conn.commit()
+            finally:
+                await cursor.close()
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "completed": self.completed,
+            "failed": self.failed,
+            "dropped": self.dropped,
+        }
+
+
+thumbnail_pipeline = ThumbnailPipeline(workers=Settings.THUMBNAIL_WORKERS, max_queue=Settings.THUMBNAIL_MAX_QUEUE)
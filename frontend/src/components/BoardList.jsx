@@ -6,12 +6,15 @@ const BoardList = () => {
     const [loading, setLoading] = useState(true);
     const [boards, setBoards] = useState([]);
     const [newBoardTitle, setNewBoardTitle] = useState('');
+    const [templates, setTemplates] = useState([]);
+    const [templateId, setTemplateId] = useState('');
     const { user, token, logout } = useAuth(); // Include logout from AuthContext
     const navigate = useNavigate();
 
     useEffect(() => {
         if (user && token) {  // Check for both user and token
             fetchBoards();
+            fetchTemplates();
         } else if (!token) {
             navigate('/login');
         }
@@ -45,6 +48,21 @@ const BoardList = () => {
         }
     };
 
+    const fetchTemplates = async () => {
+        try {
+            const response = await fetch('http://localhost:8000/boards/templates', {
+                headers: {
+                    'Authorization': `Bearer ${token}`,
+                },
+            });
+            if (response.ok) {
+                setTemplates(await response.json());
+            }
+        } catch (error) {
+            console.error('Error fetching templates:', error);
+        }
+    };
+
     const createBoard = async () => {
         if (!newBoardTitle.trim()) return;
 
@@ -58,6 +76,7 @@ const BoardList = () => {
                 body: JSON.stringify({
                     title: newBoardTitle,
                     user_id: user.id,
+                    template_id: templateId || null,
                 }),
             });
 
@@ -106,6 +125,20 @@ const BoardList = () => {
                                 placeholder="Enter board title..."
                                 className="border p-2 rounded"
                             />
+                            {templates.length > 0 && (
+                                <select
+                                    value={templateId}
+                                    onChange={(e) => setTemplateId(e.target.value)}
+                                    className="border p-2 rounded"
+                                >
+                                    <option value="">Blank board</option>
+                                    {templates.map((template) => (
+                                        <option key={template.id} value={template.id}>
+                                            {template.title} ({template.stage_count} stages)
+                                        </option>
+                                    ))}
+                                </select>
+                            )}
                             <button
                                 onClick={createBoard}
                                 className="bg-blue-500 text-white px-4 py-2 rounded hover:bg-blue-600"
@@ -136,6 +169,7 @@ const BoardList = () => {
                                     <div className="text-sm text-gray-600">
                                         <p>{board.stage_count} stages</p>
                                         <p>{board.item_count} items</p>
+                                        <p>{board.completed_count} done · {board.progress}% progress</p>
                                     </div>
                                 </div>
                             ))}
@@ -1,11 +1,12 @@
 import React, { useState, useEffect } from 'react';
 import { useAuth } from '../contexts/AuthContext';
 
-const ItemDetailModal = ({ item, isOpen, onClose, onUpdate }) => {
+const ItemDetailModal = ({ item, boardId, isOpen, onClose, onUpdate }) => {
     const { user } = useAuth();
     const [description, setDescription] = useState(item.description || '');
     const [status, setStatus] = useState(item.status || 'In Progress');
-    const [activities, setActivities] = useState(item.activities || []);
+    const [activities, setActivities] = useState([]);
+    const [activitiesCursor, setActivitiesCursor] = useState(null);
     const [newActivity, setNewActivity] = useState('');
     const [currentFile, setCurrentFile] = useState(null);
     const [subtasks, setSubtasks] = useState(item.subtasks || []);
@@ -13,6 +14,34 @@ const ItemDetailModal = ({ item, isOpen, onClose, onUpdate }) => {
     const [progress, setProgress] = useState(0);
 
     const statusOptions = ['In Progress', 'Done', 'Skipped'];
+    const activitiesUrl = `http://localhost:8000/boards/${boardId}/items/${item.id}/activities`;
+
+    useEffect(() => {
+        if (isOpen) {
+            setActivities([]);
+            loadActivities(null);
+        }
+    }, [isOpen, item.id]);
+
+    // Pages come back newest first; older pages are prepended so the list
+    // stays in chronological order
+    const loadActivities = async (cursor) => {
+        try {
+            const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
+            const response = await fetch(`${activitiesUrl}${query}`, {
+                headers: {
+                    'Authorization': `Bearer ${localStorage.getItem('token')}`
+                }
+            });
+            if (response.ok) {
+                const page = await response.json();
+                setActivities(previous => [...page.activities.reverse(), ...previous]);
+                setActivitiesCursor(page.next_cursor);
+            }
+        } catch (error) {
+            console.error('Error loading activities:', error);
+        }
+    };
 
     useEffect(() => {
         calculateProgress();
@@ -52,24 +81,22 @@ const ItemDetailModal = ({ item, isOpen, onClose, onUpdate }) => {
             subtasks: subtasks.map(subtask => ({
                 text: subtask.text,
                 completed: subtask.completed
-            })),
-            activities: activities.map(activity => ({
-                text: activity.text,
-                timestamp: activity.timestamp,
-                file: activity.file
             }))
         };
 
         try {
-            const board_id = item.stage_id.split('_').pop();
-
-            const response = await fetch(`http://localhost:8000/boards/${board_id}/items/${item.id}`, {
-                method: 'PUT',
+            const response = await fetch(`http://localhost:8000/boards/${boardId}/items/${item.id}`, {
+                method: 'PATCH',
                 headers: {
                     'Content-Type': 'application/json',
                     'Authorization': `Bearer ${localStorage.getItem('token')}`
                 },
-                body: JSON.stringify(updatedItem),
+                body: JSON.stringify({
+                    description: updatedItem.description,
+                    status: updatedItem.status,
+                    progress: updatedItem.progress,
+                    subtasks: updatedItem.subtasks
+                }),
             });
 
             if (response.ok) {
@@ -96,22 +123,45 @@ const ItemDetailModal = ({ item, isOpen, onClose, onUpdate }) => {
             if (currentFile) {
                 const fileResponse = await fetch(`http://localhost:8000/items/${item.id}/files`, {
                     method: 'POST',
+                    headers: {
+                        'Authorization': `Bearer ${localStorage.getItem('token')}`
+                    },
                     body: formData,
                 });
                 if (fileResponse.ok) {
-                    fileData = await fileResponse.json();
+                    const uploaded = await fileResponse.json();
+                    fileData = {
+                        id: uploaded.id,
+                        name: uploaded.name,
+                        url: uploaded.url,
+                        thumbnail_url: uploaded.thumbnail_url
+                    };
+                } else {
+                    console.error('Failed to upload file:', await fileResponse.text());
+                    return;
                 }
             }
 
-            const newActivityEntry = {
-                text: newActivity,
-                timestamp: new Date().toISOString(),
-                file: fileData
-            };
+            const response = await fetch(activitiesUrl, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                    'Authorization': `Bearer ${localStorage.getItem('token')}`
+                },
+                body: JSON.stringify({
+                    text: newActivity,
+                    timestamp: new Date().toISOString(),
+                    file: fileData
+                }),
+            });
 
-            setActivities([...activities, newActivityEntry]);
-            setNewActivity('');
-            setCurrentFile(null);
+            if (response.ok) {
+                setActivities([...activities, await response.json()]);
+                setNewActivity('');
+                setCurrentFile(null);
+            } else {
+                console.error('Failed to add activity:', await response.text());
+            }
         } catch (error) {
             console.error('Error adding activity:', error);
         }
@@ -209,8 +259,16 @@ const ItemDetailModal = ({ item, isOpen, onClose, onUpdate }) => {
                         <div>
                             <label className="block text-sm font-medium mb-2">Activities</label>
                             <div className="space-y-4 mb-4">
-                                {activities.map((activity, index) => (
-                                    <div key={index} className="bg-gray-50 p-3 rounded-md">
+                                {activitiesCursor && (
+                                    <button
+                                        onClick={() => loadActivities(activitiesCursor)}
+                                        className="text-blue-500 hover:underline text-sm"
+                                    >
+                                        Load older activities
+                                    </button>
+                                )}
+                                {activities.map((activity) => (
+                                    <div key={activity.id} className="bg-gray-50 p-3 rounded-md">
                                         <p className="text-sm mb-2">{activity.text}</p>
                                         {activity.file && (
                                             <a
@@ -219,6 +277,15 @@ const ItemDetailModal = ({ item, isOpen, onClose, onUpdate }) => {
                                                 target="_blank"
                                                 rel="noopener noreferrer"
                                             >
+                                                {activity.file.thumbnail_url && (
+                                                    <img
+                                                        src={`http://localhost:8000${activity.file.thumbnail_url}`}
+                                                        alt={activity.file.name}
+                                                        loading="lazy"
+                                                        className="max-h-40 rounded-md mb-1"
+                                                        onError={(e) => { e.currentTarget.style.display = 'none'; }}
+                                                    />
+                                                )}
                                                 📎 {activity.file.name}
                                             </a>
                                         )}
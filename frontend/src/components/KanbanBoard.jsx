@@ -1,6 +1,6 @@
 import { useParams } from 'react-router-dom';
 import { useAuth } from '../contexts/AuthContext';
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import ItemDetailModal from './ItemDetailModal';
 import { useNavigate } from "react-router-dom";
 
@@ -15,6 +15,8 @@ const KanbanBoard = () => {
     const [newStageTitle, setNewStageTitle] = useState('');
     const [loading, setLoading] = useState(true);
     const [selectedItem, setSelectedItem] = useState(null);
+    const [connection, setConnection] = useState(0);
+    const socketRef = useRef(null);
 
     useEffect(() => {
         if (boardId && token) {
@@ -22,6 +24,45 @@ const KanbanBoard = () => {
         }
     }, [boardId, token]);
 
+    // Board changes, ours and other people's, arrive over a WebSocket;
+    // each burst of events triggers one refetch
+    useEffect(() => {
+        if (!boardId || !token) return;
+
+        let refetchTimer = null;
+        let reconnectTimer = null;
+        const socket = new WebSocket(
+            `ws://localhost:8000/boards/${boardId}/events?token=${encodeURIComponent(token)}`
+        );
+        socket.onmessage = () => {
+            clearTimeout(refetchTimer);
+            refetchTimer = setTimeout(fetchBoard, 100);
+        };
+        socket.onclose = (event) => {
+            if (event.code === 1008) return;  // not allowed; reconnecting won't help
+            // Reconnect, then refetch to pick up anything missed meanwhile
+            reconnectTimer = setTimeout(() => {
+                setConnection((n) => n + 1);
+                fetchBoard();
+            }, 2000);
+        };
+        socketRef.current = socket;
+
+        return () => {
+            clearTimeout(refetchTimer);
+            clearTimeout(reconnectTimer);
+            socket.onclose = null;
+            socket.close();
+        };
+    }, [boardId, token, connection]);
+
+    // Only needed when the change event can't reach us
+    const refreshUnlessLive = async () => {
+        if (socketRef.current?.readyState !== WebSocket.OPEN) {
+            await fetchBoard();
+        }
+    };
+
     const fetchBoard = async () => {
         try {
             const response = await fetch(`http://localhost:8000/boards/${boardId}`, {
@@ -80,7 +121,7 @@ const KanbanBoard = () => {
             });
 
             if (response.ok) {
-                await fetchBoard();  // Refresh the board after creating a stage
+                await refreshUnlessLive();
                 setNewStageTitle('');
                 setIsCreatingStage(false);
             }
@@ -98,38 +139,24 @@ const KanbanBoard = () => {
                 }
             });
             if (response.ok) {
-                await fetchBoard();  // Refresh the board after deleting a stage
+                await refreshUnlessLive();
             }
         } catch (error) {
             console.error('Error deleting stage:', error);
         }
     };
 
-    const handleItemUpdate = async (updatedItem) => {
-        try {
-            const response = await fetch(`http://localhost:8000/boards/${boardId}/items/${updatedItem.id}`, {
-                method: 'PUT',
-                headers: {
-                    'Authorization': `Bearer ${token}`,
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify(updatedItem),
-            });
-
-            if (response.ok) {
-                setStages(prevStages => ({
-                    ...prevStages,
-                    [updatedItem.stage_id]: {
-                        ...prevStages[updatedItem.stage_id],
-                        items: prevStages[updatedItem.stage_id].items.map(item =>
-                            item.id === updatedItem.id ? updatedItem : item
-                        )
-                    }
-                }));
+    // ItemDetailModal has already saved the changes; just reflect them locally
+    const handleItemUpdate = (updatedItem) => {
+        setStages(prevStages => ({
+            ...prevStages,
+            [updatedItem.stage_id]: {
+                ...prevStages[updatedItem.stage_id],
+                items: prevStages[updatedItem.stage_id].items.map(item =>
+                    item.id === updatedItem.id ? updatedItem : item
+                )
             }
-        } catch (error) {
-            console.error('Error updating item:', error);
-        }
+        }));
     };
 
     // Add drag and drop handlers
@@ -161,22 +188,25 @@ const KanbanBoard = () => {
         if (!item) return;
 
         try {
-            const response = await fetch(`http://localhost:8000/boards/${boardId}/items/${itemId}`, {
-                method: 'PUT',
+            // Only the stage and position change, so send just the move
+            const response = await fetch(`http://localhost:8000/boards/${boardId}/items/${itemId}/move`, {
+                method: 'POST',
                 headers: {
                     'Authorization': `Bearer ${token}`,
                     'Content-Type': 'application/json',
                 },
                 body: JSON.stringify({
-                    ...item,
                     stage_id: targetStageId,
+                    position: stages[targetStageId].items.length,
                 }),
             });
 
             if (response.ok) {
+                const { position } = await response.json();
+                const movedItem = { ...item, stage_id: targetStageId, position };
                 const newStages = { ...stages };
                 newStages[sourceStageId].items = newStages[sourceStageId].items.filter(item => item.id !== itemId);
-                newStages[targetStageId].items = [...newStages[targetStageId].items, item];
+                newStages[targetStageId].items = [...newStages[targetStageId].items, movedItem];
                 setStages(newStages);
             }
         } catch (error) {
@@ -390,6 +420,7 @@ const KanbanBoard = () => {
             {selectedItem && (
                 <ItemDetailModal
                     item={selectedItem}
+                    boardId={boardId}
                     isOpen={!!selectedItem}
                     onClose={() => setSelectedItem(null)}
                     onUpdate={handleItemUpdate}
@@ -6,6 +6,7 @@ const OppositeRoleUsersPage = () => {
     const { token, user } = useAuth();
     const [users, setUsers] = useState([]);
     const [loading, setLoading] = useState(true);
+    const [nextCursor, setNextCursor] = useState(null);
     const navigate = useNavigate();
 
     useEffect(() => {
@@ -17,9 +18,10 @@ const OppositeRoleUsersPage = () => {
         fetchSuggestions();
     }, [token, user]);
 
-    const fetchSuggestions = async () => {
+    const fetchSuggestions = async (cursor = null) => {
         try {
-            const response = await fetch(`http://localhost:8000/users/suggested-matches`, {
+            const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
+            const response = await fetch(`http://localhost:8000/users/suggested-matches${query}`, {
                 headers: {
                     Authorization: `Bearer ${token}`,
                     'Content-Type': 'application/json',
@@ -34,7 +36,8 @@ const OppositeRoleUsersPage = () => {
 
             const data = await response.json();
             console.log('Fetched suggestions:', data);
-            setUsers(data);
+            setUsers(cursor ? [...users, ...data] : data);
+            setNextCursor(response.headers.get('X-Next-Cursor'));
         } catch (error) {
             console.error('Error fetching suggestions:', error.message);
         } finally {
@@ -74,6 +77,16 @@ const OppositeRoleUsersPage = () => {
                     ))}
                 </div>
             )}
+            {nextCursor && (
+                <div className="text-center mt-4">
+                    <button
+                        onClick={() => fetchSuggestions(nextCursor)}
+                        className="bg-blue-500 text-white px-4 py-2 rounded-md hover:bg-blue-600"
+                    >
+                        Show more
+                    </button>
+                </div>
+            )}
         </div>
     );
 };